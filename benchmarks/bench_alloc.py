@@ -0,0 +1,77 @@
+""" Memory held by decoded events, and GC activity while replaying
+
+    python -m benchmarks.bench_alloc capture botname
+"""
+from __future__ import annotations
+from typing import (
+    List,
+    Tuple,
+)
+
+import argparse
+import gc
+import logging
+import time
+import tracemalloc
+
+import dbot.network.events as events
+from dbot.bot import BasicBot
+from dbot.config import BotConfig
+from dbot.network.capture import CaptureReader
+from dbot.network.eventqueue import EventQueue
+from dbot.network.retrosocket import EventDecoder
+from dbot.replay import replay
+
+
+def decode_all(
+    filename: str,
+) -> Tuple[List[events.GameEvent], int, int]:
+    """ decode every record, returns (events, bytes retained, peak bytes) """
+    records = list(CaptureReader(filename))
+    event_queue = EventQueue()
+    decoder = EventDecoder(event_queue)
+    decoded: List[events.GameEvent] = []
+
+    gc.collect()
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    for _, name, args in records:
+        decoder.handle_message(name, *args)
+        decoded.extend(event_queue.drain())
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return decoded, current - base, peak - base
+
+
+def gc_collections() -> int:
+    return sum(s['collections'] for s in gc.get_stats())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture')
+    parser.add_argument('botname')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    decoded, retained, peak = decode_all(args.capture)
+    n = max(len(decoded), 1)
+    print(f'{len(decoded)} events decoded')
+    print(f'retained {retained / 1024:10.1f} KiB {retained / n:8.1f} B/event')
+    print(f'peak     {peak / 1024:10.1f} KiB')
+    del decoded
+
+    bot = BasicBot(BotConfig(args.botname, '', ''))
+    gc.collect()
+    collections = gc_collections()
+    tracemalloc.start()
+    start = time.perf_counter()
+    stats = replay(args.capture, bot)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    collections = gc_collections() - collections
+    print(f'replay   {stats.n_messages} messages in {elapsed:.3f}s '
+          f'(traced), peak {peak / 1024:.1f} KiB, '
+          f'{collections} gc collections')
@@ -0,0 +1,265 @@
+""" Collision maps: nested string-keyed dicts vs the dense grid, and
+    JSON files vs mapped .cmap files
+
+    python -m benchmarks.bench_collision [-n 200000] [--size 200]
+"""
+from __future__ import annotations
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+)
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from dbot.movement.collision import (
+    CollisionManager,
+    CollisionMap,
+    CollisionState,
+)
+from dbot.movement.pathing import (
+    Location,
+    Pathing,
+)
+
+
+class DictCollisionMap:
+    """ the previous CollisionMap, str(x) -> str(y) -> bonk """
+
+    def __init__(
+        self,
+        name: str,
+    ) -> None:
+        self.name = name
+        self.map: Dict[str, Dict[str, bool]] = {}
+        self.transports: Dict[str, Dict[str, str]] = {}
+
+    def get(
+        self,
+        ix: int,
+        iy: int,
+    ) -> CollisionState:
+        x, y = str(ix), str(iy)
+        if x in self.transports and y in self.transports[x]:
+            return CollisionState.transport
+        if x in self.map and y in self.map[x]:
+            if self.map[x][y]:
+                return CollisionState.bonk
+            return CollisionState.nobonk
+        return CollisionState.unknown
+
+    def set(
+        self,
+        ix: int,
+        iy: int,
+        collision: bool,
+    ) -> None:
+        x, y = str(ix), str(iy)
+        if x not in self.map:
+            self.map[x] = {}
+        self.map[x][y] = collision
+
+    def neighbors(
+        self,
+        src: Tuple[int, int],
+    ) -> List[Tuple[Tuple[int, int], CollisionState]]:
+        return [
+            (p, self.get(*p))
+            for p in [
+                (src[0],     src[1] - 1),
+                (src[0],     src[1] + 1),
+                (src[0] - 1, src[1]),
+                (src[0] + 1, src[1]),
+            ]
+        ]
+
+
+class OneMap:
+    """ enough of a CollisionManager for Pathing """
+
+    def __init__(
+        self,
+        cmap: Any,
+    ) -> None:
+        self.cmap = cmap
+
+    def get(
+        self,
+        name: str,
+    ) -> Any:
+        return self.cmap
+
+
+def fill(
+    cmap: Any,
+    size: int,
+    seed: int,
+) -> None:
+    """ an open field with scattered walls and a border """
+    rng = random.Random(seed)
+    for x in range(size):
+        for y in range(size):
+            edge = x in (0, size - 1) or y in (0, size - 1)
+            cmap.set(x, y, edge or rng.random() < 0.2)
+    cmap.set(1, 1, False)
+    cmap.set(size - 2, size - 2, False)
+
+
+def time_get(
+    cmap: Any,
+    points: List[Tuple[int, int]],
+) -> float:
+    get = cmap.get
+    start = time.perf_counter()
+    for x, y in points:
+        get(x, y)
+    return (time.perf_counter() - start) / len(points)
+
+
+def time_neighbors(
+    cmap: Any,
+    points: List[Tuple[int, int]],
+) -> float:
+    neighbors = cmap.neighbors
+    start = time.perf_counter()
+    for point in points:
+        neighbors(point)
+    return (time.perf_counter() - start) / len(points)
+
+
+def time_path(
+    cmap: Any,
+    size: int,
+    n: int,
+    uncertainty = 4.0,
+) -> float:
+    pathing = Pathing(OneMap(cmap), uncertainty) # type: ignore
+    start_at = Location('bench', (1, 1))
+    goal = Location('bench', (size - 2, size - 2))
+    start = time.perf_counter()
+    for _ in range(n):
+        pathing.path(start_at, goal)
+    return (time.perf_counter() - start) / n
+
+
+def time_load(
+    cmap: CollisionMap,
+    n: int,
+) -> Tuple[float, float, int, int]:
+    """ seconds to load a map and read a tile, JSON then .cmap, and sizes """
+    directory = tempfile.mkdtemp()
+    json_file = os.path.join(directory, cmap.name)
+    cmap_file = os.path.join(directory, f'{cmap.name}.cmap')
+    with open(json_file, 'w') as f:
+        f.write(json.dumps(cmap.save(), indent=2))
+    with open(cmap_file, 'wb') as f:
+        f.write(cmap.encode())
+
+    start = time.perf_counter()
+    for _ in range(n):
+        with open(json_file) as f:
+            CollisionMap.load(json.loads(f.read())).get(1, 1)
+    json_time = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    for _ in range(n):
+        CollisionMap.from_file(cmap_file).get(1, 1)
+    cmap_time = (time.perf_counter() - start) / n
+
+    sizes = os.path.getsize(json_file), os.path.getsize(cmap_file)
+    os.remove(json_file)
+    os.remove(cmap_file)
+    os.rmdir(directory)
+    return json_time, cmap_time, sizes[0], sizes[1]
+
+
+def time_discover(
+    cmap: CollisionMap,
+    n: int,
+) -> Tuple[float, float]:
+    """ bot time per new tile kept durable: full JSON save vs the log """
+    directory = tempfile.mkdtemp()
+    json_file = os.path.join(directory, cmap.name)
+    start = time.perf_counter()
+    for i in range(n):
+        cmap.set(-1 - i, -1, True)
+        with open(json_file, 'w') as f:
+            f.write(json.dumps(cmap.save(), indent=2))
+    save_time = (time.perf_counter() - start) / n
+
+    # the log's cost doesn't depend on the map's size
+    manager = CollisionManager(directory)
+    logged = manager.get('logged')
+    start = time.perf_counter()
+    for i in range(n * 100):
+        logged.set(i, 0, True)
+        manager.sync()
+    log_time = (time.perf_counter() - start) / (n * 100)
+    manager.save()
+    manager.wait()
+    shutil.rmtree(directory)
+    return save_time, log_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200000)
+    parser.add_argument('--size', type=int, default=200)
+    parser.add_argument('--paths', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    before = DictCollisionMap('bench')
+    after = CollisionMap('bench')
+    fill(before, args.size, 1)
+    fill(after, args.size, 1)
+
+    rng = random.Random(2)
+    # mostly inside the map, some unexplored around it
+    points = [
+        (rng.randint(-10, args.size + 10), rng.randint(-10, args.size + 10))
+        for _ in range(args.n)
+    ]
+
+    rows = [
+        ('get', 'ns', 1e9, time_get(before, points), time_get(after, points)),
+        (
+            'neighbors', 'ns', 1e9,
+            time_neighbors(before, points),
+            time_neighbors(after, points),
+        ),
+        (
+            'path', 'ms', 1e3,
+            time_path(before, args.size, args.paths, 0.0),
+            time_path(after, args.size, args.paths),
+        ),
+    ]
+    for name, unit, scale, old, new in rows:
+        print(
+            f'{name:10} dicts {old * scale:10.1f} {unit}  '
+            f'grid {new * scale:10.1f} {unit}  '
+            f'speedup {old / new:6.2f}x'
+        )
+
+    json_time, cmap_time, json_size, cmap_size = time_load(after, args.paths)
+    print(
+        f'{"load":10} json  {json_time * 1e3:10.1f} ms  '
+        f'cmap {cmap_time * 1e3:10.3f} ms  '
+        f'speedup {json_time / cmap_time:6.0f}x'
+    )
+    print(f'{"size":10} json  {json_size:10} B   cmap {cmap_size:10} B')
+
+    save_time, log_time = time_discover(after, args.paths)
+    print(
+        f'{"discover":10} save  {save_time * 1e6:10.1f} us  '
+        f'log  {log_time * 1e6:10.1f} us  '
+        f'speedup {save_time / log_time:6.0f}x'
+    )
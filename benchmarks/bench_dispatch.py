@@ -0,0 +1,86 @@
+""" Per-event dispatch cost: getattr probing vs the cached handler table
+
+    python -m benchmarks.bench_dispatch [-n 200000]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+
+import dbot.network.events as events
+from dbot.bot import BasicBot
+from dbot.config import BotConfig
+
+
+def probe_dispatch(
+    bot: BasicBot,
+    handler_name: str,
+    *args,
+) -> None:
+    """ the previous dispatch, two getattr calls per target per event """
+    targets = [
+        bot.ui,
+        bot.battler if bot.is_in_battle else bot.mover,
+        bot,
+    ]
+    for obj in targets:
+        handler = getattr(obj, handler_name, None)
+        backup = getattr(obj, 'catch_all_handler', None)
+        if handler is not None:
+            handler(*args)
+        elif backup is not None:
+            backup(*args)
+
+
+class ProbeBot(BasicBot):
+
+    def handle_event(
+        self,
+        event: events.GameEvent,
+    ) -> None:
+        probe_dispatch(self, f'on_{event.event_name}', event)
+
+    def on_update(
+        self,
+        e: events.Update,
+    ) -> None:
+        self.state.vars[e.key] = e.value
+        probe_dispatch(self, f'onupdate_{e.key}', e.value)
+
+
+def sample_events() -> list:
+    return [
+        events.Update('gold', 10),
+        events.Update('experience', 20),
+        events.PlayerUpdate('someone', 'direction', 'up'),
+        events.PlayerLeftMap('someone'),
+        events.Update('storageTab', None),
+        events.Update('hp', 30),
+    ]
+
+
+def run(
+    bot: BasicBot,
+    n: int,
+) -> float:
+    """ seconds per event """
+    sample = sample_events()
+    start = time.perf_counter()
+    for i in range(n):
+        bot.handle_event(sample[i % len(sample)])
+    return (time.perf_counter() - start) / n
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', type=int, default=200000)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    config = BotConfig('bench', '', '')
+    before = run(ProbeBot(config), args.n)
+    after = run(BasicBot(config), args.n)
+    print(f'getattr probing  {before * 1e9:8.0f} ns/event')
+    print(f'handler table    {after * 1e9:8.0f} ns/event')
+    print(f'speedup          {before / after:8.2f}x')
@@ -1,4 +1,10 @@
 from __future__ import annotations
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+)
 
 # avoid cyclic import, but keep type checking
 from typing import TYPE_CHECKING
@@ -19,3 +25,11 @@ class Action:
 
     def cleanup(self) -> None:
         ...
+
+    def checkpoint(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """ (kind, arguments) to recreate this action after a restart
+
+            See BasicBot.restore_action. Actions are recreated from the
+            start rather than resumed, None means don't recreate it.
+        """
+        return None
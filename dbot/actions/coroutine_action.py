@@ -0,0 +1,305 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    FrozenSet,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+)
+import logging
+
+# avoid cyclic import, but keep type checking
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from dbot.bot import BasicBot
+
+import dbot.network.events as events
+from dbot.actions.action import Action
+from dbot.common.timers import (
+    Timer,
+    TimerWheel,
+)
+from dbot.state.reactive import Predicate
+
+
+EventPredicate = Callable[[events.GameEvent], bool]
+
+
+class Wait:
+    """ Something a CoroutineAction can await, see BotCore.until* """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+    ) -> None:
+        self.timeout = timeout
+        self.action: Optional[CoroutineAction] = None
+        self.timer: Optional[Timer] = None
+
+    def __await__(self) -> Generator[Wait, Any, Any]:
+        result = yield self
+        return result
+
+    def poll(self) -> Tuple[bool, Any]:
+        """ (True, result) if the wait is already over """
+        return False, None
+
+    def timed_out(self) -> Any:
+        """ what await returns on timeout """
+        return None
+
+
+class UntilEvent(Wait):
+    """ resumes with the next matching GameEvent, or None on timeout """
+
+    def __init__(
+        self,
+        name: str,
+        predicate: Optional[EventPredicate] = None,
+        timeout: Optional[float] = None,
+    ) -> None:
+        super().__init__(timeout)
+        self.name = name
+        self.predicate = predicate
+
+    def matches(
+        self,
+        event: events.GameEvent,
+    ) -> bool:
+        return self.predicate is None or self.predicate(event)
+
+
+class Until(Wait):
+    """ resumes with True once predicate() holds, or False on timeout """
+
+    def __init__(
+        self,
+        predicate: Callable[[], bool],
+        timeout: Optional[float] = None,
+    ) -> None:
+        super().__init__(timeout)
+        self.predicate = predicate
+        self.unsubscribe: Optional[Callable[[], None]] = None
+
+    @property
+    def reactive(self) -> bool:
+        return isinstance(self.predicate, Predicate)
+
+    def poll(self) -> Tuple[bool, Any]:
+        if self.predicate():
+            return True, True
+        return False, None
+
+    def timed_out(self) -> Any:
+        return False
+
+
+class Sleep(Wait):
+    """ resumes after some seconds """
+
+    def __init__(
+        self,
+        seconds: float,
+    ) -> None:
+        super().__init__(seconds)
+
+    def poll(self) -> Tuple[bool, Any]:
+        if self.timeout is not None and self.timeout <= 0:
+            return True, None
+        return False, None
+
+
+class WaitRegistry:
+    """ Pending waits of CoroutineActions and what resumes them
+
+        Event waits are resumed from BotCore.handle_event, right after the
+        event's handlers ran. Plain predicate waits are checked after every
+        handled event and after timers fire, since those are the only
+        things that change state. Waits on a reactive Predicate subscribe
+        to it instead, and are only looked at once it turns true.
+        Timeouts and sleeps are timers.
+    """
+
+    def __init__(
+        self,
+        timers: TimerWheel,
+        on_new_event: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.timers = timers
+        self.on_new_event = on_new_event
+        self.events: Dict[str, List[UntilEvent]] = {}
+        self.predicates: List[Until] = []
+        # reactive waits, and those whose Predicate has turned true
+        self.subscribed: List[Until] = []
+        self.ready: List[Until] = []
+
+    def __len__(self) -> int:
+        n_events = sum(len(w) for w in self.events.values())
+        return n_events + len(self.predicates) + len(self.subscribed)
+
+    @property
+    def event_names(self) -> FrozenSet[str]:
+        """ events someone is waiting for, these must be decoded """
+        return frozenset(self.events.keys())
+
+    def add(
+        self,
+        wait: Wait,
+        action: CoroutineAction,
+    ) -> None:
+        wait.action = action
+        if wait.timeout is not None:
+            wait.timer = self.timers.call_later(
+                wait.timeout,
+                self.expire,
+                wait,
+            )
+        if isinstance(wait, UntilEvent):
+            waiting = self.events.setdefault(wait.name, [])
+            waiting.append(wait)
+            if len(waiting) == 1 and self.on_new_event is not None:
+                # may not be subscribed to it yet
+                self.on_new_event()
+        elif isinstance(wait, Until) and wait.reactive:
+            assert isinstance(wait.predicate, Predicate)
+            wait.unsubscribe = wait.predicate.subscribe(
+                lambda value: self.wake(wait, value),
+            )
+            self.subscribed.append(wait)
+        elif isinstance(wait, Until):
+            self.predicates.append(wait)
+
+    def wake(
+        self,
+        wait: Until,
+        value: Any,
+    ) -> None:
+        """ a reactive wait's Predicate changed, resumed in check() """
+        if value:
+            self.ready.append(wait)
+
+    def discard(
+        self,
+        wait: Wait,
+    ) -> None:
+        """ forget a wait without resuming it """
+        wait.action = None
+        self.timers.cancel(wait.timer)
+        wait.timer = None
+        if isinstance(wait, UntilEvent):
+            waiting = self.events.get(wait.name)
+            if waiting is not None and wait in waiting:
+                waiting.remove(wait)
+                if len(waiting) == 0:
+                    del self.events[wait.name]
+        elif isinstance(wait, Until):
+            if wait.unsubscribe is not None:
+                wait.unsubscribe()
+                wait.unsubscribe = None
+            if wait in self.subscribed:
+                self.subscribed.remove(wait)
+            if wait in self.predicates:
+                self.predicates.remove(wait)
+
+    def finish(
+        self,
+        wait: Wait,
+        result: Any,
+    ) -> None:
+        action = wait.action
+        self.discard(wait)
+        if action is not None:
+            action.resume(result)
+
+    def expire(
+        self,
+        wait: Wait,
+    ) -> None:
+        """ timer: the wait's timeout (or sleep) ran out """
+        wait.timer = None
+        self.finish(wait, wait.timed_out())
+
+    def dispatch(
+        self,
+        event: events.GameEvent,
+    ) -> None:
+        waiting = self.events.get(event.event_name)
+        if waiting is not None:
+            for wait in list(waiting):
+                if wait.action is not None and wait.matches(event):
+                    self.finish(wait, event)
+        self.check()
+
+    def check(self) -> None:
+        """ resume any predicate waits that now hold """
+        ready, self.ready = self.ready, []
+        for wait in ready:
+            if wait.action is not None:
+                self.finish(wait, True)
+        for wait in list(self.predicates):
+            if wait.action is not None and wait.predicate():
+                self.finish(wait, True)
+
+
+class CoroutineAction(Action):
+    """ An Action written as a coroutine instead of a state machine
+
+        Subclasses implement `async def run()`, awaiting the waits from
+        BotCore (until_event, until and sleep) in between doing things.
+        These aren't asyncio coroutines: they are driven by the bot's own
+        events and timers, so they work with either run loop. The action
+        starts on its first step and is complete when run returns.
+    """
+
+    def __init__(
+        self,
+        bot: BasicBot,
+    ) -> None:
+        super().__init__(bot)
+        self.coroutine: Optional[Coroutine[Wait, Any, None]] = None
+        self.waiting: Optional[Wait] = None
+        self.done = False
+
+    async def run(self) -> None:
+        raise NotImplementedError('CoroutineAction.run should be overridden')
+
+    def step(self) -> bool:
+        if self.coroutine is None:
+            self.coroutine = self.run()
+            self.resume(None)
+        return self.done
+
+    def resume(
+        self,
+        result: Any,
+    ) -> None:
+        """ run until the next wait that isn't already over """
+        assert self.coroutine is not None
+        self.waiting = None
+        while True:
+            try:
+                wait = self.coroutine.send(result)
+            except StopIteration:
+                self.done = True
+                return
+            except Exception:
+                self.done = True
+                raise
+            ready, result = wait.poll()
+            if not ready:
+                self.waiting = wait
+                self.bot.waits.add(wait, self)
+                return
+
+    def cleanup(self) -> None:
+        if self.waiting is not None:
+            self.bot.waits.discard(self.waiting)
+            self.waiting = None
+        if self.coroutine is not None:
+            self.coroutine.close()
+        if not self.done:
+            logging.debug(f'{type(self).__name__} stopped early')
@@ -1,6 +1,9 @@
 from __future__ import annotations
 from typing import (
+    Any,
     Dict,
+    Optional,
+    Tuple,
 )
 import enum
 import logging
@@ -65,6 +68,9 @@ class GrindAction(Action):
         self.boss_defeated = False
         self.target = target
 
+    def checkpoint(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return 'grind', {'target': self.target.value}
+
     def set_state(
         self,
         new_state: GrindActionState,
@@ -105,7 +111,7 @@ class GrindAction(Action):
             path = OverworldPathfinder.circle_field_west()
             self.bot.goto(path)
         elif self.bot.state.map() == 'town':
-            src = (self.bot.me['coords']['x'], self.bot.me['coords']['y'])
+            src = self.bot.position
             path = TownPathfinder.path_to(src, 'overworld')
             self.bot.goto(path)
         else:
@@ -1,13 +1,14 @@
 from __future__ import annotations
 from typing import (
+    Any,
     Dict,
     List,
     Optional,
+    Tuple,
 )
 import enum
 import logging
 import time
-import pathlib
 import random
 
 # avoid cyclic import, but keep type checking
@@ -61,13 +62,18 @@ class MapAction(Action):
             MapActionState.ready:      self.do_ready,
             MapActionState.none:       self.do_none,
         }
-        self.directory = pathlib.Path('ignore') / f'{self.bot.name}_maps'
-        self.directory.mkdir(parents=True, exist_ok=True)
-        self.mapper = CollisionManager(str(self.directory))
+        # the bot's maps, which it syncs and shares (see BotCore.maps)
+        self.mapper: CollisionManager = self.bot.maps
 
         self.current_destination: Optional[Location] = None
         self.queue: List[Point] = []
 
+    def checkpoint(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        return 'map', {
+            'focus_map': self.focus_map,
+            'frequent_saves': self.frequent_saves,
+        }
+
     @property
     def map(self) -> Optional[CollisionMap]:
         if self.current_destination is not None:
@@ -88,16 +94,16 @@ class MapAction(Action):
             self.dest = None
 
         if self.frequent_saves:
-            self.mapper.save()
+            self.mapper.sync()
 
     def on_movePlayer(
         self,
         e: events.MovePlayer,
     ) -> None:
         player = self.bot.state.get_player(e.username)
-        if player is not None:
-            x = int(player['coords']['x'])
-            y = int(player['coords']['y'])
+        # an unlocated player's x and y are placeholders
+        if player is not None and player.located:
+            x, y = player.x, player.y
             if self.map is not None:
                 self.map.set(x, y, False)
                 self.resolved((x, y))
@@ -306,18 +312,20 @@ class MapAction(Action):
                     actual_map,
                     (cx, cy),
                 )
-                self.bot.say(''.join([
-                    'dbots transported at ',
-                    f'{expected_map} {tx} {ty} to ',
-                    f'{actual_map} {cx} {cy}',
-                ]), 'wsay')
+                if self.bot.shared_maps is None:
+                    self.bot.say(''.join([
+                        'dbots transported at ',
+                        f'{expected_map} {tx} {ty} to ',
+                        f'{actual_map} {cx} {cy}',
+                    ]), 'wsay')
             else:
                 # we correctly bonked
                 self.map.set(*self.current_destination.point, True)
-                self.bot.say(
-                    f'dbots bonked at {self.current_destination.map} {tx} {ty}',
-                    'wsay',
-                )
+                if self.bot.shared_maps is None:
+                    self.bot.say(
+                        f'dbots bonked at {self.current_destination.map} {tx} {ty}',
+                        'wsay',
+                    )
                 self.resolved(self.current_destination.point)
         else:
             logging.warning('self.map is None in walking state')
@@ -2,6 +2,10 @@ from __future__ import annotations
 import enum
 import logging
 
+from dbot.common.common import (
+    Record,
+    setfield,
+)
 from dbot.common.type_help import *
 
 
@@ -10,7 +14,12 @@ class BattleEventType(enum.Enum):
     ...
 
 
-class Targetable:
+class Targetable(Record):
+
+    __slots__ = ('type', 'group', 'index')
+    type: str
+    group: str
+    index: int
 
     def __init__(
         self,
@@ -18,12 +27,16 @@ class Targetable:
         group: str,
         index: int,
     ) -> None:
-        self.type = typ_
-        self.group = group
-        self.index = index
+        setfield(self, 'type', typ_)
+        setfield(self, 'group', group)
+        setfield(self, 'index', index)
+
 
+class BattleEvent(Record):
 
-class BattleEvent:
+    __slots__ = ('type', 'values')
+    type: str
+    values: Dict[str, Any]
 
     def __init__(
         self,
@@ -31,8 +44,8 @@ class BattleEvent:
         *args,
         **kwargs,
     ) -> None:
-        self.type = typ_
-        self.values = kwargs
+        setfield(self, 'type', typ_)
+        setfield(self, 'values', kwargs)
 
     # TODO: typing for events
 
@@ -1,10 +1,10 @@
 from __future__ import annotations
 from typing import (
+    Callable,
     Optional,
 )
 import logging
 import enum
-import time
 
 # avoid cyclic import, but keep type checking
 from typing import TYPE_CHECKING
@@ -12,6 +12,7 @@ if TYPE_CHECKING:
     from dbot.bot import BotCore
 
 import dbot.network.events as events
+from dbot.common.timers import Timer
 
 
 class BattleState(enum.Enum):
@@ -26,25 +27,52 @@ class BattleState(enum.Enum):
 
 class BattleController:
 
+    # GameEvents check_event looks at, including in subclasses
+    catch_all_events = frozenset({
+        'playOutBattleRound',
+        'playerUpdate',
+    })
+
     def __init__(
         self,
         bot: BotCore,
     ) -> None:
         self.bot = bot
-        self.next_round = 0.0
         self.round_start_delay = 3.0
         self.state = BattleState.waiting
+        # the one pending deadline, see set_timer
+        self.timer: Optional[Timer] = None
 
         self.next_ability: Optional[int] = None
         self.next_target: Optional[int] = None
 
     def step(self) -> None:
-        if self.state == BattleState.waiting:
-            # waiting for round to complete -> do nothing
-            #                               -> go to ready state
-            if time.time() > self.next_round:
-                logging.debug('next round ready')
-                self.state = BattleState.ready
+        # waiting for round to complete -> round_ready timer
+        ...
+
+    #
+    # timers
+    #
+
+    def set_timer(
+        self,
+        delay: float,
+        callback: Callable[[], None],
+    ) -> None:
+        """ replace the pending timer, if any """
+        self.bot.timers.cancel(self.timer)
+        self.timer = self.bot.timers.call_later(delay, callback)
+
+    def clear_timer(self) -> None:
+        self.bot.timers.cancel(self.timer)
+        self.timer = None
+
+    def round_ready(self) -> None:
+        """ timer: waiting -> ready, then step right away """
+        self.timer = None
+        logging.debug('next round ready')
+        self.state = BattleState.ready
+        self.step()
 
     #
     # event handling
@@ -70,18 +98,19 @@ class BattleController:
                 logging.info(f'round when not targetted? ({self.state.value})')
             seconds = float(e.duration) / 1000.0
             logging.debug(f'next round in {seconds} seconds')
-            self.next_round = time.time() + seconds + 0.5
+            self.set_timer(seconds + 0.5, self.round_ready)
             self.state = BattleState.waiting
             return True
         return False
 
     def start(self) -> None:
         logging.debug('battle starting')
-        self.next_round = time.time() + self.round_start_delay
+        self.set_timer(self.round_start_delay, self.round_ready)
         self.state = BattleState.waiting
 
     def leave(self) -> None:
         logging.debug('battle done')
+        self.clear_timer()
         self.state = BattleState.not_in_battle
 
 
@@ -93,7 +122,6 @@ class SimpleClericController(BattleController):
     ) -> None:
         super().__init__(bot)
         self.select_timeout = 2.0
-        self.selected_at = 0.0
 
     def step(self) -> None:
         super().step()
@@ -109,13 +137,15 @@ class SimpleClericController(BattleController):
             logging.debug(f'using {self.next_ability} on {self.next_target}')
             self.bot.socket.send_keypress(str(self.next_ability))
             self.state = BattleState.selected
-            self.selected_at = time.time()
-        elif (
-            self.state == BattleState.selected and
-            time.time() > self.selected_at + self.select_timeout
-        ):
+            self.set_timer(self.select_timeout, self.select_expired)
+
+    def select_expired(self) -> None:
+        """ timer: no selectedAbility came back, try again """
+        self.timer = None
+        if self.state == BattleState.selected:
             logging.info('select didnt work, resetting')
             self.state = BattleState.ready
+            self.step()
 
     def check_event(
         self,
@@ -138,7 +168,7 @@ class SimpleClericController(BattleController):
                 self.next_target  = None
                 self.state = BattleState.targetted
                 # just in case something breaks
-                self.next_round = time.time() + 25.0
+                self.set_timer(25.0, self.round_ready)
                 return True
         return False
 
@@ -1,5 +1,8 @@
 from __future__ import annotations
 from typing import (
+    Any,
+    Callable,
+    Dict,
     List,
     Optional,
     Tuple,
@@ -7,14 +10,33 @@ from typing import (
     TypeVar,
 )
 
+import asyncio
 import logging
+import pathlib
 import time
 import traceback
 
 import dbot.network.events as events
-from dbot.network.retrosocket import RetroSocket
+from dbot.network.coalesce import Coalescer
+from dbot.network.subscriptions import handled_events
+from dbot.network.retrosocket import (
+    AsyncRetroSocket,
+    BaseRetroSocket,
+    RetroSocket,
+)
 
+from dbot.state.checkpoint import (
+    ActionSnapshot,
+    Checkpoint,
+    CheckpointWriter,
+)
+import dbot.state.checkpoint as checkpoint
 from dbot.state.party import Party
+from dbot.state.reactive import (
+    Predicate,
+    Tracker,
+    computed,
+)
 from dbot.state.state import GameState
 from dbot.state.uistate import UIState
 
@@ -27,6 +49,13 @@ from dbot.battle.battle_controller import (
 )
 
 from dbot.actions.action import Action
+from dbot.actions.coroutine_action import (
+    EventPredicate,
+    Sleep,
+    Until,
+    UntilEvent,
+    WaitRegistry,
+)
 from dbot.actions.map_action import MapAction
 from dbot.actions.party_action import PartyAction
 from dbot.actions.grind_action import (
@@ -35,11 +64,16 @@ from dbot.actions.grind_action import (
 )
 
 from dbot.config import BotConfig
+from dbot.common.timers import (
+    Timer,
+    TimerWheel,
+)
 from dbot.common.type_help import *
 from dbot.movement.pathfinding import Point
 from dbot.movement.movement import MovementController
+from dbot.movement.collision import CollisionManager
+from dbot.movement.mapstore import SharedMapStore
 from dbot.common.common import (
-    Direction,
     Player,
     UIPositions,
 )
@@ -62,29 +96,130 @@ class BotCore:
         self.friends = config.friends
 
         # network
-        self._socket: Optional[RetroSocket] = None
+        self._socket: Optional[BaseRetroSocket] = None
         self.logging_out = False
+        self.coalescer: Optional[Coalescer] = None
+        if config.coalesce:
+            self.coalescer = Coalescer()
+
+        # process CPU seconds spent in do_step (see run_async)
+        self.cpu_time = 0.0
+        # process CPU seconds spent in sockets run_async has closed
+        self.socket_cpu_time = 0.0
+        self.n_errors = 0
+
+        # everything time based runs off these, fired from do_step
+        self.timers = TimerWheel()
+        self.action_interval = 0.5
+        self.action_timer: Optional[Timer] = None
+        self.evict_interval = 60.0
+        self.evict_timer: Optional[Timer] = None
+        self.checkpoint_timer: Optional[Timer] = None
+        self.checkpointer: Optional[CheckpointWriter] = None
+        if self.checkpoint_file is not None:
+            self.checkpointer = CheckpointWriter(self.checkpoint_file)
+        # checkpoint loaded at startup, until its actions are resumed
+        self.restored: Optional[Checkpoint] = None
+        self.checkpoint_loaded = False
+        # collision maps, loaded on first use (see maps). Logs are
+        # synced every sync_maps_interval, and with shared_maps set
+        # discoveries are exchanged as often as the store polls.
+        self._maps: Optional[CollisionManager] = None
+        self.shared_maps: Optional[SharedMapStore] = None
+        self.sync_maps_interval = 1.0
+        self.sync_maps_timer: Optional[Timer] = None
+        self.exchange_timer: Optional[Timer] = None
+        # what CoroutineActions are waiting on
+        self.waits = WaitRegistry(self.timers, self.refresh_subscriptions)
 
         # gamestate
         self.battle: Optional[Battle] = None
+        self.tracker = Tracker()
         self.party = Party(self, [self.name])
-        self.state = GameState()
-        self.ui = UIState()
+        self.state = GameState(
+            self.tracker,
+            max_players = config.max_players,
+            player_ttl = config.player_ttl,
+            max_vars = config.max_vars,
+            clock = self.timers.clock,
+        )
+        self.ui = UIState(self.tracker)
+
+        # bound handlers, keyed by (prefix, name, in battle), only for
+        # names some target defines, the rest share _fallback_handlers
+        self._dispatch_table: Dict[Tuple[str, str, bool], List[Callable]] = {}
+        self._fallback_handlers: Dict[bool, List[Callable]] = {}
 
         # controllers
-        self.battler : BattleController = SimpleClericController(self)
-        self.mover = MovementController(self)
+        self._battler: BattleController = SimpleClericController(self)
+        self._mover = MovementController(self)
 
     #
     # network properties
     #
 
     @property
-    def socket(self) -> RetroSocket:
+    def socket(self) -> BaseRetroSocket:
         if self._socket is not None:
             return self._socket
         raise RuntimeError('not connected')
 
+    @socket.setter
+    def socket(self, socket: BaseRetroSocket) -> None:
+        self._socket = socket
+
+    @property
+    def connected(self) -> bool:
+        return self._socket is not None
+
+    @property
+    def capture_file(self) -> Optional[str]:
+        if self.config.capture is None:
+            return None
+        return self.config.capture.format(name=self.name)
+
+    @property
+    def checkpoint_file(self) -> Optional[str]:
+        if self.config.checkpoint is None:
+            return None
+        return self.config.checkpoint.format(name=self.name)
+
+    @property
+    def maps(self) -> CollisionManager:
+        if self._maps is None:
+            directory = pathlib.Path('ignore') / f'{self.name}_maps'
+            directory.mkdir(parents=True, exist_ok=True)
+            self._maps = CollisionManager(str(directory))
+            if self.config.shared_maps is not None:
+                self.shared_maps = SharedMapStore(
+                    self.config.shared_maps,
+                    self.name,
+                )
+                self._maps.share(self.shared_maps)
+        return self._maps
+
+    #
+    # controllers
+    #
+
+    @property
+    def battler(self) -> BattleController:
+        return self._battler
+
+    @battler.setter
+    def battler(self, battler: BattleController) -> None:
+        self._battler = battler
+        self.invalidate_handlers()
+
+    @property
+    def mover(self) -> MovementController:
+        return self._mover
+
+    @mover.setter
+    def mover(self, mover: MovementController) -> None:
+        self._mover = mover
+        self.invalidate_handlers()
+
     #
     # convenience properties
     #
@@ -97,19 +232,21 @@ class BotCore:
 
     @property
     def position(self) -> Point:
-        return (
-            int(self.me['coords']['x']),
-            int(self.me['coords']['y']),
-        )
+        me = self.me
+        return (me.x, me.y)
 
-    @property
-    def logged_in_friends(self) -> List[str]:
+    @computed
+    def online_friends(self) -> Tuple[str, ...]:
         logged_in: List[str] = []
         for friend in self.friends:
             assert friend != self.name
             if friend in self.state.players:
                 logged_in.append(friend)
-        return list(sorted(logged_in))
+        return tuple(sorted(logged_in))
+
+    @property
+    def logged_in_friends(self) -> List[str]:
+        return list(self.online_friends)
 
     @property
     def logged_in_bots(self) -> List[str]:
@@ -117,9 +254,17 @@ class BotCore:
             [self.name] + self.logged_in_friends
         ))
 
-    @property
+    @computed
     def is_bot_leader(self) -> bool:
-        return self.logged_in_bots[0] == self.name
+        return min(self.online_friends, default=self.name) >= self.name
+
+    def predicate(
+        self,
+        function: Callable[[], T],
+        name = '',
+    ) -> Predicate[T]:
+        """ a cached function of game, party and ui state, see reactive.py """
+        return self.tracker.predicate(function, name)
 
     @property
     def is_in_battle(self) -> bool:
@@ -131,92 +276,449 @@ class BotCore:
 
     def run_forever(self) -> None:
 
-        n_errors = 0
-        last_action = 0.0
-        loop_timeout = 0.2
-        action_timeout = 0.5
-
-        with RetroSocket() as s:
+        with RetroSocket(
+            self.config.host,
+            self.config.port,
+            self.config.secure,
+            self.capture_file,
+        ) as s:
             self._socket = s
+            self.refresh_subscriptions()
+            self.restore_checkpoint()
+            self.start_actions()
             try:
                 while not self.logging_out:
-                    now = time.time()
-                    do_action = (now - last_action) > action_timeout
-                    self.do_step(do_action)
-                    if do_action:
-                        last_action = now
-                    time.sleep(loop_timeout)
+                    s.wait_for_event(self.time_to_next_timer())
+                    self.safe_step()
             except KeyboardInterrupt as e:
                 s.send_logout()
                 time.sleep(1)
                 return
-            except Exception as e:
-                n_errors += 1
-                if n_errors > self.config.max_errors:
-                    logging.error('hit max errors')
-                    raise e
-                else:
-                    self.warn_exception(e)
             finally:
+                self.stop_actions()
+                self.close_maps()
+                self.stop_checkpoints()
                 self._socket = None
 
-    def do_step(
+    async def run_async(self) -> None:
+        """ asyncio version of run_forever
+
+            Like run_forever, the loop sleeps until the socket receives an
+            event or the next timer is due.
+        """
+
+        async with AsyncRetroSocket(
+            self.config.host,
+            self.config.port,
+            self.config.secure,
+            self.capture_file,
+        ) as s:
+            self._socket = s
+            self.refresh_subscriptions()
+            self.restore_checkpoint()
+            self.start_actions()
+            try:
+                while not self.logging_out:
+                    await s.wait_for_event(self.time_to_next_timer())
+                    start = time.process_time()
+                    self.safe_step()
+                    self.cpu_time += time.process_time() - start
+            except (KeyboardInterrupt, asyncio.CancelledError):
+                s.send_logout()
+                await s.flush()
+                raise
+            finally:
+                self.stop_actions()
+                self.close_maps()
+                try:
+                    await self.stop_checkpoints_async()
+                finally:
+                    # fleet stats read this after the socket is gone
+                    self.socket_cpu_time += s.cpu_time
+                    self._socket = None
+
+    def time_to_next_timer(
         self,
-        do_actions: bool,
-    ) -> None:
-        while not self.socket.event_queue.empty():
-            # handle all new events
-            event = self.socket.event_queue.get()
+        limit = 1.0,
+    ) -> float:
+        """ seconds until a timer is due, at most limit """
+        deadline = self.timers.next_deadline()
+        if deadline is None:
+            return limit
+        wait = deadline - self.timers.clock()
+        return min(max(wait, 0.0), limit)
+
+    def safe_step(self) -> None:
+        """ do_step, but only give up after config.max_errors exceptions """
+        try:
+            self.do_step()
+        except Exception as e:
+            self.n_errors += 1
+            if self.n_errors > self.config.max_errors:
+                logging.error('hit max errors')
+                raise e
+            self.warn_exception(e)
+
+    def do_step(self) -> None:
+        # handle new events, up to the budget so that a flood of them
+        # can't hold up timers. Leftovers are handled next step.
+        budget = self.config.event_budget or None
+        batch = self.socket.drain_events(budget)
+        if self.coalescer is not None:
+            batch = self.coalescer.coalesce(batch)
+        for event in batch:
             self.handle_event(event)
 
-        if do_actions:
-            # then do any actions
-            if self.is_in_battle:
-                self.battler.step()
-            else:
-                self.mover.step()
-                self.step()
+        # then anything due, including step_actions
+        if self.timers.advance() > 0 and len(self.waits) > 0:
+            self.waits.check()
 
-    def step(self) -> None:
-        # To be implemented by bots
+    #
+    # actions
+    #
+
+    def start_actions(self) -> None:
+        self.stop_actions()
+        self.action_timer = self.timers.call_later(0.0, self.step_actions)
+        self.evict_timer = self.timers.call_later(
+            self.evict_interval,
+            self.evict_state,
+        )
+        if self.checkpointer is not None:
+            self.checkpoint_timer = self.timers.call_later(
+                self.config.checkpoint_interval,
+                self.save_checkpoint,
+            )
+        self.sync_maps_timer = self.timers.call_later(
+            self.sync_maps_interval,
+            self.sync_maps,
+        )
+        if self.config.shared_maps is not None:
+            self.exchange_timer = self.timers.call_later(
+                0.0,
+                self.exchange_maps,
+            )
+
+    def stop_actions(self) -> None:
+        self.timers.cancel(self.action_timer)
+        self.action_timer = None
+        self.timers.cancel(self.evict_timer)
+        self.evict_timer = None
+        self.timers.cancel(self.checkpoint_timer)
+        self.checkpoint_timer = None
+        self.timers.cancel(self.sync_maps_timer)
+        self.sync_maps_timer = None
+        self.timers.cancel(self.exchange_timer)
+        self.exchange_timer = None
+
+    def evict_state(self) -> None:
+        """ timer: drop players not seen for a while, see GameState.evict """
+        self.evict_timer = self.timers.call_later(
+            self.evict_interval,
+            self.evict_state,
+        )
+        keep = {self.name, *self.friends, *self.party.players}
+        keep.update(self.party.target)
+        evicted = self.state.evict(keep)
+        if evicted > 0:
+            logging.debug(f'evicted {evicted} players')
+
+    #
+    # maps
+    #
+
+    def sync_maps(self) -> None:
+        """ timer: fsync recent discoveries, see CollisionManager.sync """
+        self.sync_maps_timer = self.timers.call_later(
+            self.sync_maps_interval,
+            self.sync_maps,
+        )
+        if self._maps is not None:
+            self._maps.sync()
+
+    def exchange_maps(self) -> None:
+        """ timer: trade discoveries with the other bots sharing maps """
+        maps = self.maps
+        shared = self.shared_maps
+        assert shared is not None
+        self.exchange_timer = self.timers.call_later(
+            shared.interval,
+            self.exchange_maps,
+        )
+        applied = shared.exchange(maps, force=True)
+        if len(applied) > 0:
+            self.maps_shared(applied)
+
+    def maps_shared(
+        self,
+        applied: List[Tuple[str, Point]],
+    ) -> None:
+        # To be implemented by bots with actions
         ...
 
-    def handle_event(
+    def close_maps(self) -> None:
+        """ stop sharing, and save the maps that changed """
+        if self._maps is None:
+            return
+        if self.shared_maps is not None:
+            self.shared_maps.close()
+            self._maps.share(None)
+            self.shared_maps = None
+        self._maps.save()
+
+    #
+    # checkpoints
+    #
+
+    def make_checkpoint(self) -> Checkpoint:
+        """ copy what we need to resume, see checkpoint.py """
+        route: List[Point] = []
+        if self.mover.target is not None:
+            route.append(self.mover.target)
+        route.extend(self.mover.queue)
+        return Checkpoint(
+            self.name,
+            self.state.snapshot_players(),
+            dict(self.state.vars),
+            self.state.current_map,
+            list(self.party.players),
+            list(self.party.target),
+            self.checkpoint_actions(),
+            route,
+        )
+
+    def checkpoint_actions(self) -> List[ActionSnapshot]:
+        # To be implemented by bots with actions
+        return []
+
+    def restore_actions(
         self,
-        event: events.GameEvent,
+        actions: List[ActionSnapshot],
     ) -> None:
-        handler_name = f'on_{event.event_name}'
-        self.dispatch_handlers(handler_name, event)
+        # To be implemented by bots with actions
+        ...
 
-    def dispatch_handlers(
+    def save_checkpoint(self) -> None:
+        """ timer: hand a checkpoint to the writer thread """
+        self.checkpoint_timer = self.timers.call_later(
+            self.config.checkpoint_interval,
+            self.save_checkpoint,
+        )
+        if self.checkpointer is not None:
+            self.checkpointer.submit(self.make_checkpoint())
+
+    def stop_checkpoints(self) -> None:
+        """ write a last checkpoint and wait for the writer """
+        if self.checkpointer is not None:
+            self.checkpointer.submit(self.make_checkpoint())
+            self.checkpointer.stop()
+
+    async def stop_checkpoints_async(self) -> None:
+        """ stop_checkpoints, waiting for the writer off the event loop """
+        if self.checkpointer is not None:
+            self.checkpointer.submit(self.make_checkpoint())
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.checkpointer.stop)
+
+    def restore_checkpoint(self) -> bool:
+        """ load the last checkpoint, if there is one
+
+            Players and vars are restored right away, to be corrected by
+            the server as it sends updates. Actions and the route wait
+            until we're in game, see resume_checkpoint.
+        """
+        filename = self.checkpoint_file
+        if filename is None or self.checkpoint_loaded:
+            return False
+        self.checkpoint_loaded = True
+        saved = checkpoint.load(filename)
+        if saved is None or saved.name != self.name:
+            return False
+        self.state.restore(saved.players, saved.vars, saved.current_map)
+        if len(saved.party_target) > 1:
+            self.party.set_target(saved.party_target)
+        self.restored = saved
+        age = time.time() - saved.saved_at
+        logging.info(f'restored {saved} from {age:.0f}s ago')
+        return True
+
+    def resume_checkpoint(
         self,
-        handler_name: str,
-        *args,
+        map_name: str,
     ) -> None:
-        # always call ui handlers
-        self.call_handler(self.ui, handler_name, *args)
+        """ restart restored actions and route, once in game
 
-        # call either battle or movement events
+            The route only makes sense on the map it was saved on.
+        """
+        saved = self.restored
+        if saved is None:
+            return
+        self.restored = None
+        self.restore_actions(saved.actions)
+        if map_name != saved.current_map:
+            if len(saved.route) > 0:
+                logging.info(
+                    f'not resuming route on {map_name}, '
+                    f'it was for {saved.current_map}'
+                )
+        elif len(saved.actions) == 0 and len(saved.route) > 0:
+            # a plain goto, actions plan their own routes
+            self.mover.goto(list(saved.route))
+
+    def step_actions(self) -> None:
+        """ timer: step the controllers and bot every action_interval """
+        # re-arm first, so an exception doesn't stop the actions
+        self.action_timer = self.timers.call_later(
+            self.action_interval,
+            self.step_actions,
+        )
         if self.is_in_battle:
-            self.call_handler(self.battler, handler_name, *args)
+            self.battler.step()
         else:
-            self.call_handler(self.mover, handler_name, *args)
+            self.mover.step()
+            self.step()
+
+    def step(self) -> None:
+        # To be implemented by bots
+        ...
+
+    #
+    # waits for CoroutineActions
+    #
 
-        # finally check bot handlers
-        self.call_handler(self, handler_name, *args)
+    def until_event(
+        self,
+        name: str,
+        predicate: Optional[EventPredicate] = None,
+        timeout: Optional[float] = None,
+    ) -> UntilEvent:
+        """ await the next `name` GameEvent (matching predicate) """
+        return UntilEvent(name, predicate, timeout)
+
+    def until(
+        self,
+        predicate: Callable[[], bool],
+        timeout: Optional[float] = None,
+    ) -> Until:
+        """ await predicate() becoming true, False if it timed out
+
+            A plain function is re-checked after every event. Pass a
+            Predicate (see BotCore.predicate) if it only reads tracked
+            state, it is then only re-evaluated when that state changes.
+        """
+        return Until(predicate, timeout)
+
+    def sleep(
+        self,
+        seconds: float,
+    ) -> Sleep:
+        return Sleep(seconds)
+
+    #
+    # event dispatch
+    #
 
-    def call_handler(
+    def handle_event(
         self,
-        obj: object,
-        handler_name,
+        event: events.GameEvent,
+    ) -> None:
+        for handler in self.handlers('on_', event.event_name):
+            handler(event)
+        if len(self.waits) > 0:
+            self.waits.dispatch(event)
+
+    def dispatch_handlers(
+        self,
+        handler_name: str,
         *args,
     ) -> None:
-        handler = getattr(obj, handler_name, None)
-        backup = getattr(obj, 'catch_all_handler', None)
-        if handler is not None:
+        for handler in self.handlers('', handler_name):
             handler(*args)
-        elif backup is not None:
-            backup(*args)
+
+    def handlers(
+        self,
+        prefix: str,
+        name: str,
+    ) -> List[Callable]:
+        """ bound handlers for f'{prefix}{name}', resolved once per mode """
+        key = (prefix, name, self.is_in_battle)
+        handlers = self._dispatch_table.get(key)
+        if handlers is None:
+            resolved = self.resolve_handlers(prefix + name, key[2])
+            if resolved is None:
+                # nothing handles it by name, don't grow the table for
+                # every update key the server makes up
+                return self.fallback_handlers(key[2])
+            handlers = self._dispatch_table[key] = resolved
+        return handlers
+
+    def fallback_handlers(
+        self,
+        in_battle: bool,
+    ) -> List[Callable]:
+        """ the catch-alls, for names no target handles """
+        handlers = self._fallback_handlers.get(in_battle)
+        if handlers is None:
+            handlers = []
+            for obj in self.handler_targets(in_battle):
+                backup = getattr(obj, 'catch_all_handler', None)
+                if backup is not None:
+                    handlers.append(backup)
+            self._fallback_handlers[in_battle] = handlers
+        return handlers
+
+    def handler_targets(
+        self,
+        in_battle: bool,
+    ) -> List[object]:
+        # always call ui handlers, then either battle or movement
+        # handlers, and finally bot handlers.
+        return [
+            self.ui,
+            self.battler if in_battle else self.mover,
+            self,
+        ]
+
+    def resolve_handlers(
+        self,
+        handler_name: str,
+        in_battle: bool,
+    ) -> Optional[List[Callable]]:
+        """ None if no target has handler_name, only catch-alls """
+        handlers: List[Callable] = []
+        named = False
+        for obj in self.handler_targets(in_battle):
+            handler = getattr(obj, handler_name, None)
+            backup = getattr(obj, 'catch_all_handler', None)
+            if handler is not None:
+                handlers.append(handler)
+                named = True
+            elif backup is not None:
+                handlers.append(backup)
+        if not named:
+            return None
+        return handlers
+
+    def invalidate_handlers(self) -> None:
+        """ call when a handler target (controller, action) changes """
+        self._dispatch_table.clear()
+        self._fallback_handlers.clear()
+        self.refresh_subscriptions()
+
+    def subscription_targets(self) -> List[object]:
+        """ objects whose handlers decide which events the socket decodes """
+        return [self.ui, self.mover, self.battler, self]
+
+    def refresh_subscriptions(self) -> None:
+        """ tell the socket to drop events none of our targets handle
+
+            Call this whenever a subscription target changes.
+        """
+        if self.connected:
+            names = handled_events(*self.subscription_targets())
+            if names is not None:
+                names = names | self.waits.event_names
+            self.socket.subscribe(names)
 
     #
     # logging
@@ -248,7 +750,7 @@ class BasicBot(BotCore):
         super().__init__(*args, **kwargs)
 
         # actions
-        self.commands = CommandHandler(self, config.command_prompt)
+        self.commands = CommandHandler(self, self.config.command_prompt)
         self.commands.add_default_commands()
         self.action_queue: List[Action] = []
 
@@ -264,6 +766,7 @@ class BasicBot(BotCore):
             if complete:
                 self.current_action.cleanup()
                 self.action_queue.pop(0)
+                self.invalidate_handlers()
 
     #
     # commands and actions
@@ -280,11 +783,61 @@ class BasicBot(BotCore):
         action: Action,
     ) -> None:
         self.action_queue.append(action)
+        self.invalidate_handlers()
+
+    def checkpoint_actions(self) -> List[ActionSnapshot]:
+        snapshots: List[ActionSnapshot] = []
+        for action in self.action_queue:
+            snapshot = action.checkpoint()
+            if snapshot is not None:
+                snapshots.append(snapshot)
+        return snapshots
+
+    def restore_actions(
+        self,
+        actions: List[ActionSnapshot],
+    ) -> None:
+        for kind, args in actions:
+            action = self.restore_action(kind, args)
+            if action is None:
+                logging.warning(f'cant restore {kind} action')
+            else:
+                self.enqueue_action(action)
+
+    def restore_action(
+        self,
+        kind: str,
+        args: Dict[str, Any],
+    ) -> Optional[Action]:
+        """ recreate an action from Action.checkpoint """
+        if kind == 'grind':
+            return GrindAction(self, GrindTarget(args['target']))
+        elif kind == 'map':
+            return MapAction(self, **args)
+        elif kind == 'party':
+            return PartyAction(self)
+        return None
+
+    def maps_shared(
+        self,
+        applied: List[Tuple[str, Point]],
+    ) -> None:
+        action = self.current_action
+        if isinstance(action, MapAction):
+            for _, point in applied:
+                action.resolved(point)
 
     def clear_actions(self) -> None:
         if self.current_action is not None:
             self.current_action.cleanup()
         self.action_queue = []
+        self.invalidate_handlers()
+
+    def subscription_targets(self) -> List[object]:
+        targets = super().subscription_targets()
+        if self.current_action is not None:
+            targets.append(self.current_action)
+        return targets
 
     #
     # game state update handlers
@@ -295,21 +848,18 @@ class BasicBot(BotCore):
         e: events.Update,
     ) -> None:
         """ core client state updates, passed on to onchange_* methods """
-        self.state.vars[e.key] = e.value
-        handler_name = f'onupdate_{e.key}'
-        self.dispatch_handlers(handler_name, e.value)
+        self.state.set_var(e.key, e.value)
+        for handler in self.handlers('onupdate_', e.key):
+            handler(e.value)
 
     def on_playerUpdate(
         self,
         e: events.PlayerUpdate,
     ) -> None:
-        player = self.state.get_player(e.username)
-        if player is not None:
-            player[e.key] = e.value
-            if e.username != self.name:
-                self.state.players_in_map.add(e.username)
-        else:
-            logging.warning(f'missing player moved: {e.username}')
+        player = self.state.ensure_player(e.username)
+        self.state.update_player(player, e.key, e.value)
+        if e.username != self.name:
+            self.state.players_in_map.add(e.username)
 
     #
     # login flow
@@ -351,7 +901,15 @@ class BasicBot(BotCore):
         self,
         e: events.PlayerSignedIn,
     ) -> None:
-        self.state.add_player(e.player)
+        if self.state.receives(('playerSignedIn', e.player.username)):
+            self.state.add_player(e.player)
+
+    def on_playerSignedOut(
+        self,
+        e: events.PlayerSignedOut,
+    ) -> None:
+        if self.state.receives(('playerSignedOut', e.username)):
+            self.state.remove_player(e.username)
 
     def on_playerPreviouslySignedIn(
         self,
@@ -359,12 +917,17 @@ class BasicBot(BotCore):
     ) -> None:
         for player in e.players:
             self.state.add_player(player)
+        if len(self.state.restored) > 0:
+            online = [p.username for p in e.players] + [self.name]
+            gone = self.state.reconcile(online)
+            logging.info(f'{gone} restored players have signed out')
 
     def on_joinMap(
         self,
         e: events.JoinMap,
     ) -> None:
         self.state.join_map(e.map_name)
+        self.resume_checkpoint(e.map_name)
         if self.stopped_at_leave_map and self.current_action is None:
             self.say(f'stopped at {e.map_name}', 'wsay')
             self.stopped_at_leave_map = False
@@ -394,19 +957,8 @@ class BasicBot(BotCore):
         # note: This method only updates player position in game stae,
         #       any logic about how this affects this bots movement is
         #       in movement.MovementController.on_movePlayer
-        player = self.state.get_player(e.username)
-        if player is None:
-            logging.warning(f'missing player moved: ${e.username}')
-            return
-
-        if e.direction == Direction.down:
-            player['coords']['y'] += 1
-        if e.direction == Direction.up:
-            player['coords']['y'] -= 1
-        if e.direction == Direction.left:
-            player['coords']['x'] -= 1
-        if e.direction == Direction.right:
-            player['coords']['x'] += 1
+        player = self.state.ensure_player(e.username)
+        self.state.move_player(player, e.direction)
 
         # TODO: make this not bad
         action = self.current_action
@@ -516,7 +1068,7 @@ class BasicBot(BotCore):
             int(self.state.vars.get('gold', 0)),
             int(self.state.vars.get('bankedGold', 0)),
         ])
-        level = str(self.me.get('level', 0))
+        level = str(self.me.level or 0)
         self.say(f"I'm {prompt}level {level}, {gold} gold", self.report_channel)
         self.report_state = 'none'
 
@@ -563,9 +1115,9 @@ class BasicBot(BotCore):
         x: int,
         y: int,
     ) -> None:
-        me = self.state.players[self.name]
-        screen_x = 150 - (me['coords']['x'] - x) * 16
-        screen_y = 120 - (me['coords']['y'] - y) * 16
+        me = self.me
+        screen_x = 150 - (me.x - x) * 16
+        screen_y = 120 - (me.y - y) * 16
         self.socket.send_click(screen_x, screen_y)
 
     #
@@ -586,10 +1138,17 @@ if __name__ == '__main__':
     parser.add_argument('botname')
     parser.add_argument('--config', type=str, default='config.json')
     parser.add_argument('--nerror', type=int, default=0)
+    parser.add_argument('--asyncio', action='store_true')
+    parser.add_argument('--capture', type=str, default=None)
     args = parser.parse_args()
 
     logging.getLogger().setLevel(logging.DEBUG)
 
     config = BotConfig.from_file(args.config, args.botname)
+    if args.capture is not None:
+        config.capture = args.capture
     bot = BasicBot(config)
-    bot.run_forever()
+    if args.asyncio:
+        asyncio.run(bot.run_async())
+    else:
+        bot.run_forever()
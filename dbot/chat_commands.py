@@ -3,6 +3,7 @@ from typing import (
     Callable,
     Dict,
     List,
+    Optional,
 )
 import logging
 import random
@@ -82,6 +83,10 @@ class CommandHandler:
             'debug',
             self.command_debug,
         ))
+        self.add_command(CommandConfig(
+            'memory',
+            self.command_memory,
+        ))
         self.add_command(CommandConfig(
             'goto',
             self.command_goto,
@@ -144,9 +149,8 @@ class CommandHandler:
         self,
         e: events.Message,
     ) -> None:
-        try:
-            parts = shlex.split(e.contents)
-        except ValueError:
+        parts = self.parse(e)
+        if parts is None:
             return
 
         if e.username == self.bot.name:
@@ -180,6 +184,27 @@ class CommandHandler:
         # finally, we can trigger the command
         config.handler(parts, e.username, e.channel, direct)
 
+    def parse(
+        self,
+        e: events.Message,
+    ) -> Optional[List[str]]:
+        """ the words of a message, None if it doesn't split
+
+            Bots sharing a world split each message once. The commands
+            still run on every bot, each acts on the bot it is for.
+        """
+        state = self.bot.state
+        if state.world is None:
+            return split(e.contents)
+        key = ('message', e.mid)
+        first, broadcast = state.world.receive(state.world_name, key)
+        if first:
+            broadcast.value = split(e.contents)
+        if broadcast.value is None:
+            return None
+        # handle() pops from it
+        return list(broadcast.value)
+
     #
     # commands
     #
@@ -228,8 +253,24 @@ class CommandHandler:
         print('--- debug command ---')
         print('#   players   #')
         pprint.pprint(self.bot.state.players)
+        if self.bot.coalescer is not None:
+            print('#  coalescing #')
+            print(self.bot.coalescer.report())
+        print('#    memory   #')
+        print(self.bot.state.memory_report())
+        if self.bot.state.world is not None:
+            print(self.bot.state.world.report())
         print('---------------------')
 
+    def command_memory(
+        self,
+        parts: List[str],
+        source: str,
+        channel: str,
+        direct: bool,
+    ) -> None:
+        self.bot.say(str(self.bot.state.memory_report()), channel)
+
     def command_grind(
         self,
         parts: List[str],
@@ -324,14 +365,15 @@ class CommandHandler:
         elif self.bot.state.map() != 'town':
             logging.warning('cant assemble, not in town')
         else:
+            on_map = self.bot.state.players_on_map()
             player = self.bot.state.get_player(source)
-            if player is None or source not in self.bot.state.players_in_map:
+            if player is None or source not in on_map:
                 logging.warning('cant assemble, source missing')
                 return
-            tx, ty = int(player['coords']['x']), int(player['coords']['y'])
+            tx, ty = player.x, player.y
             bots = [
                 bot for bot in self.bot.logged_in_bots
-                if bot == self.bot.name or bot in self.bot.state.players_in_map
+                if bot == self.bot.name or bot in on_map
             ]
             my_index = bots.index(self.bot.name)
             dx = (my_index % 3) - 1
@@ -385,3 +427,12 @@ class CommandHandler:
                     place2,
                     (int(x2), int(y2)),
                 )
+
+
+def split(
+    contents: str,
+) -> Optional[List[str]]:
+    try:
+        return shlex.split(contents)
+    except ValueError:
+        return None
@@ -1,12 +1,62 @@
 from typing import (
     Any,
     Dict,
+    Iterator,
     Optional,
+    Tuple,
 )
 import enum
 
 
-Player = Dict[str, Any]
+# assigns a Record attribute, only for use in __init__
+setfield = object.__setattr__
+
+
+class Record:
+    """ Base for small immutable value types
+
+        Subclasses list their attributes in __slots__, annotate them in
+        the class body for type checkers and assign them in __init__
+        with setfield. Instances have no __dict__ and reject
+        attribute assignment after construction.
+    """
+
+    __slots__ = ()
+    record_fields: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        slots = cls.__dict__.get('__slots__', ())
+        cls.record_fields = cls.record_fields + tuple(slots)
+
+    def __setattr__(
+        self,
+        name: str,
+        value: Any,
+    ) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __delattr__(
+        self,
+        name: str,
+    ) -> None:
+        raise AttributeError(f'{type(self).__name__} is immutable')
+
+    def __getstate__(self) -> Tuple[Any, ...]:
+        return tuple(getattr(self, f) for f in self.record_fields)
+
+    def __setstate__(
+        self,
+        state: Tuple[Any, ...],
+    ) -> None:
+        for field, value in zip(self.record_fields, state):
+            setfield(self, field, value)
+
+    def __repr__(self) -> str:
+        fields = ', '.join(
+            f'{f}={getattr(self, f)!r}' for f in self.record_fields
+        )
+        return f'{type(self).__name__}({fields})'
 
 
 class Direction(enum.Enum):
@@ -17,7 +67,29 @@ class Direction(enum.Enum):
     right = 'right'
 
 
-class PlayerData:
+# (dx, dy) of one step in each direction
+DIRECTION_DELTA: Dict[Direction, Tuple[int, int]] = {
+    Direction.up: (0, -1),
+    Direction.down: (0, 1),
+    Direction.left: (-1, 0),
+    Direction.right: (1, 0),
+}
+
+
+class PlayerData(Record):
+
+    __slots__ = (
+        'cierra',
+        'monthsSubscribed',
+        'permissions',
+        'subscriber',
+        'username',
+    )
+    cierra: bool
+    monthsSubscribed: Optional[int]
+    permissions: int
+    subscriber: bool
+    username: str
 
     def __init__(
         self,
@@ -27,11 +99,174 @@ class PlayerData:
         subscriber: bool,
         username: str,
     ) -> None:
-        self.cierra = cierra
-        self.monthsSubscribed = monthsSubscribed
-        self.permissions = permissions
-        self.subscriber = subscriber
+        setfield(self, 'cierra', cierra)
+        setfield(self, 'monthsSubscribed', monthsSubscribed)
+        setfield(self, 'permissions', permissions)
+        setfield(self, 'subscriber', subscriber)
+        setfield(self, 'username', username)
+
+
+class PlayerRecord:
+    """ What we know about a player, kept in GameState.players
+
+        Position and level are typed fields, any other playerUpdate keys
+        go in `extra`. Unlike Record this is mutable, it is updated in
+        place by the bot's handlers (call GameState.touch_player after).
+
+        The old dict interface (player['coords']['x'], player.get(...))
+        still works, but new code should use the fields.
+    """
+
+    __slots__ = (
+        'username',
+        'x',
+        'y',
+        'located',
+        'level',
+        'extra',
+        'seen',
+    )
+
+    def __init__(
+        self,
+        username: str,
+    ) -> None:
         self.username = username
+        self.x = 0
+        self.y = 0
+        # no coords until the first playerUpdate for them
+        self.located = False
+        self.level: Optional[int] = None
+        self.extra: Dict[str, Any] = {}
+        # clock time of the last update, see GameState.evict
+        self.seen = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f'PlayerRecord({self.username!r}, x={self.x}, y={self.y}, '
+            f'level={self.level}, extra={self.extra!r})'
+        )
+
+    @property
+    def position(self) -> Tuple[int, int]:
+        return (self.x, self.y)
+
+    def update(
+        self,
+        key: str,
+        value: Any,
+    ) -> None:
+        """ apply a playerUpdate """
+        if key == 'coords':
+            self.x = int(value['x'])
+            self.y = int(value['y'])
+            self.located = True
+        elif key == 'level':
+            self.level = int(value)
+        elif key == 'username':
+            self.username = value
+        else:
+            self.extra[key] = value
+
+    def step(
+        self,
+        direction: Direction,
+    ) -> None:
+        """ apply a movePlayer """
+        dx, dy = DIRECTION_DELTA[direction]
+        self.x += dx
+        self.y += dy
+
+    #
+    # dict compatibility
+    #
+
+    def __getitem__(
+        self,
+        key: str,
+    ) -> Any:
+        if key == 'coords':
+            if not self.located:
+                raise KeyError(key)
+            return CoordsView(self)
+        elif key == 'level':
+            if self.level is None:
+                raise KeyError(key)
+            return self.level
+        elif key == 'username':
+            return self.username
+        return self.extra[key]
+
+    def __setitem__(
+        self,
+        key: str,
+        value: Any,
+    ) -> None:
+        self.update(key, value)
+
+    def __contains__(
+        self,
+        key: object,
+    ) -> bool:
+        try:
+            self[key] # type: ignore
+        except KeyError:
+            return False
+        return True
+
+    def get(
+        self,
+        key: str,
+        default: Any = None,
+    ) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class CoordsView:
+    """ player['coords'], a read-only view of the record's x and y """
+
+    __slots__ = ('player',)
+
+    def __init__(
+        self,
+        player: PlayerRecord,
+    ) -> None:
+        self.player = player
+
+    def __repr__(self) -> str:
+        return repr(dict(self.items()))
+
+    def __getitem__(
+        self,
+        key: str,
+    ) -> int:
+        if key == 'x':
+            return self.player.x
+        elif key == 'y':
+            return self.player.y
+        raise KeyError(key)
+
+    def __setitem__(
+        self,
+        key: str,
+        value: int,
+    ) -> None:
+        # moving a player goes through GameState, which keeps the
+        # spatial index and `seen` up to date
+        raise TypeError(
+            "player['coords'] is read-only, use GameState.update_player"
+        )
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        yield 'x', self.player.x
+        yield 'y', self.player.y
+
+
+Player = PlayerRecord
+
 
 
 class UIPositions:
@@ -0,0 +1,268 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Callable,
+    List,
+    Optional,
+)
+
+import math
+import time
+
+
+# ticks per level: 256 at the bottom, then 64 per level above it. With
+# the default 10ms resolution that covers 2.56s, 2.7m, 2.9h and 7.8d.
+LEVEL_BITS = (8, 6, 6, 6)
+
+
+class Timer:
+    """ handle for a scheduled callback, see TimerWheel """
+
+    __slots__ = ('deadline', 'tick', 'callback', 'args', 'cancelled')
+
+    def __init__(
+        self,
+        deadline: float,
+        tick: int,
+        callback: Callable[..., Any],
+        args: tuple,
+    ) -> None:
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class TimerWheel:
+    """ Hierarchical timing wheel
+
+        Timers are hashed into slots by the tick they expire on. Level 0
+        holds the next 256 ticks; timers further out sit in coarser
+        levels and are cascaded down when their slot comes around, so
+        scheduling, cancelling and firing are all O(1) per timer.
+
+        Nothing runs on its own: the owner calls `advance` to fire due
+        timers, and can sleep until `next_deadline` in between. A timer
+        never fires before its deadline, and at most one resolution late.
+    """
+
+    def __init__(
+        self,
+        resolution = 0.01,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.resolution = resolution
+        self.clock = clock
+        # last tick that has been processed
+        self.tick = self.to_tick(clock())
+        self.levels: List[List[List[Timer]]] = [
+            [[] for _ in range(1 << bits)] for bits in LEVEL_BITS
+        ]
+        self.shifts: List[int] = []
+        shift = 0
+        for bits in LEVEL_BITS:
+            self.shifts.append(shift)
+            shift += bits
+        # timers scheduled for a tick already processed
+        self.due: List[Timer] = []
+        self.n_timers = 0
+        # timers in level 0, when there are none advance can skip ahead
+        self.n_near = 0
+        # tick of the earliest timer in the levels, maybe a cancelled
+        # one. Kept up by insert, recomputed by next_deadline only once
+        # advance has gone past it.
+        self.earliest: Optional[int] = None
+        self.earliest_stale = False
+
+    def __len__(self) -> int:
+        """ scheduled timers, including cancelled ones not yet cleared """
+        return self.n_timers
+
+    def to_tick(
+        self,
+        when: float,
+    ) -> int:
+        return math.ceil(when / self.resolution)
+
+    #
+    # scheduling
+    #
+
+    def call_at(
+        self,
+        when: float,
+        callback: Callable[..., Any],
+        *args: Any,
+    ) -> Timer:
+        """ call callback(*args) at clock() time `when` """
+        timer = Timer(when, self.to_tick(when), callback, args)
+        self.insert(timer)
+        self.n_timers += 1
+        return timer
+
+    def call_later(
+        self,
+        delay: float,
+        callback: Callable[..., Any],
+        *args: Any,
+    ) -> Timer:
+        """ call callback(*args) in delay seconds """
+        return self.call_at(self.clock() + delay, callback, *args)
+
+    def cancel(
+        self,
+        timer: Optional[Timer],
+    ) -> None:
+        """ cancel a timer, None and already fired timers are ignored """
+        if timer is not None:
+            timer.cancel()
+
+    def insert(
+        self,
+        timer: Timer,
+    ) -> None:
+        delta = timer.tick - self.tick
+        if delta <= 0:
+            self.due.append(timer)
+            return
+        for level, shift in enumerate(self.shifts):
+            bits = LEVEL_BITS[level]
+            if delta < 1 << (shift + bits) or level == len(LEVEL_BITS) - 1:
+                # the top level wraps, far timers are just cascaded
+                # back into it until they're within range
+                slot = (timer.tick >> shift) & ((1 << bits) - 1)
+                self.levels[level][slot].append(timer)
+                if level == 0:
+                    self.n_near += 1
+                if self.earliest is None or timer.tick < self.earliest:
+                    self.earliest = timer.tick
+                return
+
+    #
+    # firing
+    #
+
+    def advance(
+        self,
+        now: Optional[float] = None,
+    ) -> int:
+        """ fire every timer due by now, returns how many fired """
+        if now is None:
+            now = self.clock()
+        # the epsilon keeps now=next_deadline() from rounding a tick short
+        target = math.floor(now / self.resolution + 1e-6)
+
+        due, self.due = self.due, []
+        fired = self.fire(due)
+        if self.n_timers == 0:
+            # nothing to cascade, skip straight there
+            self.tick = max(self.tick, target)
+            self.earliest = None
+            self.earliest_stale = False
+            return fired
+
+        mask = (1 << LEVEL_BITS[0]) - 1
+        while self.tick < target:
+            if self.n_near == 0:
+                # nothing in level 0, jump to the next cascade
+                self.tick = min(target, self.tick | mask)
+                if self.tick == target:
+                    break
+            self.tick += 1
+            if self.tick & mask == 0:
+                self.cascade(1)
+                if len(self.due) > 0:
+                    # cascaded timers expiring on this very tick
+                    due, self.due = self.due, []
+                    fired += self.fire(due)
+            slot = self.levels[0][self.tick & mask]
+            if len(slot) > 0:
+                self.levels[0][self.tick & mask] = []
+                self.n_near -= len(slot)
+                fired += self.fire(slot)
+        if self.earliest is not None and self.earliest <= self.tick:
+            self.earliest_stale = True
+        return fired
+
+    def cascade(
+        self,
+        level: int,
+    ) -> None:
+        """ move the current slot of level down into the levels below """
+        if level >= len(LEVEL_BITS):
+            return
+        shift = self.shifts[level]
+        index = (self.tick >> shift) & ((1 << LEVEL_BITS[level]) - 1)
+        if index == 0:
+            self.cascade(level + 1)
+        timers = self.levels[level][index]
+        if len(timers) == 0:
+            return
+        self.levels[level][index] = []
+        for timer in timers:
+            if timer.cancelled:
+                self.n_timers -= 1
+            else:
+                self.insert(timer)
+
+    def fire(
+        self,
+        timers: List[Timer],
+    ) -> int:
+        fired = 0
+        for i, timer in enumerate(timers):
+            self.n_timers -= 1
+            if timer.cancelled:
+                continue
+            # mark it so a later cancel() is a harmless no-op
+            timer.cancelled = True
+            fired += 1
+            try:
+                timer.callback(*timer.args)
+            except BaseException:
+                # don't lose the rest, they fire on the next advance
+                for rest in timers[i + 1:]:
+                    self.due.append(rest)
+                raise
+        return fired
+
+    def next_deadline(self) -> Optional[float]:
+        """ when advance will next fire something, None for no timers
+
+            It can be early, for a timer that has since been cancelled.
+        """
+        for timer in self.due:
+            if not timer.cancelled:
+                return self.tick * self.resolution
+        if self.earliest_stale:
+            self.earliest = self.find_earliest()
+            self.earliest_stale = False
+        if self.earliest is None:
+            return None
+        return self.earliest * self.resolution
+
+    def find_earliest(self) -> Optional[int]:
+        """ tick of the earliest live timer in the levels """
+        best: Optional[int] = None
+        top = len(LEVEL_BITS) - 1
+        for level, shift in enumerate(self.shifts):
+            size = 1 << LEVEL_BITS[level]
+            slots = self.levels[level]
+            current = self.tick >> shift
+            for i in range(1, size + 1):
+                found = False
+                for timer in slots[(current + i) % size]:
+                    if timer.cancelled:
+                        continue
+                    found = True
+                    if best is None or timer.tick < best:
+                        best = timer.tick
+                if found and level != top:
+                    # slots are in expiry order, except at the top
+                    # level where far timers wrap around
+                    break
+        return best
@@ -114,7 +114,11 @@ def try_float_in(
     k: Union[int, str],
     e: Optional[float] = None,
 ) -> Optional[float]:
-    return try_type_in(d, k, float, e)
+    # whole numbers in a config file load as int
+    value = try_type_in(d, k, (int, float), e) # type: ignore
+    if value is None or isinstance(value, bool):
+        return e
+    return float(value)
 
 
 def try_str_in(
@@ -1,5 +1,7 @@
 from __future__ import annotations
 from typing import (
+    Any,
+    Dict,
     List,
     Optional,
 )
@@ -22,25 +24,73 @@ class BotConfig:
         admins: Optional[List[str]] = None,
         command_prompt = 'dbots',
         max_errors = 0,
+        host = 'retrommo-bots.herokuapp.com',
+        port = 443,
+        secure: Optional[bool] = None,
+        capture: Optional[str] = None,
+        event_budget = 200,
+        coalesce = False,
+        max_players = 2000,
+        player_ttl = 3600.0,
+        max_vars = 1000,
+        checkpoint: Optional[str] = None,
+        checkpoint_interval = 30.0,
+        shared_maps: Optional[str] = None,
     ) -> None:
         self.command_prompt = command_prompt
         self.max_errors = max_errors
+        self.host = host
+        self.port = port
+        self.secure = secure
+        # capture file for inbound messages, {name} is the bot name
+        self.capture = capture
+        # most events handled per loop step before actions run, 0 for no limit
+        self.event_budget = event_budget
+        # collapse superseded Update/PlayerUpdate events, see coalesce.py
+        self.coalesce = coalesce
+        # GameState limits, 0 for none. Players not seen for player_ttl
+        # seconds, or beyond max_players, are forgotten (see evict).
+        self.max_players = max_players
+        self.player_ttl = player_ttl
+        self.max_vars = max_vars
+        # state saved here to resume after a restart, {name} is the bot name
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        # sqlite file collision discoveries are shared through, instead
+        # of chat, by all bots on this machine
+        self.shared_maps = shared_maps
         self.friends = friends or []
         self.admins = admins or []
         self.password = password
         self.email = email
         self.name = name
 
+    @staticmethod
+    def read_file(
+        filename: str,
+    ) -> Dict[str, Any]:
+        path = pathlib.Path(filename)
+        if not (path.exists() and path.is_file()):
+            raise ValueError(f'no such config file: {filename}')
+        with path.open() as f:
+            return assert_type(json.load(f), dict)
+
+    @classmethod
+    def bot_names(
+        cls,
+        filename: str,
+    ) -> List[str]:
+        """ names of all bots in the config's bots section """
+        config = cls.read_file(filename)
+        return list(expect_dict_in(config, 'bots').keys())
+
     @classmethod
     def from_file(
         cls,
         filename: str,
         botname: str,
     ) -> BotConfig:
-        path = pathlib.Path(filename)
-        if path.exists() and path.is_file():
-            with path.open() as f:
-                config = json.load(f)
+        config = cls.read_file(filename)
         bots = expect_dict_in(config, 'bots')
         botconfig = expect_dict_in(bots, botname)
 
@@ -56,6 +106,21 @@ class BotConfig:
             k: v for k, v in dict(
                 command_prompt = try_str_in(config, 'command_prompt'),
                 max_errors = try_int_in(config, 'max_errors'),
+                host = try_str_in(config, 'host'),
+                port = try_int_in(config, 'port'),
+                secure = try_bool_in(config, 'secure'),
+                capture = try_str_in(config, 'capture'),
+                event_budget = try_int_in(config, 'event_budget'),
+                coalesce = try_bool_in(config, 'coalesce'),
+                max_players = try_int_in(config, 'max_players'),
+                player_ttl = try_float_in(config, 'player_ttl'),
+                max_vars = try_int_in(config, 'max_vars'),
+                checkpoint = try_str_in(config, 'checkpoint'),
+                checkpoint_interval = try_float_in(
+                    config,
+                    'checkpoint_interval',
+                ),
+                shared_maps = try_str_in(config, 'shared_maps'),
                 friends = friends,
                 admins = admins,
             ).items() if v is not None
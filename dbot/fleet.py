@@ -0,0 +1,243 @@
+from __future__ import annotations
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Set,
+    Type,
+)
+
+import asyncio
+import logging
+import os
+import resource
+import time
+
+from dbot.bot import BasicBot
+from dbot.config import BotConfig
+from dbot.network.retrosocket import AsyncRetroSocket
+from dbot.state.world import WorldModel
+
+
+def current_rss() -> int:
+    """ resident set size of this process in bytes """
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        # not linux, fall back to peak rss (kilobytes on linux, bytes on mac)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class BotStats:
+
+    def __init__(
+        self,
+        name: str,
+        cpu_time: float,
+        startup_rss: int,
+        running: bool,
+        state_bytes = 0,
+    ) -> None:
+        self.name = name
+        self.cpu_time = cpu_time
+        self.startup_rss = startup_rss
+        self.running = running
+        # approximate size of the bot's GameState, see memory_report
+        self.state_bytes = state_bytes
+
+    def __str__(self) -> str:
+        state = 'running' if self.running else 'stopped'
+        return ' '.join([
+            f'{self.name:<16}',
+            f'{state:<8}',
+            f'cpu {self.cpu_time:8.2f}s',
+            f'rss {self.startup_rss / 1024 / 1024:6.1f}MiB',
+            f'state {self.state_bytes / 1024:8.1f}KiB',
+        ])
+
+
+class FleetHost:
+    """ Runs many bots in one process on a shared asyncio event loop
+
+        Each bot keeps its own AsyncRetroSocket, but they share the
+        interpreter, imports and event loop. CPU time is tracked per bot
+        (socket decoding plus do_step), and RSS is attributed to each bot
+        by measuring growth while it starts up.
+    """
+
+    def __init__(
+        self,
+        configs: List[BotConfig],
+        bot_type: Type[BasicBot] = BasicBot,
+        start_interval = 1.0,
+        report_interval = 60.0,
+        shared_world = True,
+    ) -> None:
+        self.configs = list(configs)
+        self.bot_type = bot_type
+        self.start_interval = start_interval
+        self.report_interval = report_interval
+        # players seen by all bots, tracked once (see WorldModel)
+        self.world: Optional[WorldModel] = None
+        if shared_world:
+            self.world = WorldModel()
+
+        self.bots: Dict[str, BasicBot] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.startup_rss: Dict[str, int] = {}
+        self.socket_cpu: Dict[str, float] = {}
+        self.failed: Set[str] = set()
+        self.base_rss = 0
+
+    @classmethod
+    def from_file(
+        cls,
+        filename: str,
+        names: Optional[List[str]] = None,
+        **kwargs,
+    ) -> FleetHost:
+        """ host every bot in the config file, or just those in names """
+        if not names:
+            names = BotConfig.bot_names(filename)
+        configs = [BotConfig.from_file(filename, name) for name in names]
+        return cls(configs, **kwargs)
+
+    #
+    # running
+    #
+
+    async def run(self) -> None:
+        self.base_rss = current_rss()
+        reporter = asyncio.ensure_future(self.report_forever())
+        try:
+            for config in self.configs:
+                await self.start_bot(config)
+            if len(self.tasks) > 0:
+                await asyncio.wait(list(self.tasks.values()))
+        finally:
+            reporter.cancel()
+            self.log_report()
+
+    async def start_bot(
+        self,
+        config: BotConfig,
+    ) -> None:
+        """ start a bot, stagger startups so we can attribute rss """
+        if config.name in self.tasks and not self.tasks[config.name].done():
+            raise RuntimeError(f'{config.name} already running')
+
+        rss = current_rss()
+        self.failed.discard(config.name)
+        bot = self.bot_type(config)
+        if self.world is not None:
+            bot.state.attach_world(self.world, bot.name)
+        self.bots[config.name] = bot
+        self.tasks[config.name] = asyncio.ensure_future(self.run_bot(bot))
+        await asyncio.sleep(self.start_interval)
+        self.startup_rss[config.name] = max(current_rss() - rss, 0)
+
+    async def run_bot(
+        self,
+        bot: BasicBot,
+    ) -> None:
+        try:
+            await bot.run_async()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # one bot failing shouldn't take down the fleet
+            logging.error(f'{bot.name} stopped: {e}')
+            bot.warn_exception(e)
+            self.failed.add(bot.name)
+        finally:
+            self.update_socket_cpu(bot)
+            bot.state.detach_world()
+
+    @property
+    def running(self) -> List[str]:
+        return [
+            name for name, task in self.tasks.items()
+            if not task.done()
+        ]
+
+    def stop_bot(
+        self,
+        name: str,
+    ) -> None:
+        """ log a bot out, its task finishes once the loop exits """
+        bot = self.bots.get(name)
+        if bot is not None and bot.connected:
+            bot.logout()
+
+    #
+    # reporting
+    #
+
+    def update_socket_cpu(
+        self,
+        bot: BasicBot,
+    ) -> None:
+        cpu = bot.socket_cpu_time
+        if bot.connected and isinstance(bot.socket, AsyncRetroSocket):
+            cpu += bot.socket.cpu_time
+        self.socket_cpu[bot.name] = cpu
+
+    def stats(self) -> List[BotStats]:
+        stats: List[BotStats] = []
+        for name, bot in self.bots.items():
+            self.update_socket_cpu(bot)
+            task = self.tasks.get(name)
+            stats.append(BotStats(
+                name,
+                bot.cpu_time + self.socket_cpu.get(name, 0.0),
+                self.startup_rss.get(name, 0),
+                task is not None and not task.done(),
+                bot.state.memory_report().total_bytes,
+            ))
+        return stats
+
+    def log_report(self) -> None:
+        stats = self.stats()
+        rss = current_rss()
+        cpu = time.process_time()
+        lines = [f'--- fleet: {len(stats)} bots ---']
+        lines.extend(str(s) for s in stats)
+        lines.append(' '.join([
+            f'total cpu {cpu:.2f}s',
+            f'rss {rss / 1024 / 1024:.1f}MiB',
+            f'(base {self.base_rss / 1024 / 1024:.1f}MiB)',
+        ]))
+        if len(stats) > 0:
+            per_bot = (rss - self.base_rss) / len(stats)
+            lines.append(f'avg rss per bot {per_bot / 1024 / 1024:.1f}MiB')
+        if self.world is not None:
+            lines.append(self.world.report())
+        logging.info('\n'.join(lines))
+
+    async def report_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.log_report()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('botnames', nargs='*')
+    parser.add_argument('--config', type=str, default='config.json')
+    parser.add_argument('--report', type=float, default=60.0)
+    parser.add_argument('--private-state', action='store_true')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    host = FleetHost.from_file(
+        args.config,
+        args.botnames,
+        report_interval=args.report,
+        shared_world=not args.private_state,
+    )
+    asyncio.run(host.run())
@@ -0,0 +1,267 @@
+""" Binary collision map files (.cmap)
+
+    Layout, all little endian:
+
+        header      magic 'DCMP', version, name length, origin x and y,
+                    width, height, number of transports
+        name        utf-8
+        tiles       width * height tiles, 2 bits each, row major, four
+                    tiles to a byte starting at the low bits
+        transports  per transport: x, y, destination length, then the
+                    destination ('map(x, y)') in utf-8
+        observed    (version 2) length, then TileObservations.encode()
+        generation  (version 3) the DiscoveryLog generation the file
+                    includes, 0 for none
+
+    Tiles are 0 unknown, 1 walkable, 2 bonk and 3 transport.
+
+    Loading memory-maps the file, tiles are only read when looked up.
+
+    Convert the JSON maps saved by older versions with:
+
+        python -m dbot.movement.cmapfile ignore/<bot>_maps [--delete]
+"""
+from __future__ import annotations
+from typing import (
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import mmap
+import pathlib
+import struct
+
+
+HEADER = struct.Struct('<4sHHiiIII')
+TRANSPORT = struct.Struct('<iiH')
+LENGTH = struct.Struct('<I')
+GENERATION = struct.Struct('<I')
+MAGIC = b'DCMP'
+VERSION = 3
+SUFFIX = '.cmap'
+
+PACKED_UNKNOWN = 0
+PACKED_NOBONK = 1
+PACKED_BONK = 2
+PACKED_TRANSPORT = 3
+
+# x, y, destination
+Transport = Tuple[int, int, str]
+
+
+def pack_tiles(
+    tiles: bytes,
+) -> bytes:
+    """ one 2-bit tile per byte -> four tiles per byte """
+    tiles = bytes(tiles) + bytes(-len(tiles) % 4)
+    return bytes(
+        a | (b << 2) | (c << 4) | (d << 6)
+        for a, b, c, d in zip(tiles[0::4], tiles[1::4], tiles[2::4], tiles[3::4])
+    )
+
+
+class PackedGrid:
+    """ Read-only view of the packed tiles of a mapped .cmap file
+
+        Indexes like the bytearray grid of a CollisionMap, translating
+        each 2-bit tile through codes.
+    """
+
+    def __init__(
+        self,
+        data: mmap.mmap,
+        offset: int,
+        length: int,
+        codes: Tuple[int, int, int, int],
+    ) -> None:
+        self.data = data
+        self.offset = offset
+        self.length = length
+        self.codes = codes
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(
+        self,
+        index: int,
+    ) -> int:
+        byte = self.data[self.offset + (index >> 2)]
+        return self.codes[(byte >> ((index & 3) << 1)) & 3]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.unpack())
+
+    def unpack(self) -> bytearray:
+        """ all tiles, one per byte """
+        codes = self.codes
+        table = [
+            bytes(codes[(byte >> shift) & 3] for shift in (0, 2, 4, 6))
+            for byte in range(256)
+        ]
+        end = self.offset + (self.length + 3) // 4
+        data = self.data[self.offset:end]
+        return bytearray(b''.join(table[byte] for byte in data)[:self.length])
+
+
+class CmapFile:
+    """ The contents of a .cmap file, see open_cmap """
+
+    def __init__(
+        self,
+        name: str,
+        origin: Tuple[int, int],
+        width: int,
+        height: int,
+        tiles: PackedGrid,
+        transports: List[Transport],
+        observations: Optional[bytes] = None,
+        log_generation = 0,
+    ) -> None:
+        self.name = name
+        self.origin = origin
+        self.width = width
+        self.height = height
+        self.tiles = tiles
+        self.transports = transports
+        # compressed TileObservations, None in version 1 files
+        self.observations = observations
+        self.log_generation = log_generation
+
+
+def encode(
+    name: str,
+    origin: Tuple[int, int],
+    width: int,
+    height: int,
+    tiles: bytes,
+    transports: List[Transport],
+    observations: bytes,
+    log_generation = 0,
+) -> bytes:
+    """ tiles holds one PACKED_* value per byte """
+    assert len(tiles) == width * height
+    encoded_name = name.encode()
+    parts = [
+        HEADER.pack(
+            MAGIC,
+            VERSION,
+            len(encoded_name),
+            origin[0],
+            origin[1],
+            width,
+            height,
+            len(transports),
+        ),
+        encoded_name,
+        pack_tiles(tiles),
+    ]
+    for x, y, destination in transports:
+        encoded = destination.encode()
+        parts.append(TRANSPORT.pack(x, y, len(encoded)))
+        parts.append(encoded)
+    parts.append(LENGTH.pack(len(observations)))
+    parts.append(observations)
+    parts.append(GENERATION.pack(log_generation))
+    return b''.join(parts)
+
+
+def open_cmap(
+    filename: str,
+    codes: Tuple[int, int, int, int] = (0, 1, 2, 3),
+) -> CmapFile:
+    """ map a .cmap file, raises ValueError if it isn't one """
+    with open(filename, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if len(data) < HEADER.size:
+        raise ValueError('cmap truncated')
+    (
+        magic,
+        version,
+        name_length,
+        x0,
+        y0,
+        width,
+        height,
+        n_transports,
+    ) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a cmap')
+    if version not in (1, 2, VERSION):
+        raise ValueError(f'unsupported cmap version {version}')
+
+    offset = HEADER.size
+    name = data[offset:offset + name_length].decode()
+    offset += name_length
+    tiles = PackedGrid(data, offset, width * height, codes)
+    offset += (width * height + 3) // 4
+
+    transports: List[Transport] = []
+    for _ in range(n_transports):
+        if offset + TRANSPORT.size > len(data):
+            raise ValueError('cmap truncated')
+        x, y, length = TRANSPORT.unpack_from(data, offset)
+        offset += TRANSPORT.size
+        destination = data[offset:offset + length].decode()
+        offset += length
+        transports.append((x, y, destination))
+
+    observations: Optional[bytes] = None
+    if version >= 2:
+        if offset + LENGTH.size > len(data):
+            raise ValueError('cmap truncated')
+        (length,) = LENGTH.unpack_from(data, offset)
+        offset += LENGTH.size
+        observations = data[offset:offset + length]
+        offset += length
+    log_generation = 0
+    if version >= 3:
+        if offset + GENERATION.size > len(data):
+            raise ValueError('cmap truncated')
+        (log_generation,) = GENERATION.unpack_from(data, offset)
+        offset += GENERATION.size
+    if offset != len(data):
+        raise ValueError('cmap size mismatch')
+
+    return CmapFile(
+        name,
+        (x0, y0),
+        width,
+        height,
+        tiles,
+        transports,
+        observations,
+        log_generation,
+    )
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    from dbot.movement.collision import CollisionMap
+    from dbot.state.checkpoint import write_atomic
+
+    parser = argparse.ArgumentParser(
+        description='convert JSON collision maps to .cmap files',
+    )
+    parser.add_argument('directory')
+    parser.add_argument('--delete', action='store_true',
+                        help='remove the JSON files once converted')
+    args = parser.parse_args()
+
+    for path in sorted(pathlib.Path(args.directory).iterdir()):
+        if not path.is_file() or path.suffix or path.name.startswith('.'):
+            continue
+        with path.open() as f:
+            cmap = CollisionMap.load(json.loads(f.read()))
+        target = path.with_name(path.name + SUFFIX)
+        data = cmap.encode()
+        write_atomic(str(target), data)
+        before = path.stat().st_size
+        print(f'{path} -> {target}: {before} -> {len(data)} bytes')
+        if args.delete:
+            path.unlink()
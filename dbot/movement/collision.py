@@ -8,8 +8,14 @@ from typing import (
     Tuple,
     Type,
     TypeVar,
+    Union,
 )
 
+# avoid cyclic import, but keep type checking
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from dbot.movement.mapstore import SharedMapStore
+
 import enum
 import json
 import time
@@ -17,7 +23,27 @@ import logging
 import pathlib
 import random
 
+from dbot.movement.cmapfile import (
+    PACKED_BONK,
+    PACKED_NOBONK,
+    PACKED_TRANSPORT,
+    PACKED_UNKNOWN,
+    SUFFIX,
+    PackedGrid,
+    encode,
+    open_cmap,
+)
+from dbot.movement.journal import (
+    LOG_SUFFIX,
+    DiscoveryLog,
+)
+from dbot.movement.observations import (
+    Counts,
+    TileObservations,
+)
 from dbot.movement.pathfinding import Point
+from dbot.movement.writer import MapWriter
+from dbot.state.checkpoint import write_atomic
 
 
 T = TypeVar('T', bound='CollisionMap')
@@ -34,16 +60,37 @@ class CollisionState(enum.Enum):
 
 
 class CollisionManager:
+    """ Loads and saves the CollisionMaps in a directory
+
+        Each map has a base file, <name>.cmap (or plain JSON from older
+        versions), and a DiscoveryLog of changes since, <name>.wal.
+        sync() makes recent discoveries durable cheaply, save() folds
+        the maps that changed into their base files.
+
+        Files are written by a MapWriter thread, the bot only copies
+        what needs writing. A readonly manager, for reading another
+        process's maps, never writes: it replays logs without repairing
+        them and has no journals or writer.
+    """
 
     def __init__(
         self,
         directory: Optional[str],
+        compact_records = 4096,
+        readonly = False,
     ) -> None:
         if directory is None:
             self.dir = None
         else:
             self.dir = pathlib.Path(directory)
+        self.compact_records = compact_records
+        self.readonly = readonly
         self.maps: Dict[str, CollisionMap] = {}
+        # nothing to write without a directory
+        self.writer: Optional[MapWriter] = None
+        if directory is not None and not readonly:
+            self.writer = MapWriter(directory)
+        self.shared: Optional[SharedMapStore] = None
 
     def get(
         self,
@@ -51,32 +98,209 @@ class CollisionManager:
     ) -> CollisionMap:
         if name in self.maps:
             return self.maps[name]
+        cmap = self.load(name)
+        if self.dir is not None:
+            journal = DiscoveryLog(
+                str(self.dir / f'{name}{LOG_SUFFIX}'),
+                writer=self.writer,
+            )
+            n_records = journal.replay(cmap, repair=not self.readonly)
+            if n_records > 0:
+                logging.info(f'replayed {n_records} discoveries on {name}')
+            if not self.readonly:
+                cmap.journal = journal
+        cmap.shared = self.shared
+        self.maps[name] = cmap
+        return cmap
+
+    def share(
+        self,
+        store: Optional[SharedMapStore],
+    ) -> None:
+        """ publish discoveries on all maps to store """
+        self.shared = store
+        for cmap in self.maps.values():
+            cmap.shared = store
+
+    def load(
+        self,
+        name: str,
+    ) -> CollisionMap:
+        """ the map from its base file, or a new one """
         if self.dir is not None:
+            binary = self.dir / f'{name}{SUFFIX}'
+            if binary.exists():
+                try:
+                    cmap = CollisionMap.from_file(str(binary))
+                except ValueError as e:
+                    logging.warning(f'ignoring {binary}: {e}')
+                else:
+                    logging.info(f'mapped {binary}.')
+                    return cmap
             filepath = self.dir / name
             if filepath.exists():
                 with filepath.open() as f:
                     cmap = CollisionMap.load(json.loads(f.read()))
-                size = len(cmap.map)
-                logging.info(f'loaded {filepath}. {size} Xs.')
-                self.maps[name] = cmap
+                size = cmap.n_known
+                logging.info(f'loaded {filepath}. {size} tiles.')
                 return cmap
             logging.info(f'{filepath} doesnt exist, new map.')
-        cmap = CollisionMap(name)
-        self.maps[name] = cmap
-        return cmap
+        return CollisionMap(name)
 
-    def save(self) -> None:
-        if self.dir is None:
+    def sync(self) -> None:
+        """ fsync recent discoveries if due, compact logs grown too long """
+        for name, cmap in self.maps.items():
+            if cmap.journal is None:
+                continue
+            cmap.journal.sync_due()
+            if cmap.journal.n_records >= self.compact_records:
+                self.compact(name)
+
+    def compact(
+        self,
+        name: str,
+    ) -> None:
+        """ write a map's base file, then drop its log, if it changed """
+        cmap = self.maps[name]
+        if self.dir is None or self.writer is None or not cmap.dirty:
             return
+        journal = cmap.journal
+        if journal is not None:
+            # pending records go out before the base file, which
+            # includes them, and are then discarded with the log
+            journal.sync()
+            cmap.log_generation = journal.rotate()
+        snapshot = cmap.snapshot()
+        filepath = self.dir / f'{name}{SUFFIX}'
+        self.writer.submit(self.write, str(filepath), snapshot, journal)
 
-        for name, cmap in self.maps.items():
-            filepath = self.dir / name
-            with filepath.open('w') as f:
-                f.write(json.dumps(cmap.save(), indent=2))
-            logging.info(f'saved {filepath}')
+    def write(
+        self,
+        filename: str,
+        snapshot: MapSnapshot,
+        journal: Optional[DiscoveryLog],
+    ) -> None:
+        """ writer thread: publish a base file """
+        write_atomic(filename, snapshot.encode())
+        if journal is not None:
+            journal.discard()
+        logging.info(f'saved {filename}')
+
+    def save(self) -> None:
+        for name in self.maps:
+            self.compact(name)
+
+    def wait(
+        self,
+        timeout = 5.0,
+    ) -> bool:
+        """ block until everything saved so far is on disk """
+        if self.writer is None:
+            return True
+        return self.writer.wait(timeout)
+
+
+# tile codes in CollisionMap.grid: the low two bits are what we know
+# about walking there, TILE_TRANSPORT is set on top for transports
+TILE_UNKNOWN = 0
+TILE_NOBONK = 1
+TILE_BONK = 2
+TILE_KNOWN = 3
+TILE_TRANSPORT = 4
+
+TILE_STATES = (
+    CollisionState.unknown,
+    CollisionState.nobonk,
+    CollisionState.bonk,
+    CollisionState.unknown,
+) + (CollisionState.transport,) * 4
+
+# grid code -> 2-bit tile in a .cmap file. Known tiles under a transport
+# aren't kept, get() never returns them anyway.
+PACKED_TILES = bytes([
+    PACKED_UNKNOWN,
+    PACKED_NOBONK,
+    PACKED_BONK,
+    PACKED_UNKNOWN,
+] + [PACKED_TRANSPORT] * 4) + bytes(248)
+
+# 2-bit tile in a .cmap file -> grid code
+TILE_CODES = (TILE_UNKNOWN, TILE_NOBONK, TILE_BONK, TILE_TRANSPORT)
+
+# extra tiles added around the grid whenever it has to grow
+GROW_MARGIN = 16
+
+
+def pack_point(
+    x: int,
+    y: int,
+) -> int:
+    """ one int key for a point, y must fit in 32 bits signed """
+    return (x << 32) + y
+
+
+def unpack_point(
+    key: int,
+) -> Point:
+    y = ((key + (1 << 31)) & 0xffffffff) - (1 << 31)
+    return ((key - y) >> 32, y)
+
+
+class MapSnapshot:
+    """ A copy of a CollisionMap taken by CollisionMap.snapshot """
+
+    def __init__(
+        self,
+        name: str,
+        origin: Tuple[int, int],
+        width: int,
+        height: int,
+        grid: bytearray,
+        transports: List[Tuple[int, int, str]],
+        observations: TileObservations,
+        log_generation: int,
+    ) -> None:
+        self.name = name
+        self.origin = origin
+        self.width = width
+        self.height = height
+        self.grid = grid
+        self.transports = transports
+        self.observations = observations
+        self.log_generation = log_generation
+
+    def encode(self) -> bytes:
+        """ as a .cmap file """
+        return encode(
+            self.name,
+            self.origin,
+            self.width,
+            self.height,
+            bytes(self.grid).translate(PACKED_TILES),
+            self.transports,
+            self.observations.encode(),
+            self.log_generation,
+        )
 
 
 class CollisionMap:
+    """ What we know about the tiles of one map
+
+        Tiles live in a dense bytearray grid covering min..max, which
+        grows as tiles outside it are set. Everything outside the grid
+        is unknown. Transport destinations are kept on the side, keyed
+        by pack_point.
+
+        Every set() is an observation of a tile. Bonk and nobonk counts
+        are kept per tile (see TileObservations), and the tile's state is
+        whichever was seen more often, the most recent one on a tie. So
+        one bad observation, like a bonk misattributed during lag, can't
+        override a tile that has been walked on many times.
+
+        Maps loaded from a .cmap file start out reading tiles straight
+        from the mapped file, and copy them into a bytearray on the
+        first change.
+    """
 
     def __init__(
         self,
@@ -84,13 +308,53 @@ class CollisionMap:
         cmap: Optional[CMap] = None,
         transports: Optional[TransportMap] = None,
     ) -> None:
-        # dicts make resizing easy
-        self.transports = transports or {}
-        self.map = cmap or {}
         self.name = name
-
+        self.grid: Union[bytearray, PackedGrid] = bytearray()
+        self.observations = TileObservations()
+        # observations of a mapped file, decoded along with the grid
+        self.packed_observations: Optional[bytes] = None
+        # corners of the grid (inclusive), None until the first set
         self.min: Optional[Tuple[int, int]] = None
         self.max: Optional[Tuple[int, int]] = None
+        self.x0 = 0
+        self.y0 = 0
+        self.width = 0
+        self.height = 0
+        self.transports: Dict[int, str] = {}
+        # where changes are logged, see CollisionManager
+        self.journal: Optional[DiscoveryLog] = None
+        # the last journal generation included in the base file
+        self.log_generation = 0
+        # where changes are shared with other bots, see CollisionManager
+        self.shared: Optional[SharedMapStore] = None
+        # changed since the last snapshot
+        self.dirty = False
+        # grid and observations are shared with a snapshot
+        self.frozen = False
+
+        if cmap:
+            points = [(int(x), int(y)) for x in cmap for y in cmap[x]]
+            self.reserve(points)
+            for x, column in cmap.items():
+                for y, collision in column.items():
+                    index = self.index(int(x), int(y))
+                    code = TILE_BONK if collision else TILE_NOBONK
+                    self.grid[index] = code
+                    # older maps don't have counts, call it one each
+                    self.observations.add(
+                        index,
+                        int(collision),
+                        int(not collision),
+                        0,
+                    )
+        if transports:
+            points = [(int(x), int(y)) for x in transports for y in transports[x]]
+            self.reserve(points)
+            for tx, destinations in transports.items():
+                for ty, transport in destinations.items():
+                    point = (int(tx), int(ty))
+                    self.grid[self.index(*point)] |= TILE_TRANSPORT
+                    self.transports[pack_point(*point)] = transport
 
     @classmethod
     def load(
@@ -103,27 +367,222 @@ class CollisionMap:
             transports=obj['transports'],
         )
 
+    @classmethod
+    def from_file(
+        cls: Type[T],
+        filename: str,
+    ) -> T:
+        """ map a .cmap file, raises ValueError if it isn't one """
+        data = open_cmap(filename, TILE_CODES)
+        cmap = cls(data.name)
+        if data.width and data.height:
+            cmap.grid = data.tiles
+            cmap.x0, cmap.y0 = data.origin
+            cmap.width = data.width
+            cmap.height = data.height
+            cmap.min = data.origin
+            cmap.max = (
+                data.origin[0] + data.width - 1,
+                data.origin[1] + data.height - 1,
+            )
+            cmap.packed_observations = data.observations
+        cmap.log_generation = data.log_generation
+        for x, y, transport in data.transports:
+            cmap.transports[pack_point(x, y)] = transport
+        return cmap
+
+    def snapshot(self) -> MapSnapshot:
+        """ the map as it is now, for encoding on another thread
+
+            The grid and observations aren't copied: they are shared
+            until the next change, which copies them first (see writable).
+        """
+        snapshot = self.contents()
+        self.frozen = True
+        self.dirty = False
+        return snapshot
+
+    def contents(self) -> MapSnapshot:
+        """ the map as it is now, sharing its grid and observations """
+        observations = self.observed()
+        grid = self.grid
+        assert isinstance(grid, bytearray)
+        transports = [
+            unpack_point(key) + (transport,)
+            for key, transport in self.transports.items()
+        ]
+        return MapSnapshot(
+            self.name,
+            (self.x0, self.y0),
+            self.width,
+            self.height,
+            grid,
+            transports, # type: ignore
+            observations,
+            self.log_generation,
+        )
+
+    def encode(self) -> bytes:
+        """ the map as a .cmap file, leaving it dirty if it was """
+        return self.contents().encode()
+
     def save(self) -> Any:
+        cmap: CMap = {}
+        for index, code in enumerate(self.grid):
+            if code & TILE_KNOWN:
+                x, y = self.point(index)
+                column = cmap.setdefault(str(x), {})
+                column[str(y)] = code & TILE_KNOWN == TILE_BONK
+        transports: TransportMap = {}
+        for key, transport in self.transports.items():
+            x, y = unpack_point(key)
+            transports.setdefault(str(x), {})[str(y)] = transport
         return {
             'name': self.name,
-            'map': self.map,
-            'transports': self.transports,
+            'map': cmap,
+            'transports': transports,
         }
 
+    @property
+    def n_known(self) -> int:
+        """ tiles we know to be walkable or not """
+        return sum(1 for code in self.grid if code & TILE_KNOWN)
+
+    #
+    # grid
+    #
+
+    def writable(self) -> bytearray:
+        """ the grid, copied out of a mapped file or snapshot if need be """
+        grid = self.grid
+        if not isinstance(grid, bytearray):
+            grid = self.grid = grid.unpack()
+            self.frozen = False
+            if self.packed_observations is not None:
+                self.observations = TileObservations.decode(
+                    self.packed_observations,
+                    len(grid),
+                )
+                self.packed_observations = None
+            else:
+                # a version 1 file, call it one observation each
+                self.observations = TileObservations(len(grid))
+                for index, code in enumerate(grid):
+                    known = code & TILE_KNOWN
+                    if known:
+                        self.observations.add(
+                            index,
+                            int(known == TILE_BONK),
+                            int(known == TILE_NOBONK),
+                            0,
+                        )
+        elif self.frozen:
+            grid = self.grid = bytearray(grid)
+            self.observations = self.observations.copy()
+            self.frozen = False
+        return grid
+
+    def observed(self) -> TileObservations:
+        """ the observations, decoded from a mapped file if need be """
+        if not isinstance(self.grid, bytearray):
+            self.writable()
+        return self.observations
+
+    def index(
+        self,
+        x: int,
+        y: int,
+    ) -> int:
+        """ grid index of a point, growing the grid to include it """
+        gx = x - self.x0
+        gy = y - self.y0
+        if not (0 <= gx < self.width and 0 <= gy < self.height):
+            self.reserve([(x, y)])
+            gx = x - self.x0
+            gy = y - self.y0
+        return gy * self.width + gx
+
+    def point(
+        self,
+        index: int,
+    ) -> Point:
+        gy, gx = divmod(index, self.width)
+        return (gx + self.x0, gy + self.y0)
+
+    def reserve(
+        self,
+        points: List[Point],
+    ) -> None:
+        """ grow the grid to cover points, with some margin """
+        if len(points) == 0:
+            return
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        lo_x, hi_x = min(xs), max(xs)
+        lo_y, hi_y = min(ys), max(ys)
+        if self.min is not None and self.max is not None:
+            if (
+                lo_x >= self.min[0] and hi_x <= self.max[0] and
+                lo_y >= self.min[1] and hi_y <= self.max[1]
+            ):
+                return
+            lo_x = min(lo_x - GROW_MARGIN, self.min[0])
+            lo_y = min(lo_y - GROW_MARGIN, self.min[1])
+            hi_x = max(hi_x + GROW_MARGIN, self.max[0])
+            hi_y = max(hi_y + GROW_MARGIN, self.max[1])
+
+        width = hi_x - lo_x + 1
+        height = hi_y - lo_y + 1
+        offset = (self.y0 - lo_y) * width + (self.x0 - lo_x)
+        old_grid = self.grid
+        if not isinstance(old_grid, bytearray):
+            old_grid = self.writable()
+        grid = bytearray(width * height)
+        for row in range(self.height):
+            old = row * self.width
+            new = row * width + offset
+            grid[new:new + self.width] = old_grid[old:old + self.width]
+
+        self.observations = self.observations.regrid(
+            self.height,
+            self.width,
+            width,
+            height,
+            offset,
+        )
+        self.grid = grid
+        # both are new copies, no longer shared with a snapshot
+        self.frozen = False
+        self.x0, self.y0 = lo_x, lo_y
+        self.width, self.height = width, height
+        self.min = (lo_x, lo_y)
+        self.max = (hi_x, hi_y)
+
+    #
+    # tiles
+    #
+
+    def code(
+        self,
+        ix: int,
+        iy: int,
+    ) -> int:
+        """ the grid code of a tile, TILE_UNKNOWN outside the grid """
+        gx = ix - self.x0
+        gy = iy - self.y0
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            return self.grid[gy * self.width + gx]
+        return TILE_UNKNOWN
+
     def get(
         self,
         ix: int,
         iy: int,
     ) -> CollisionState:
-        x, y = str(ix), str(iy)
-        if x in self.transports and y in self.transports[x]:
-            # it might be a transport (not in map)
-            return CollisionState.transport
-        if x in self.map and y in self.map[x]:
-            # it's in the map, either collision or no
-            if self.map[x][y]:
-                return CollisionState.bonk
-            return CollisionState.nobonk
+        gx = ix - self.x0
+        gy = iy - self.y0
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            return TILE_STATES[self.grid[gy * self.width + gx]]
         # otherwise, unexplored
         return CollisionState.unknown
 
@@ -132,16 +591,121 @@ class CollisionMap:
         ix: int,
         iy: int,
         collision: bool,
+        at: Optional[int] = None,
+    ) -> None:
+        """ observe a tile as bonk or not, at (unix seconds) or now """
+        self.observe(
+            ix,
+            iy,
+            int(collision),
+            int(not collision),
+            int(time.time()) if at is None else at,
+        )
+
+    def observe(
+        self,
+        ix: int,
+        iy: int,
+        bonks: int,
+        nobonks: int,
+        at: int,
     ) -> None:
-        x, y = str(ix), str(iy)
-        if x in self.transports and y in self.transports[x]:
+        """ add observations of a tile, whose state becomes the consensus """
+        self.writable()
+        index = self.index(ix, iy)
+        # index() may have grown the grid
+        grid = self.writable()
+        self.observations.add(index, bonks, nobonks, at)
+        self.dirty = True
+        if self.journal is not None:
+            self.journal.observe(ix, iy, bonks, nobonks, at)
+
+        code = grid[index]
+        if bonks and not nobonks:
+            latest = TILE_BONK
+        elif nobonks and not bonks:
+            latest = TILE_NOBONK
+        else:
+            latest = code & TILE_KNOWN
+        known = self.consensus(index, latest)
+        if code & TILE_KNOWN == known:
+            if bonks and known != TILE_BONK or nobonks and known != TILE_NOBONK:
+                logging.debug(f'outvoted observation at {self.name}({ix}, {iy})')
+            return
+
+        if code & TILE_TRANSPORT:
             logging.warning('overriding transport!?')
+        if code & TILE_KNOWN:
+            b, n, _, _ = self.observations.counts(index)
+            logging.warning(
+                f'conflicting info at {self.name}({ix}, {iy}), '
+                f'now {TILE_STATES[known].value} ({b} bonks, {n} nobonks)'
+            )
+        grid[index] = (code & TILE_TRANSPORT) | known
+        if self.shared is not None:
+            self.shared.set(self.name, ix, iy, known == TILE_BONK)
+
+    def consensus(
+        self,
+        index: int,
+        latest: int,
+    ) -> int:
+        """ TILE_BONK or TILE_NOBONK by majority, then by recency
+
+            latest breaks ties within the same second.
+        """
+        bonks, nobonks, last_bonk, last_nobonk = self.observations.counts(index)
+        if bonks != nobonks:
+            return TILE_BONK if bonks > nobonks else TILE_NOBONK
+        if bonks == 0:
+            return TILE_UNKNOWN
+        if last_bonk != last_nobonk:
+            return TILE_BONK if last_bonk > last_nobonk else TILE_NOBONK
+        return latest or TILE_BONK
+
+    def counts(
+        self,
+        ix: int,
+        iy: int,
+    ) -> Counts:
+        """ (bonks, nobonks, last bonk, last nobonk) seen at a tile """
+        gx = ix - self.x0
+        gy = iy - self.y0
+        if 0 <= gx < self.width and 0 <= gy < self.height:
+            return self.observed().counts(gy * self.width + gx)
+        return (0, 0, 0, 0)
+
+    def walkable(
+        self,
+        ix: int,
+        iy: int,
+    ) -> float:
+        """ the share of observations of a tile that were nobonk
 
-        if x not in self.map:
-            self.map[x] = {}
-        if y in self.map[x] and self.map[x][y] != collision:
-            logging.warning(f'conflicting info at {self.name}({x}, {y})')
-        self.map[x][y] = collision
+            1.0 for tiles never observed. Tiles nobody disagrees about are
+            0.0 or 1.0, anything in between is contested.
+        """
+        gx = ix - self.x0
+        gy = iy - self.y0
+        if not (0 <= gx < self.width and 0 <= gy < self.height):
+            return 1.0
+        observations = self.observed()
+        index = gy * self.width + gx
+        bonks = observations.bonks[index]
+        if bonks == 0:
+            # the common case, nobody saw it bonk
+            return 1.0
+        nobonks = observations.nobonks[index]
+        return nobonks / (bonks + nobonks)
+
+    @property
+    def n_contested(self) -> int:
+        """ tiles seen both bonk and nobonk """
+        observations = self.observed()
+        return sum(
+            1 for b, n in zip(observations.bonks, observations.nobonks)
+            if b and n
+        )
 
     def set_transport(
         self,
@@ -150,32 +714,66 @@ class CollisionMap:
         map_name: str,
         destination: Tuple[int, int],
     ) -> None:
-        x, y = str(ix), str(iy)
-        if x in self.map and y in self.map[x]:
-            logging.warning('transport overriding!?')
+        self.put_transport(ix, iy, f'{map_name}{destination}')
 
-        transport = f'{map_name}{destination}'
-        if (
-            x in self.transports and
-            y in self.transports[x] and 
-            self.transports[x][y] != transport
-        ):
+    def put_transport(
+        self,
+        ix: int,
+        iy: int,
+        transport: str,
+    ) -> None:
+        """ set_transport, with the destination already formatted """
+        key = pack_point(ix, iy)
+        old = self.transports.get(key)
+        if old == transport:
+            return
+        if old is not None:
             logging.warning(f'conflicting transport at {self.name}{(ix, iy)}')
 
-        if x not in self.transports:
-            self.transports[x] = {}
-        self.transports[x][y] = transport
+        self.writable()
+        index = self.index(ix, iy)
+        grid = self.writable()
+        code = grid[index]
+        if code & TILE_KNOWN:
+            logging.warning('transport overriding!?')
+        self.transports[key] = transport
+        grid[index] = code | TILE_TRANSPORT
+        self.dirty = True
+        if self.journal is not None:
+            self.journal.set_transport(ix, iy, transport)
+        if self.shared is not None:
+            self.shared.set_transport(self.name, ix, iy, transport)
+
+    def transport(
+        self,
+        ix: int,
+        iy: int,
+    ) -> Optional[str]:
+        """ 'map(x, y)' a transport tile leads to """
+        return self.transports.get(pack_point(ix, iy))
 
     def neighbors(
         self,
         src: Point,
     ) -> List[Tuple[Point, CollisionState]]:
-        return [
-            (p, self.get(*p))
-            for p in [
-                (src[0],     src[1] - 1),
-                (src[0],     src[1] + 1),
-                (src[0] - 1, src[1]),
-                (src[0] + 1, src[1]),
+        x, y = src
+        gx = x - self.x0
+        gy = y - self.y0
+        width = self.width
+        if 0 < gx < width - 1 and 0 < gy < self.height - 1:
+            # all four inside the grid, skip the bounds checks
+            grid = self.grid
+            index = gy * width + gx
+            return [
+                ((x, y - 1), TILE_STATES[grid[index - width]]),
+                ((x, y + 1), TILE_STATES[grid[index + width]]),
+                ((x - 1, y), TILE_STATES[grid[index - 1]]),
+                ((x + 1, y), TILE_STATES[grid[index + 1]]),
             ]
+        get = self.get
+        return [
+            ((x, y - 1), get(x, y - 1)),
+            ((x, y + 1), get(x, y + 1)),
+            ((x - 1, y), get(x - 1, y)),
+            ((x + 1, y), get(x + 1, y)),
         ]
@@ -0,0 +1,246 @@
+from __future__ import annotations
+from typing import (
+    BinaryIO,
+    Callable,
+    Optional,
+)
+
+# avoid cyclic import, but keep type checking
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from dbot.movement.collision import CollisionMap
+    from dbot.movement.writer import MapWriter
+
+import logging
+import os
+import pathlib
+import struct
+import time
+import zlib
+
+
+# kind, x, y, payload length, then the payload and a crc32 of it all
+RECORD = struct.Struct('<BiiH')
+CRC = struct.Struct('<I')
+# observe payload: bonks, nobonks, at (unix seconds)
+OBSERVATION = struct.Struct('<BBI')
+# begin payload: generation
+GENERATION = struct.Struct('<I')
+# a tile's new state, only in logs written by older versions
+KIND_SET = 1
+KIND_TRANSPORT = 2
+KIND_OBSERVE = 3
+KIND_BEGIN = 4
+LOG_SUFFIX = '.wal'
+
+
+class DiscoveryLog:
+    """ Append-only log of the tiles discovered on one map
+
+        Each change to a CollisionMap is one small record, so keeping a
+        map durable costs a few bytes per new tile instead of rewriting
+        the whole map. Records are buffered and written with one fsync
+        per batch: once `batch` are pending, or on sync() after
+        `interval` seconds. A crash loses at most the unsynced records.
+        With a writer, the file is only touched from its thread.
+
+        Records are observations, replayed with the time they were made,
+        so the map's counts come back as they were.
+
+        On load, CollisionManager replays the log over the map's base
+        file. Compacting writes the map into the base file, then
+        discards the log file. Replaying counts again, so records are
+        in numbered generations: compacting starts a new one and the
+        base file notes the last one it includes. After a crash between
+        the two, replay skips the records already in the base file.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        batch = 64,
+        interval = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        writer: Optional[MapWriter] = None,
+    ) -> None:
+        self.filename = filename
+        self.writer = writer
+        self.batch = batch
+        self.interval = interval
+        self.clock = clock
+        self.file: Optional[BinaryIO] = None
+        self.buffer = bytearray()
+        self.pending = 0
+        # records in the log, written or not
+        self.n_records = 0
+        self.last_sync = clock()
+        # generation of new records, which start with a begin record
+        self.generation = 1
+        self.begun = False
+
+    #
+    # writing
+    #
+
+    def append(
+        self,
+        kind: int,
+        x: int,
+        y: int,
+        payload: bytes,
+    ) -> None:
+        if not self.begun:
+            self.begun = True
+            self.buffer += record(
+                KIND_BEGIN,
+                0,
+                0,
+                GENERATION.pack(self.generation),
+            )
+        self.buffer += record(kind, x, y, payload)
+        self.pending += 1
+        self.n_records += 1
+        if self.pending >= self.batch:
+            self.sync()
+
+    def observe(
+        self,
+        x: int,
+        y: int,
+        bonks: int,
+        nobonks: int,
+        at: int,
+    ) -> None:
+        self.append(KIND_OBSERVE, x, y, OBSERVATION.pack(bonks, nobonks, at))
+
+    def set_transport(
+        self,
+        x: int,
+        y: int,
+        transport: str,
+    ) -> None:
+        self.append(KIND_TRANSPORT, x, y, transport.encode())
+
+    def sync(self) -> None:
+        """ write and fsync any pending records """
+        self.last_sync = self.clock()
+        if self.pending == 0:
+            return
+        data = bytes(self.buffer)
+        self.buffer = bytearray()
+        self.pending = 0
+        if self.writer is not None:
+            self.writer.submit(self.write, data)
+        else:
+            self.write(data)
+
+    def write(
+        self,
+        data: bytes,
+    ) -> None:
+        if self.file is None:
+            self.file = open(self.filename, 'ab')
+        self.file.write(data)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def rotate(self) -> int:
+        """ start a new generation, returns the one records so far are in
+
+            Call after sync(), when the records so far are about to go
+            into the base file.
+        """
+        generation = self.generation
+        self.generation += 1
+        self.begun = False
+        self.n_records = 0
+        return generation
+
+    def sync_due(self) -> None:
+        """ sync if it has been interval seconds since the last one """
+        if self.pending and self.clock() - self.last_sync >= self.interval:
+            self.sync()
+
+    def discard(self) -> None:
+        """ delete the log file, its records are now in the base file """
+        self.close()
+        pathlib.Path(self.filename).unlink(missing_ok=True)
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    #
+    # recovery
+    #
+
+    def replay(
+        self,
+        cmap: CollisionMap,
+        repair = True,
+    ) -> int:
+        """ apply the log to cmap, returns the number of records
+
+            Generations up to cmap.log_generation are already in the base
+            file and skipped. A torn record at the end (from a crash
+            mid-write) and anything after it is ignored, and with repair
+            dropped from the file.
+        """
+        path = pathlib.Path(self.filename)
+        data = path.read_bytes() if path.is_file() else b''
+
+        offset = 0
+        n_records = 0
+        # logs from older versions have no generations, apply them all
+        generation: Optional[int] = None
+        skip = False
+        while offset + RECORD.size <= len(data):
+            kind, x, y, length = RECORD.unpack_from(data, offset)
+            end = offset + RECORD.size + length
+            if end + CRC.size > len(data):
+                break
+            (crc,) = CRC.unpack_from(data, end)
+            if crc != zlib.crc32(data[offset:end]):
+                break
+            payload = data[offset + RECORD.size:end]
+            offset = end + CRC.size
+            if kind == KIND_BEGIN:
+                (generation,) = GENERATION.unpack(payload)
+                skip = generation <= cmap.log_generation
+                continue
+            if skip:
+                continue
+            if kind == KIND_OBSERVE:
+                bonks, nobonks, at = OBSERVATION.unpack(payload)
+                cmap.observe(x, y, bonks, nobonks, at)
+            elif kind == KIND_SET:
+                cmap.set(x, y, payload != b'\x00', 0)
+            elif kind == KIND_TRANSPORT:
+                cmap.put_transport(x, y, payload.decode())
+            n_records += 1
+
+        if offset != len(data) and repair:
+            dropped = len(data) - offset
+            logging.warning(f'{self.filename}: dropping {dropped} torn bytes')
+            os.truncate(path, offset)
+        if generation is not None and generation > cmap.log_generation:
+            # carry on with it
+            self.generation = generation
+            self.begun = True
+        else:
+            self.generation = cmap.log_generation + 1
+            self.begun = False
+        self.n_records += n_records
+        return n_records
+
+
+def record(
+    kind: int,
+    x: int,
+    y: int,
+    payload: bytes,
+) -> bytes:
+    """ a log record with its crc """
+    data = RECORD.pack(kind, x, y, len(payload)) + payload
+    return data + CRC.pack(zlib.crc32(data))
@@ -0,0 +1,191 @@
+from __future__ import annotations
+from typing import (
+    Callable,
+    List,
+    Optional,
+    Tuple,
+)
+
+# avoid cyclic import, but keep type checking
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from dbot.movement.collision import CollisionManager
+
+import logging
+import pathlib
+import sqlite3
+import time
+
+from dbot.movement.pathfinding import Point
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS discoveries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    map TEXT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    bonk INTEGER,
+    transport TEXT,
+    bot TEXT NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS readers (
+    bot TEXT PRIMARY KEY,
+    seen INTEGER NOT NULL
+);
+'''
+
+# map, x, y, bonk (None for transports), transport, bot, at
+Discovery = Tuple[str, int, int, Optional[int], Optional[str], str, float]
+
+
+class SharedMapStore:
+    """ Collision discoveries shared by every bot on this machine
+
+        A SQLite database in WAL mode, so bots in other processes read
+        it while one writes. Each discovery is a row in an append-only
+        table. exchange() writes this bot's new discoveries in one
+        transaction and applies everyone else's since the last call,
+        in the order they were written.
+
+        How far each bot has read is kept in the database too, so a
+        restart picks up where it left off instead of counting every
+        discovery again. It is saved with the next exchange, after
+        the maps have logged what was applied, so a crash can lose a
+        few applied discoveries but never applies them twice.
+
+        This replaces the "dbots bonked at ..." chat broadcasts when
+        the shared_maps config is set. Bots then call exchange() from a
+        timer every `interval` seconds, whatever they are doing (see
+        BotCore.exchange_maps).
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        bot: str,
+        interval = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        pathlib.Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        self.filename = filename
+        self.bot = bot
+        self.interval = interval
+        self.clock = clock
+        self.db = sqlite3.connect(filename, timeout=5.0)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+        self.pending: List[Discovery] = []
+        # highest seq applied, and the last one saved
+        row = self.db.execute(
+            'SELECT seen FROM readers WHERE bot = ?',
+            (bot,),
+        ).fetchone()
+        self.seen = 0 if row is None else row[0]
+        self.saved_seen = self.seen
+        self.last_exchange = -interval
+        # applying others' discoveries, which must not be published again
+        self.applying = False
+        self.n_published = 0
+        self.n_applied = 0
+
+    #
+    # publishing
+    #
+
+    def set(
+        self,
+        map_name: str,
+        x: int,
+        y: int,
+        collision: bool,
+    ) -> None:
+        if not self.applying:
+            self.pending.append(
+                (map_name, x, y, int(collision), None, self.bot, time.time()),
+            )
+
+    def set_transport(
+        self,
+        map_name: str,
+        x: int,
+        y: int,
+        transport: str,
+    ) -> None:
+        if not self.applying:
+            self.pending.append(
+                (map_name, x, y, None, transport, self.bot, time.time()),
+            )
+
+    def flush(self) -> None:
+        """ write our discoveries, and how far we have read """
+        seen = self.seen
+        if len(self.pending) == 0 and seen == self.saved_seen:
+            return
+        with self.db:
+            self.db.executemany(
+                '''INSERT INTO discoveries
+                   (map, x, y, bonk, transport, bot, at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                self.pending,
+            )
+            if seen != self.saved_seen:
+                self.db.execute(
+                    'INSERT OR REPLACE INTO readers (bot, seen) VALUES (?, ?)',
+                    (self.bot, seen),
+                )
+        self.saved_seen = seen
+        self.n_published += len(self.pending)
+        self.pending = []
+
+    #
+    # receiving
+    #
+
+    def exchange(
+        self,
+        maps: CollisionManager,
+        force = False,
+    ) -> List[Tuple[str, Point]]:
+        """ publish ours and apply theirs, returns what was applied """
+        now = self.clock()
+        if not force and now - self.last_exchange < self.interval:
+            return []
+        self.last_exchange = now
+        try:
+            self.flush()
+            rows = self.db.execute(
+                '''SELECT seq, map, x, y, bonk, transport, at FROM discoveries
+                   WHERE seq > ? AND bot != ? ORDER BY seq''',
+                (self.seen, self.bot),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            # locked for longer than the timeout, try again next time
+            logging.warning(f'shared maps: {e}')
+            return []
+
+        applied: List[Tuple[str, Point]] = []
+        self.applying = True
+        try:
+            for seq, map_name, x, y, bonk, transport, at in rows:
+                cmap = maps.get(map_name)
+                if transport is not None:
+                    cmap.put_transport(x, y, transport)
+                else:
+                    cmap.set(x, y, bool(bonk), int(at))
+                applied.append((map_name, (x, y)))
+                self.seen = seq
+        finally:
+            self.applying = False
+        self.n_applied += len(applied)
+        return applied
+
+    def close(self) -> None:
+        try:
+            self.flush()
+        finally:
+            self.db.close()
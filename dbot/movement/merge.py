@@ -0,0 +1,109 @@
+""" Merge the collision maps of several bots into consensus maps
+
+    python -m dbot.movement.merge OUTPUT ignore/bot1_maps ignore/bot2_maps ...
+
+    Observation counts of each tile are added up across bots, so a tile
+    takes the state most bots saw most often. Transports take the
+    destination most bots recorded. Maps are written to OUTPUT as .cmap
+    files, ready to be copied into a bot's maps directory.
+"""
+from __future__ import annotations
+from typing import (
+    Dict,
+    List,
+    Set,
+)
+
+import collections
+import logging
+import pathlib
+
+from dbot.movement.cmapfile import SUFFIX
+from dbot.movement.collision import (
+    CollisionManager,
+    CollisionMap,
+    unpack_point,
+)
+from dbot.movement.journal import LOG_SUFFIX
+
+
+def map_names(
+    directory: pathlib.Path,
+) -> Set[str]:
+    """ maps with a base file or log in a bot's maps directory """
+    names: Set[str] = set()
+    for path in directory.iterdir():
+        if not path.is_file() or path.name.startswith('.'):
+            continue
+        if path.suffix in (SUFFIX, LOG_SUFFIX):
+            names.add(path.stem)
+        elif path.suffix == '':
+            names.add(path.name)
+    return names
+
+
+def merge(
+    name: str,
+    maps: List[CollisionMap],
+) -> CollisionMap:
+    merged = CollisionMap(name)
+    votes: Dict[int, collections.Counter] = {}
+    for cmap in maps:
+        observations = cmap.observed()
+        for index in range(len(observations)):
+            bonks, nobonks, last_bonk, last_nobonk = observations.counts(index)
+            if bonks == 0 and nobonks == 0:
+                continue
+            x, y = cmap.point(index)
+            # most recent first, so that ties go to it
+            if last_bonk > last_nobonk:
+                merged.observe(x, y, 0, nobonks, last_nobonk)
+                merged.observe(x, y, bonks, 0, last_bonk)
+            else:
+                merged.observe(x, y, bonks, 0, last_bonk)
+                merged.observe(x, y, 0, nobonks, last_nobonk)
+        for key, transport in cmap.transports.items():
+            votes.setdefault(key, collections.Counter())[transport] += 1
+
+    for key, counter in votes.items():
+        (transport, _), *others = counter.most_common()
+        x, y = unpack_point(key)
+        if others:
+            logging.warning(f'{name}{(x, y)}: transports disagree: {counter}')
+        merged.put_transport(x, y, transport)
+    return merged
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from dbot.state.checkpoint import write_atomic
+
+    parser = argparse.ArgumentParser(
+        description='merge collision maps from several bots',
+    )
+    parser.add_argument('output')
+    parser.add_argument('directories', nargs='+')
+    args = parser.parse_args()
+
+    directories = [pathlib.Path(d) for d in args.directories]
+    names: Set[str] = set()
+    for directory in directories:
+        names |= map_names(directory)
+
+    output = pathlib.Path(args.output)
+    for name in sorted(names):
+        maps = [
+            CollisionManager(str(directory)).get(name)
+            for directory in directories
+            if name in map_names(directory)
+        ]
+        merged = merge(name, maps)
+        target = output / f'{name}{SUFFIX}'
+        write_atomic(str(target), merged.encode())
+        print(' '.join([
+            f'{name}: {len(maps)} maps,',
+            f'{merged.n_known} tiles,',
+            f'{merged.n_contested} contested,',
+            f'{len(merged.transports)} transports',
+        ]))
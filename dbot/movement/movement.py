@@ -209,9 +209,9 @@ class MovementController:
             return
 
         if e.direction in (Direction.down, Direction.up):
-            diff = abs(player['coords']['y'] - self.target[1])
+            diff = abs(player.y - self.target[1])
         else:
-            diff = abs(player['coords']['x'] - self.target[0])
+            diff = abs(player.x - self.target[0])
 
         if diff < self.near_threshold:
             self.move(e.direction, False)
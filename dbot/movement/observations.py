@@ -0,0 +1,133 @@
+from __future__ import annotations
+from typing import (
+    Tuple,
+)
+
+import array
+import sys
+import zlib
+
+
+# a tile's counts stop here rather than wrapping
+MAX_COUNT = 255
+
+# bonks, nobonks, last bonk, last nobonk (unix seconds, 0 for never)
+Counts = Tuple[int, int, int, int]
+
+
+def blank_times(
+    size: int,
+) -> array.array:
+    return array.array('I', bytes(4 * size))
+
+
+class TileObservations:
+    """ How often each tile of a CollisionMap was seen bonk or nobonk
+
+        Dense arrays indexed like CollisionMap.grid, kept in step with
+        it when the grid grows. Counts saturate at MAX_COUNT.
+    """
+
+    def __init__(
+        self,
+        size = 0,
+    ) -> None:
+        self.bonks = bytearray(size)
+        self.nobonks = bytearray(size)
+        self.last_bonk = blank_times(size)
+        self.last_nobonk = blank_times(size)
+
+    def __len__(self) -> int:
+        return len(self.bonks)
+
+    def copy(self) -> TileObservations:
+        other = TileObservations()
+        other.bonks = bytearray(self.bonks)
+        other.nobonks = bytearray(self.nobonks)
+        other.last_bonk = array.array('I', self.last_bonk)
+        other.last_nobonk = array.array('I', self.last_nobonk)
+        return other
+
+    def counts(
+        self,
+        index: int,
+    ) -> Counts:
+        return (
+            self.bonks[index],
+            self.nobonks[index],
+            self.last_bonk[index],
+            self.last_nobonk[index],
+        )
+
+    def add(
+        self,
+        index: int,
+        bonks: int,
+        nobonks: int,
+        at: int,
+    ) -> None:
+        if bonks:
+            self.bonks[index] = min(self.bonks[index] + bonks, MAX_COUNT)
+            if at > self.last_bonk[index]:
+                self.last_bonk[index] = at
+        if nobonks:
+            self.nobonks[index] = min(self.nobonks[index] + nobonks, MAX_COUNT)
+            if at > self.last_nobonk[index]:
+                self.last_nobonk[index] = at
+
+    def regrid(
+        self,
+        rows: int,
+        old_width: int,
+        width: int,
+        height: int,
+        offset: int,
+    ) -> TileObservations:
+        """ a copy laid out on a grown grid, see CollisionMap.reserve """
+        other = TileObservations(width * height)
+        for old, new in [
+            (self.bonks, other.bonks),
+            (self.nobonks, other.nobonks),
+            (self.last_bonk, other.last_bonk),
+            (self.last_nobonk, other.last_nobonk),
+        ]:
+            for row in range(rows):
+                start = row * old_width
+                at = row * width + offset
+                new[at:at + old_width] = old[start:start + old_width]
+        return other
+
+    #
+    # files
+    #
+
+    def encode(self) -> bytes:
+        """ compressed, times little endian """
+        times = array.array('I', self.last_bonk)
+        times.extend(self.last_nobonk)
+        if sys.byteorder == 'big':
+            times.byteswap()
+        return zlib.compress(
+            bytes(self.bonks) + bytes(self.nobonks) + times.tobytes(),
+            6,
+        )
+
+    @classmethod
+    def decode(
+        cls,
+        data: bytes,
+        size: int,
+    ) -> TileObservations:
+        raw = zlib.decompress(data)
+        if len(raw) != 10 * size:
+            raise ValueError('observations size mismatch')
+        observations = cls()
+        observations.bonks = bytearray(raw[:size])
+        observations.nobonks = bytearray(raw[size:2 * size])
+        times = array.array('I')
+        times.frombytes(raw[2 * size:])
+        if sys.byteorder == 'big':
+            times.byteswap()
+        observations.last_bonk = times[:size]
+        observations.last_nobonk = times[size:]
+        return observations
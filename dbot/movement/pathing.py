@@ -56,8 +56,12 @@ class Pathing:
     def __init__(
         self,
         collider: CollisionManager,
+        uncertainty = 4.0,
     ) -> None:
         self.collider = collider
+        # extra cost of walking over a tile seen bonk as often as not,
+        # see step_cost. 0 ignores how contested tiles are.
+        self.uncertainty = uncertainty
 
     def get_unknowns(
         self,
@@ -156,8 +160,11 @@ class Pathing:
                 continue
 
             for neighbor, state in cmap.neighbors(current):
-                # +1 for now because each tile is equally weighted
-                tmpg = g_scores.get(current, math.inf) + 1
+                tmpg = g_scores.get(current, math.inf) + self.step_cost(
+                    cmap,
+                    neighbor,
+                    state,
+                )
                 if tmpg < g_scores.get(neighbor, math.inf):
                     # a better path
                     came_from[neighbor] = current
@@ -169,6 +176,23 @@ class Pathing:
         logging.info(f'no path to {goal}')
         return None
 
+    def step_cost(
+        self,
+        cmap: CollisionMap,
+        point: Point,
+        state: CollisionState,
+    ) -> float:
+        """ 1 per tile, more for walkable tiles that some saw bonk
+
+            Paths avoid contested tiles when there is a similar way
+            around, so one wrong observation costs less when it was the
+            nobonks that were wrong. Never less than 1, so h stays
+            admissible.
+        """
+        if state != CollisionState.nobonk or self.uncertainty == 0:
+            return 1.0
+        return 1.0 + self.uncertainty * (1.0 - cmap.walkable(*point))
+
     def h(
         self,
         start: Point,
@@ -0,0 +1,78 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Callable,
+    Optional,
+    Tuple,
+)
+
+import logging
+import queue
+import threading
+
+
+Job = Tuple[Callable[..., None], Tuple[Any, ...]]
+
+
+class MapWriter:
+    """ Runs collision map file writes on a background thread
+
+        Jobs run one at a time in the order they were submitted, so a
+        map's log appends and base file writes land on disk in the same
+        order they happened in the bot.
+
+        The thread starts with the first job and exits once it has been
+        idle for a while. It isn't a daemon: a bot exiting right after
+        saving still finishes its writes.
+    """
+
+    def __init__(
+        self,
+        name = 'maps',
+        idle = 2.0,
+    ) -> None:
+        self.name = name
+        self.idle = idle
+        self.jobs: queue.Queue[Job] = queue.Queue()
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.n_jobs = 0
+
+    def submit(
+        self,
+        function: Callable[..., None],
+        *args: Any,
+    ) -> None:
+        with self.lock:
+            self.jobs.put((function, args))
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run,
+                    name=f'writer {self.name}',
+                )
+                self.thread.start()
+
+    def wait(
+        self,
+        timeout = 5.0,
+    ) -> bool:
+        """ block until everything submitted so far is written """
+        done = threading.Event()
+        self.submit(done.set)
+        return done.wait(timeout)
+
+    def run(self) -> None:
+        while True:
+            try:
+                function, args = self.jobs.get(timeout=self.idle)
+            except queue.Empty:
+                with self.lock:
+                    if self.jobs.empty():
+                        self.thread = None
+                        return
+                continue
+            try:
+                function(*args)
+                self.n_jobs += 1
+            except Exception as e:
+                logging.warning(f'map write failed: {e}')
@@ -0,0 +1,88 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    BinaryIO,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+import json
+import pathlib
+import struct
+import time
+
+
+# Capture files are the magic header followed by records of:
+#   RECORD header (receive time, name length, payload length)
+#   event name (utf8)
+#   payload (compact json of the raw message args)
+MAGIC = b'DBCAP1\n'
+RECORD = struct.Struct('<dHI')
+
+
+Captured = Tuple[float, str, Tuple[Any, ...]]
+
+
+class CaptureWriter:
+    """ Appends raw inbound websocket messages to a capture file
+
+        Timestamps are time.monotonic() at receipt, so only the
+        differences between them are meaningful.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+    ) -> None:
+        path = pathlib.Path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.file: Optional[BinaryIO] = path.open('ab')
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        self.n_records = 0
+
+    def record(
+        self,
+        event: str,
+        args: Tuple[Any, ...],
+    ) -> None:
+        if self.file is None:
+            return
+        name = event.encode()
+        payload = json.dumps(args, separators=(',', ':')).encode()
+        self.file.write(RECORD.pack(time.monotonic(), len(name), len(payload)))
+        self.file.write(name)
+        self.file.write(payload)
+        self.n_records += 1
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class CaptureReader:
+    """ Iterates over (timestamp, event name, args) in a capture file """
+
+    def __init__(
+        self,
+        filename: str,
+    ) -> None:
+        self.path = pathlib.Path(filename)
+
+    def __iter__(self) -> Iterator[Captured]:
+        with self.path.open('rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'not a capture file: {self.path}')
+            while True:
+                header = f.read(RECORD.size)
+                if len(header) < RECORD.size:
+                    # end of file, or a partial record from a crash
+                    return
+                timestamp, name_len, payload_len = RECORD.unpack(header)
+                name = f.read(name_len)
+                payload = f.read(payload_len)
+                if len(payload) < payload_len:
+                    return
+                yield timestamp, name.decode(), tuple(json.loads(payload))
@@ -0,0 +1,105 @@
+from __future__ import annotations
+from typing import (
+    Counter,
+    FrozenSet,
+    Hashable,
+    List,
+    Optional,
+    Set,
+)
+
+import collections
+
+import dbot.network.events as events
+
+
+# Update keys whose every change matters, not only the last one: they
+# drive UIState transitions or have onupdate_* handlers in BasicBot.
+NEVER_COALESCE_UPDATES = frozenset({
+    'bankPrompted',
+    'battlePromptedPlayerUsername',
+    'innPrompted',
+    'inventoryPrompted',
+    'notEnoughGoldPrompted',
+    'partyPromptedPlayerUsername',
+    'shopPrompted',
+    'shopTab',
+    'statsPrompted',
+    'storagePage',
+    'storageTab',
+    'tradePromptedPlayerUsername',
+    'tradingTab',
+})
+
+# PlayerUpdate keys that the battle controllers react to
+NEVER_COALESCE_PLAYER_UPDATES = frozenset({
+    'selectedAbility',
+    'selectedTarget',
+})
+
+
+class Coalescer:
+    """ Drops Update/PlayerUpdate events superseded within the same batch
+
+        Of several Updates for one key, or PlayerUpdates for one
+        (username, key), only the last reaches the handlers. Keys on the
+        never-coalesce lists are always passed through. Other events are
+        untouched and keep their order.
+    """
+
+    def __init__(
+        self,
+        never_updates: Optional[FrozenSet[str]] = None,
+        never_player_updates: Optional[FrozenSet[str]] = None,
+    ) -> None:
+        if never_updates is None:
+            never_updates = NEVER_COALESCE_UPDATES
+        if never_player_updates is None:
+            never_player_updates = NEVER_COALESCE_PLAYER_UPDATES
+        self.never_updates = never_updates
+        self.never_player_updates = never_player_updates
+
+        # events dropped per key
+        self.saved: Counter[str] = collections.Counter()
+        self.saved_players: Counter[str] = collections.Counter()
+
+    @property
+    def total_saved(self) -> int:
+        return sum(self.saved.values()) + sum(self.saved_players.values())
+
+    def coalesce(
+        self,
+        batch: List[events.GameEvent],
+    ) -> List[events.GameEvent]:
+        if len(batch) < 2:
+            return batch
+
+        seen: Set[Hashable] = set()
+        kept: List[events.GameEvent] = []
+        # walk backwards so the first occurrence seen is the final value
+        for event in reversed(batch):
+            if isinstance(event, events.Update):
+                if event.key not in self.never_updates:
+                    if event.key in seen:
+                        self.saved[event.key] += 1
+                        continue
+                    seen.add(event.key)
+            elif isinstance(event, events.PlayerUpdate):
+                if event.key not in self.never_player_updates:
+                    key = (event.username, event.key)
+                    if key in seen:
+                        self.saved_players[event.key] += 1
+                        continue
+                    seen.add(key)
+            kept.append(event)
+
+        kept.reverse()
+        return kept
+
+    def report(self) -> str:
+        lines = [f'{self.total_saved} events coalesced']
+        for key, count in self.saved.most_common():
+            lines.append(f'  update {key}: {count}')
+        for key, count in self.saved_players.most_common():
+            lines.append(f'  playerUpdate {key}: {count}')
+        return '\n'.join(lines)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+from typing import (
+    Deque,
+    List,
+    Optional,
+)
+
+import asyncio
+import collections
+import threading
+
+import dbot.network.events as events
+
+
+class EventQueue:
+    """ Inbound GameEvents, filled by the socketio thread
+
+        A deque guarded by a Condition. `drain` takes a whole batch of
+        events under a single lock acquisition, rather than queue.Queue's
+        two per event.
+    """
+
+    def __init__(self) -> None:
+        self.events: Deque[events.GameEvent] = collections.deque()
+        self.condition = threading.Condition()
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def put_nowait(
+        self,
+        event: events.GameEvent,
+    ) -> None:
+        with self.condition:
+            self.events.append(event)
+            if len(self.events) > self.max_depth:
+                self.max_depth = len(self.events)
+            self.condition.notify()
+
+    def drain(
+        self,
+        limit: Optional[int] = None,
+    ) -> List[events.GameEvent]:
+        """ pop up to limit pending events (all of them for None) """
+        with self.condition:
+            return drain_deque(self.events, limit)
+
+    def wait(
+        self,
+        timeout: Optional[float],
+    ) -> bool:
+        """ wait up to timeout seconds for an event, True if one is ready """
+        with self.condition:
+            return self.condition.wait_for(
+                lambda: len(self.events) > 0,
+                timeout,
+            )
+
+
+class AsyncEventQueue:
+    """ Inbound GameEvents for AsyncRetroSocket
+
+        Decoding and handling share one event loop, so only waiting needs
+        any synchronisation.
+    """
+
+    def __init__(self) -> None:
+        self.events: Deque[events.GameEvent] = collections.deque()
+        self.ready = asyncio.Event()
+        self.max_depth = 0
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def put_nowait(
+        self,
+        event: events.GameEvent,
+    ) -> None:
+        self.events.append(event)
+        if len(self.events) > self.max_depth:
+            self.max_depth = len(self.events)
+        self.ready.set()
+
+    def drain(
+        self,
+        limit: Optional[int] = None,
+    ) -> List[events.GameEvent]:
+        """ pop up to limit pending events (all of them for None) """
+        batch = drain_deque(self.events, limit)
+        if len(self.events) == 0:
+            self.ready.clear()
+        return batch
+
+    async def wait(
+        self,
+        timeout: Optional[float],
+    ) -> bool:
+        """ wait up to timeout seconds for an event, True if one is ready """
+        if len(self.events) > 0:
+            return True
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return len(self.events) > 0
+
+
+def drain_deque(
+    pending: Deque[events.GameEvent],
+    limit: Optional[int],
+) -> List[events.GameEvent]:
+    if limit is None or limit >= len(pending):
+        batch = list(pending)
+        pending.clear()
+        return batch
+    return [pending.popleft() for _ in range(limit)]
@@ -1,4 +1,5 @@
 from typing import (
+    ClassVar,
     List,
     Optional,
     Union,
@@ -8,17 +9,16 @@ from dbot.battle.battle import BattleEvent
 from dbot.common.common import (
     Direction,
     PlayerData,
+    Record,
+    setfield,
 )
 
 
-class GameEvent:
-    """ Base for all event types """
+class GameEvent(Record):
+    """ Base for all event types, the name is a class constant """
 
-    def __init__(
-        self,
-        name: str,
-    ) -> None:
-        self.event_name = name
+    __slots__ = ()
+    event_name: ClassVar[str] = ''
 
 #
 # general
@@ -28,41 +28,64 @@ class GameEvent:
 class Connected(GameEvent):
     """ Websocket connected """
 
-    def __init__(self) -> None:
-        super().__init__('connected')
+    __slots__ = ()
+    event_name = 'connected'
 
 
 class SignedIn(GameEvent):
     """ This player signed in successfully """
 
+    __slots__ = ('uuid',)
+    event_name = 'signedIn'
+    uuid: str
+
     def __init__(
         self,
         uuid: str,
     ) -> None:
-        super().__init__('signedIn')
-        self.uuid = uuid
+        setfield(self, 'uuid', uuid)
 
 
 class PlayerSignedIn(GameEvent):
     """ A player has signed in """
 
+    __slots__ = ('player',)
+    event_name = 'playerSignedIn'
+    player: PlayerData
+
     def __init__(
         self,
         player: PlayerData,
     ) -> None:
-        super().__init__('playerSignedIn')
-        self.player = player
+        setfield(self, 'player', player)
+
+
+class PlayerSignedOut(GameEvent):
+    """ A player has signed out """
+
+    __slots__ = ('username',)
+    event_name = 'playerSignedOut'
+    username: str
+
+    def __init__(
+        self,
+        username: str,
+    ) -> None:
+        setfield(self, 'username', username)
 
 
 class PlayerPreviouslySignedIn(GameEvent):
     """ List of players already signed in """
 
+    __slots__ = ('players',)
+    event_name = 'playerPreviouslySignedIn'
+    players: List[PlayerData]
+
     def __init__(
         self,
         players: List[PlayerData],
     ) -> None:
-        super().__init__('playerPreviouslySignedIn')
-        self.players = players
+        setfield(self, 'players', players)
 
 
 # class SelectableCharacters
@@ -73,21 +96,25 @@ class PlayerPreviouslySignedIn(GameEvent):
 class StartCharacterSelect(GameEvent):
     """ Display character select screen """
 
-    def __init__(self) -> None:
-        super().__init__('startCharacterSelect')
+    __slots__ = ()
+    event_name = 'startCharacterSelect'
 
 
 class Update(GameEvent):
     """ Used to update all kinds of client side key-value pairs """
 
+    __slots__ = ('value', 'key')
+    event_name = 'update'
+    value: Union[int, str]
+    key: str
+
     def __init__(
         self,
         key: str,
         value: Union[int, str],
     ) -> None:
-        super().__init__('update')
-        self.value = value
-        self.key = key
+        setfield(self, 'value', value)
+        setfield(self, 'key', key)
 
 
 #
@@ -98,63 +125,77 @@ class Update(GameEvent):
 class MovePlayer(GameEvent):
     """ Some player moved """
 
+    __slots__ = ('direction', 'username')
+    event_name = 'movePlayer'
+    direction: Direction
+    username: str
+
     def __init__(
         self,
         direction: Direction,
         username: str,
     ) -> None:
-        super().__init__('movePlayer')
-        self.direction = direction
-        self.username = username
+        setfield(self, 'direction', direction)
+        setfield(self, 'username', username)
 
 
 class Bonk(GameEvent):
     """ Bonked a wall """
 
-    def __init__(self) -> None:
-        super().__init__('bonk')
+    __slots__ = ()
+    event_name = 'bonk'
 
 
 class Transport(GameEvent):
     """ Teleport to coords within map """
 
+    __slots__ = ('x', 'y')
+    event_name = 'transport'
+    x: int
+    y: int
+
     def __init__(
         self,
         x: int,
         y: int,
     ) -> None:
-        super().__init__('transport')
-        self.x = x
-        self.y = y
+        setfield(self, 'x', x)
+        setfield(self, 'y', y)
 
 
 class JoinMap(GameEvent):
     """ This player has joined the map """
 
+    __slots__ = ('map_name',)
+    event_name = 'joinMap'
+    map_name: str
+
     def __init__(
         self,
         name: str,
     ) -> None:
-        super().__init__('joinMap')
-        self.map_name = name
+        setfield(self, 'map_name', name)
 
 
 class LeaveMap(GameEvent):
     """ This player has left the current map """
 
-    def __init__(self) -> None:
-        super().__init__('leaveMap')
+    __slots__ = ()
+    event_name = 'leaveMap'
 
 
 class PlayerLeftMap(GameEvent):
     """ A player left the current map """
 
+    __slots__ = ('username',)
+    event_name = 'playerLeftMap'
+    username: str
+
     def __init__(
         self,
         username: str,
     ) -> None:
-        super().__init__('playerLeftMap')
-        self.username = username
+        setfield(self, 'username', username)
 
 
 #
@@ -165,27 +206,35 @@ class PlayerLeftMap(GameEvent):
 class PlayerUpdate(GameEvent):
     """ Updates player-specific key-value pairs """
 
+    __slots__ = ('username', 'value', 'key')
+    event_name = 'playerUpdate'
+    username: str
+    value: Union[int, str]
+    key: str
+
     def __init__(
         self,
         username: str,
         key: str,
         value: Union[int, str],
     ) -> None:
-        super().__init__('playerUpdate')
-        self.username = username
-        self.value = value
-        self.key = key
+        setfield(self, 'username', username)
+        setfield(self, 'value', value)
+        setfield(self, 'key', key)
 
 
 class SelectPlayer(GameEvent):
     """ A player has been selected -> display menu """
 
+    __slots__ = ('username',)
+    event_name = 'selectPlayer'
+    username: str
+
     def __init__(
         self,
         username: str,
     ) -> None:
-        super().__init__('selectPlayer')
-        self.username = username
+        setfield(self, 'username', username)
 
 
 #
@@ -196,25 +245,32 @@ class SelectPlayer(GameEvent):
 class InvitePlayer(GameEvent):
     """ A player has been invited to a party """ # TODO
 
+    __slots__ = ('username',)
+    event_name = 'invitePlayer'
+    username: str
+
     def __init__(
         self,
         username: str,
     ) -> None:
-        super().__init__('invitePlayer')
-        self.username = username
+        setfield(self, 'username', username)
 
 
 class Party(GameEvent):
     """ A new player joines the party """
 
+    __slots__ = ('party_id', 'party')
+    event_name = 'party'
+    party_id: int
+    party: List[str]
+
     def __init__(
         self,
         party: List[str],
         party_id: int,
     ) -> None:
-        super().__init__('party')
-        self.party_id = party_id
-        self.party = party
+        setfield(self, 'party_id', party_id)
+        setfield(self, 'party', party)
 
 #
 # pvp battles
@@ -225,8 +281,8 @@ class ChallengePlayer(GameEvent):
     """ A battle request is sent """
     # TODO
 
-    def __init__(self) -> None:
-        super().__init__('challengePlayer')
+    __slots__ = ()
+    event_name = 'challengePlayer'
 
 
 #
@@ -236,34 +292,40 @@ class ChallengePlayer(GameEvent):
 
 class StartBattle(GameEvent):
 
-    def __init__(self) -> None:
-        super().__init__('startBattle')
+    __slots__ = ()
+    event_name = 'startBattle'
 
 
 class LeaveBattle(GameEvent):
 
-    def __init__(self) -> None:
-        super().__init__('leaveBattle')
+    __slots__ = ()
+    event_name = 'leaveBattle'
 
 
 class BattleEvents(GameEvent):
 
+    __slots__ = ('events',)
+    event_name = 'battleEvents'
+    events: List[BattleEvent]
+
     def __init__(
         self,
         events: List[BattleEvent],
     ) -> None:
-        super().__init__('battleEvents')
-        self.events = events
+        setfield(self, 'events', events)
 
 
 class PlayOutBattleRound(GameEvent):
 
+    __slots__ = ('duration',)
+    event_name = 'playOutBattleRound'
+    duration: int
+
     def __init__(
         self,
         duration: int,
     ) -> None:
-        super().__init__('playOutBattleRound')
-        self.duration = duration
+        setfield(self, 'duration', duration)
 
 
 #
@@ -275,22 +337,22 @@ class RequestPlayer(GameEvent):
     """ A trade request is sent """
     # TODO
 
-    def __init__(self) -> None:
-        super().__init__('requestPlayer')
+    __slots__ = ()
+    event_name = 'requestPlayer'
 
 
 class StartTrade(GameEvent):
     """ Trade was accepted, begin trade """
 
-    def __init__(self) -> None:
-        super().__init__('startTrade')
+    __slots__ = ()
+    event_name = 'startTrade'
 
 
 class LeaveTrade(GameEvent):
     """ Exit trade for any reason """
 
-    def __init__(self) -> None:
-        super().__init__('leaveTrade')
+    __slots__ = ()
+    event_name = 'leaveTrade'
 
 
 #
@@ -301,6 +363,28 @@ class LeaveTrade(GameEvent):
 class Message(GameEvent):
     """ A chat message """
 
+    __slots__ = (
+        'channel',
+        'cierra',
+        'contents',
+        'mid',
+        'months_subscribed',
+        'permissions',
+        'subscriber',
+        'username',
+        'warning',
+    )
+    event_name = 'message'
+    channel: str
+    cierra: bool
+    contents: str
+    mid: int
+    months_subscribed: Optional[int]
+    permissions: int
+    subscriber: bool
+    username: str
+    warning: bool
+
     def __init__(
         self,
         channel: str,
@@ -313,16 +397,15 @@ class Message(GameEvent):
         username: str,
         warning: bool,
     ) -> None:
-        super().__init__('message')
-        self.channel = channel
-        self.cierra = cierra
-        self.contents = contents
-        self.mid = mid
-        self.months_subscribed = months_subscribed
-        self.permissions = permissions
-        self.subscriber = subscriber
-        self.username = username
-        self.warning = warning
+        setfield(self, 'channel', channel)
+        setfield(self, 'cierra', cierra)
+        setfield(self, 'contents', contents)
+        setfield(self, 'mid', mid)
+        setfield(self, 'months_subscribed', months_subscribed)
+        setfield(self, 'permissions', permissions)
+        setfield(self, 'subscriber', subscriber)
+        setfield(self, 'username', username)
+        setfield(self, 'warning', warning)
 
 
 #
@@ -333,13 +416,13 @@ class Message(GameEvent):
 class OpenBank(GameEvent):
     """ Bank UI has been opened """
 
-    def __init__(self) -> None:
-        super().__init__('openBank')
+    __slots__ = ()
+    event_name = 'openBank'
 
 
 class CloseBank(GameEvent):
     """ Bank UI has been closed """
 
-    def __init__(self) -> None:
-        super().__init__('closeBank')
+    __slots__ = ()
+    event_name = 'closeBank'
 
@@ -0,0 +1,268 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+import asyncio
+import collections
+import enum
+import logging
+import threading
+import time
+
+
+class Priority(enum.IntEnum):
+    """ outbound message classes, lower values are sent first """
+
+    control = 0 # movement and battle keys, sign in/out
+    ui = 1      # clicks
+    chat = 2    # chat messages
+
+
+# (messages per second, burst size)
+DEFAULT_LIMITS: Dict[Priority, Tuple[float, float]] = {
+    Priority.control: (50.0, 20.0),
+    Priority.ui: (10.0, 5.0),
+    Priority.chat: (1.0, 3.0),
+}
+
+
+Outbound = Tuple[str, Any]
+
+
+class TokenBucket:
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+
+    def delay(
+        self,
+        now: float,
+    ) -> float:
+        """ seconds until a token is available, 0 if one is ready now """
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1.0
+
+
+class OutboundScheduler:
+    """ Prioritized, rate-limited queue of outbound messages
+
+        Each Priority has its own FIFO queue and TokenBucket. The highest
+        priority message that has a token is sent first, so a burst of
+        chat can never hold up a movement keyup. Lower priorities may go
+        while higher ones are waiting on their rate limit.
+
+        Not thread safe on its own, see ThreadedEmitter and AsyncEmitter.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[Priority, Tuple[float, float]]] = None,
+    ) -> None:
+        limits = limits or DEFAULT_LIMITS
+        self.queues: Dict[Priority, Deque[Outbound]] = {
+            p: collections.deque() for p in Priority
+        }
+        self.buckets: Dict[Priority, TokenBucket] = {
+            p: TokenBucket(*limits[p]) for p in Priority
+        }
+        self.sent: Dict[Priority, int] = {p: 0 for p in Priority}
+        self.max_depth: Dict[Priority, int] = {p: 0 for p in Priority}
+
+    @property
+    def depth(self) -> Dict[Priority, int]:
+        """ number of queued messages per priority """
+        return {p: len(q) for p, q in self.queues.items()}
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def put(
+        self,
+        priority: Priority,
+        message: str,
+        data: Any,
+    ) -> None:
+        queue = self.queues[priority]
+        queue.append((message, data))
+        if len(queue) > self.max_depth[priority]:
+            self.max_depth[priority] = len(queue)
+
+    def pop(
+        self,
+        now: float,
+    ) -> Tuple[Optional[Outbound], Optional[float]]:
+        """ next message to send, otherwise seconds to wait (None=forever) """
+        wait: Optional[float] = None
+        for priority, queue in self.queues.items():
+            if len(queue) == 0:
+                continue
+            bucket = self.buckets[priority]
+            delay = bucket.delay(now)
+            if delay == 0.0:
+                bucket.take()
+                self.sent[priority] += 1
+                return queue.popleft(), None
+            if wait is None or delay < wait:
+                wait = delay
+        return None, wait
+
+
+class ThreadedEmitter:
+    """ sends from an OutboundScheduler on a dedicated writer thread """
+
+    def __init__(
+        self,
+        scheduler: OutboundScheduler,
+        send: Callable[[str, Any], None],
+    ) -> None:
+        self.scheduler = scheduler
+        self.send = send
+        self.condition = threading.Condition()
+        self.thread: Optional[threading.Thread] = None
+        self.in_flight = False
+        self.running = False
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(
+            target=self.write_forever,
+            name='dbot-writer',
+            daemon=True,
+        )
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def put(
+        self,
+        priority: Priority,
+        message: str,
+        data: Any,
+    ) -> None:
+        with self.condition:
+            self.scheduler.put(priority, message, data)
+            self.condition.notify_all()
+
+    def flush(
+        self,
+        timeout = 2.0,
+    ) -> None:
+        """ wait for queued sends to be written """
+        with self.condition:
+            done = self.condition.wait_for(
+                lambda: len(self.scheduler) == 0 and not self.in_flight,
+                timeout,
+            )
+            if not done:
+                logging.warning(f'{len(self.scheduler)} sends not flushed')
+
+    def write_forever(self) -> None:
+        while True:
+            with self.condition:
+                self.in_flight = False
+                self.condition.notify_all()
+                while True:
+                    if not self.running:
+                        return
+                    item, wait = self.scheduler.pop(time.monotonic())
+                    if item is not None:
+                        self.in_flight = True
+                        break
+                    self.condition.wait(wait)
+
+            message, data = item
+            try:
+                self.send(message, data)
+            except Exception as e:
+                logging.warning(f'failed to send {message}: {e}')
+
+
+class AsyncEmitter:
+    """ sends from an OutboundScheduler on a dedicated writer task """
+
+    def __init__(
+        self,
+        scheduler: OutboundScheduler,
+        send: Callable[[str, Any], Awaitable[None]],
+    ) -> None:
+        self.scheduler = scheduler
+        self.send = send
+        self.wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.ensure_future(self.write_forever())
+
+    def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    def put(
+        self,
+        priority: Priority,
+        message: str,
+        data: Any,
+    ) -> None:
+        self.scheduler.put(priority, message, data)
+        self.idle.clear()
+        self.wakeup.set()
+
+    async def flush(
+        self,
+        timeout = 2.0,
+    ) -> None:
+        """ wait for queued sends to be written """
+        if self.task is None:
+            return
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f'{len(self.scheduler)} sends not flushed')
+
+    async def write_forever(self) -> None:
+        while True:
+            item, wait = self.scheduler.pop(time.monotonic())
+            if item is None:
+                if wait is None:
+                    self.idle.set()
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            message, data = item
+            try:
+                await self.send(message, data)
+            except Exception as e:
+                logging.warning(f'failed to send {message}: {e}')
@@ -4,6 +4,7 @@ from typing import (
     Any,
     Collection,
     Dict,
+    FrozenSet,
     List,
     Optional,
     Type,
@@ -11,15 +12,27 @@ from typing import (
     Union,
 )
 
+import collections
 import logging
 import pprint
 import socketio
-import queue
 import time
 import traceback
 
 from dbot.battle.battle import BattleEvent
 import dbot.network.events as events
+from dbot.network.capture import CaptureWriter
+from dbot.network.eventqueue import (
+    AsyncEventQueue,
+    EventQueue,
+)
+from dbot.network.subscriptions import ALWAYS_HANDLED
+from dbot.network.outbound import (
+    AsyncEmitter,
+    OutboundScheduler,
+    Priority,
+    ThreadedEmitter,
+)
 from dbot.common.common import (
     Direction,
     PlayerData,
@@ -32,11 +45,12 @@ def require_args(d: Union[List, Dict], l: int) -> None:
         raise ValueError('not enough data')
 
 
-class GlobalNamespace(socketio.ClientNamespace):
-    """ A ClientNamespace for handling all websocket messages.
+class EventDecoder:
+    """ Decodes websocket messages into events.GameEvent objects.
 
-        `trigger_event` is overriding socketio.ClientNamespace to provide
-        handler lookup and logging unhandled events and exceptions.
+        This is shared by the threaded GlobalNamespace and the asyncio
+        AsyncGlobalNamespace. `handle_message` provides handler lookup and
+        logging unhandled events and exceptions.
 
         Each message type filters into an `on_*` handler method, which is
         responsible for creating an events.GameEvent object from the message
@@ -45,15 +59,38 @@ class GlobalNamespace(socketio.ClientNamespace):
 
     def __init__(
         self,
-        event_queue: queue.Queue,
+        event_queue: Union[EventQueue, AsyncEventQueue],
         *args,
         **kwargs,
     ) -> None:
         super().__init__(*args, **kwargs)
         self.event_queue = event_queue
+        self.capture: Optional[CaptureWriter] = None
+
+        # events someone will handle, None for all. See subscriptions.py
+        self.subscriptions: Optional[FrozenSet[str]] = None
+        self.dropped: Dict[str, int] = collections.Counter()
+
+    def queue_event(
+        self,
+        event: events.GameEvent,
+    ) -> None:
+        self.event_queue.put_nowait(event)
+
+    def handle_message(self, event, *args):
+        if self.capture is not None:
+            self.capture.record(event, args)
+
+        subscriptions = self.subscriptions
+        if (
+            subscriptions is not None and
+            event not in subscriptions and
+            event not in ALWAYS_HANDLED
+        ):
+            # nobody would handle it, don't bother decoding
+            self.dropped[event] += 1
+            return
 
-    def trigger_event(self, event, *args):
-        """ overrididing ClientNamespace """
         handler_name = f'on_{event}'
         if not hasattr(self, handler_name):
             # logging.info(f'not handled: {event} ({args})')
@@ -104,7 +141,7 @@ class GlobalNamespace(socketio.ClientNamespace):
     #
 
     def on_connect(self):
-        self.event_queue.put(
+        self.queue_event(
             events.Connected()
         )
 
@@ -113,31 +150,37 @@ class GlobalNamespace(socketio.ClientNamespace):
 
     def on_signedIn(self, data):
         uuid = assert_type(data, str)
-        self.event_queue.put(
+        self.queue_event(
             events.SignedIn(uuid)
         )
 
     def on_playerSignedIn(self, data):
         player = self.load_player(data)
-        self.event_queue.put(
+        self.queue_event(
             events.PlayerSignedIn(player)
         )
 
+    def on_playerSignedOut(self, data):
+        username = assert_type(data, str)
+        self.queue_event(
+            events.PlayerSignedOut(username)
+        )
+
     def on_playerPreviouslySignedIn(self, data):
         players = list(map(self.load_player, data))
-        self.event_queue.put(
+        self.queue_event(
             events.PlayerPreviouslySignedIn(players)
         )
 
     def on_startCharacterSelect(self, data):
-        self.event_queue.put(
+        self.queue_event(
             events.StartCharacterSelect()
         )
 
     def on_update(self, data):
         key = expect_str_in(data, 'key')
         value = data['value']
-        self.event_queue.put(
+        self.queue_event(
             events.Update(
                 key,
                 value,
@@ -151,7 +194,7 @@ class GlobalNamespace(socketio.ClientNamespace):
     def on_movePlayer(self, data):
         direction = Direction(expect_str_in(data, 'direction'))
         username = expect_str_in(data, 'username')
-        self.event_queue.put(
+        self.queue_event(
             events.MovePlayer(
                 direction,
                 username,
@@ -159,29 +202,29 @@ class GlobalNamespace(socketio.ClientNamespace):
         )
 
     def on_bonk(self, data):
-        self.event_queue.put(events.Bonk())
+        self.queue_event(events.Bonk())
 
     def on_transport(self, data):
         x = expect_int_in(data, 'x')
         y = expect_int_in(data, 'y')
-        self.event_queue.put(
+        self.queue_event(
             events.Transport(x, y)
         )
 
     def on_joinMap(self, data):
         map_name = assert_type(data, str)
-        self.event_queue.put(
+        self.queue_event(
             events.JoinMap(map_name)
         )
 
     def on_leaveMap(self, data):
-        self.event_queue.put(
+        self.queue_event(
             events.LeaveMap()
         )
 
     def on_playerLeftMap(self, data):
         username = assert_type(data, str)
-        self.event_queue.put(
+        self.queue_event(
             events.PlayerLeftMap(username)
         )
 
@@ -193,7 +236,7 @@ class GlobalNamespace(socketio.ClientNamespace):
         username = expect_str_in(data, 'username')
         key = expect_str_in(data, 'key')
         value = data['value']
-        self.event_queue.put(
+        self.queue_event(
             events.PlayerUpdate(
                 username,
                 key,
@@ -204,7 +247,7 @@ class GlobalNamespace(socketio.ClientNamespace):
     def on_selectPlayer(self, data):
         require_args(data, 1)
         username = assert_type(data, str)
-        self.event_queue.put(
+        self.queue_event(
             events.SelectPlayer(username)
         )
 
@@ -215,14 +258,14 @@ class GlobalNamespace(socketio.ClientNamespace):
     def on_invitePlayer(self, data):
         require_args(data, 1)
         username = assert_type(data, str)
-        self.event_queue.put(
+        self.queue_event(
             events.InvitePlayer(username)
         )
 
     def on_party(self, data):
         party = expect_list_in(data, 'party')
         pid = expect_int_in(data, 'partyID')
-        self.event_queue.put(
+        self.queue_event(
             events.Party(
                 party,
                 pid,
@@ -241,12 +284,12 @@ class GlobalNamespace(socketio.ClientNamespace):
     #
 
     def on_startBattle(self, data):
-        self.event_queue.put(
+        self.queue_event(
             events.StartBattle()
         )
 
     def on_leaveBattle(self, data):
-        self.event_queue.put(
+        self.queue_event(
             events.LeaveBattle()
         )
 
@@ -255,12 +298,12 @@ class GlobalNamespace(socketio.ClientNamespace):
     # TODO playerUpdate(selectedTarget)
     def on_battleEvents(self, data):
         es = list(map(BattleEvent.decode_from, assert_type(data, list)))
-        self.event_queue.put(
+        self.queue_event(
             events.BattleEvents(es)
         )
 
     def on_playOutBattleRound(self, data):
-        self.event_queue.put(
+        self.queue_event(
             events.PlayOutBattleRound(assert_type(data, int))
         )
 
@@ -287,7 +330,7 @@ class GlobalNamespace(socketio.ClientNamespace):
         channel = expect_str_in(data, 'channel')
         cierra = expect_bool_in(data, 'cierra')
         mid = expect_int_in(data, 'id')
-        self.event_queue.put(
+        self.queue_event(
             events.Message(
                 channel,
                 cierra,
@@ -309,42 +352,80 @@ class GlobalNamespace(socketio.ClientNamespace):
     # def on_npcUpdate(self, data):
 
 
-class RetroSocket:
-    """ websocket wrapper for retrommo """
+class GlobalNamespace(EventDecoder, socketio.ClientNamespace):
+    """ A ClientNamespace for handling all websocket messages.
+
+        `trigger_event` is overriding socketio.ClientNamespace to decode
+        messages with EventDecoder.
+    """
+
+    def trigger_event(self, event, *args):
+        """ overrididing ClientNamespace """
+        self.handle_message(event, *args)
+
+
+class AsyncGlobalNamespace(EventDecoder, socketio.AsyncClientNamespace):
+    """ An AsyncClientNamespace for handling all websocket messages.
+
+        Decoding is synchronous, events are placed into an AsyncEventQueue.
+        CPU time spent decoding is tracked for per-bot accounting when
+        several bots share one process.
+    """
+
+    def __init__(
+        self,
+        *args,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.cpu_time = 0.0
+
+    async def trigger_event(self, event, *args):
+        """ overrididing AsyncClientNamespace """
+        start = time.process_time()
+        self.handle_message(event, *args)
+        self.cpu_time += time.process_time() - start
+
+
+class BaseRetroSocket:
+    """ send wrappers and event access shared by both socket types """
 
     def __init__(
         self,
         host = 'retrommo-bots.herokuapp.com',
         port = 443,
+        secure: Optional[bool] = None,
     ) -> None:
         self.connected = False
         self.host = host
         self.port = port
+        # default to https only on the https port, so a local
+        # server (see dbot.server.localserver) works with just host/port
+        self.secure = port == 443 if secure is None else secure
 
-        self.event_queue: queue.Queue = queue.Queue()
-        self.socket = socketio.Client()
-        self.socket.register_namespace(
-            GlobalNamespace(self.event_queue, '/')
-        )
+    @property
+    def url(self) -> str:
+        scheme = 'https' if self.secure else 'http'
+        return f'{scheme}://{self.host}:{self.port}'
 
-    def __enter__(self) -> RetroSocket:
-        self.connect()
-        return self
-
-    def __exit__(self, typ_, value, tb) -> None:
-        self.disconnect()
-        return
+    def drain_events(
+        self,
+        limit: Optional[int] = None,
+    ) -> List[events.GameEvent]:
+        """ pop up to limit received events, all of them for None """
+        raise NotImplementedError('drain_events should be overridden')
 
-    def connect(self) -> None:
-        if self.connected:
-            raise RuntimeError('already connected')
-        self.socket.connect(f'https://{self.host}:{self.port}')
-        self.connected = True
+    @property
+    def pending_events(self) -> int:
+        """ received events that haven't been drained yet """
+        raise NotImplementedError('pending_events should be overridden')
 
-    def disconnect(self) -> None:
-        if self.connected:
-            self.socket.disconnect()
-            self.connected = False
+    def subscribe(
+        self,
+        names: Optional[FrozenSet[str]],
+    ) -> None:
+        """ only decode these GameEvents, None for all of them """
+        raise NotImplementedError('subscribe should be overridden')
 
     #
     # send wrappers
@@ -353,9 +434,10 @@ class RetroSocket:
     def emit(
         self,
         message: str,
-        data: Any,
+        data: Any = None,
+        priority = Priority.control,
     ) -> None:
-        self.socket.emit(message, data)
+        raise NotImplementedError('emit should be overridden')
 
     def send_message(
         self,
@@ -363,10 +445,10 @@ class RetroSocket:
         contents: str,
     ) -> None:
         """ send a chat message """
-        self.socket.emit('message', {
+        self.emit('message', {
             'channel': channel,
             'contents': contents,
-        })
+        }, Priority.chat)
 
     def send_click(
         self,
@@ -374,7 +456,7 @@ class RetroSocket:
         y: float,
     ) -> None:
         """ send a click at x,y coords """
-        self.socket.emit('click', {
+        self.emit('click', {
             'down': {
                 'x': x,
                 'y': y,
@@ -383,14 +465,14 @@ class RetroSocket:
                 'x': x,
                 'y': y,
             },
-        })
+        }, Priority.ui)
 
     def send_keyup(
         self,
         key: str,
     ) -> None:
         """ send keyup (released) message """
-        self.socket.emit('keyup', key)
+        self.emit('keyup', key)
         # logging.debug(f'keyup: {key}')
 
     def send_keydown(
@@ -398,7 +480,7 @@ class RetroSocket:
         key: str,
     ) -> None:
         """ send a keydown (pressed) message """
-        self.socket.emit('keydown', key)
+        self.emit('keydown', key)
         # logging.debug(f'keydown: {key}')
 
     def send_keypress(
@@ -411,5 +493,212 @@ class RetroSocket:
     def send_logout(self) -> None:
         """ logout from retrommo """
         logging.info('logging out')
-        self.socket.emit('logOut')
+        self.emit('logOut')
+
+    #
+    # outbound metrics
+    #
+
+    @property
+    def scheduler(self) -> OutboundScheduler:
+        raise NotImplementedError('scheduler should be overridden')
+
+    @property
+    def queue_depth(self) -> Dict[Priority, int]:
+        """ outbound messages waiting to be sent, per priority """
+        return self.scheduler.depth
+
+
+class RetroSocket(BaseRetroSocket):
+    """ websocket wrapper for retrommo """
+
+    def __init__(
+        self,
+        host = 'retrommo-bots.herokuapp.com',
+        port = 443,
+        secure: Optional[bool] = None,
+        capture: Optional[str] = None,
+    ) -> None:
+        super().__init__(host, port, secure)
+
+        self.event_queue = EventQueue()
+        self.namespace = GlobalNamespace(self.event_queue, '/')
+        if capture is not None:
+            self.namespace.capture = CaptureWriter(capture)
+        self.socket = socketio.Client()
+        self.socket.register_namespace(self.namespace)
+        self.emitter = ThreadedEmitter(
+            OutboundScheduler(),
+            self.socket.emit,
+        )
+
+    def __enter__(self) -> RetroSocket:
+        self.connect()
+        return self
 
+    def __exit__(self, typ_, value, tb) -> None:
+        self.disconnect()
+        return
+
+    def connect(self) -> None:
+        if self.connected:
+            raise RuntimeError('already connected')
+        self.socket.connect(self.url)
+        self.emitter.start()
+        self.connected = True
+
+    def disconnect(self) -> None:
+        if self.connected:
+            self.emitter.flush()
+            self.emitter.stop()
+            self.socket.disconnect()
+            self.connected = False
+        if self.namespace.capture is not None:
+            self.namespace.capture.close()
+
+    @property
+    def scheduler(self) -> OutboundScheduler:
+        return self.emitter.scheduler
+
+    def drain_events(
+        self,
+        limit: Optional[int] = None,
+    ) -> List[events.GameEvent]:
+        return self.event_queue.drain(limit)
+
+    @property
+    def pending_events(self) -> int:
+        return len(self.event_queue)
+
+    def wait_for_event(
+        self,
+        timeout: float,
+    ) -> bool:
+        """ wait up to timeout seconds for an event, True if one is ready """
+        return self.event_queue.wait(timeout)
+
+    def subscribe(
+        self,
+        names: Optional[FrozenSet[str]],
+    ) -> None:
+        self.namespace.subscriptions = names
+
+    def emit(
+        self,
+        message: str,
+        data: Any = None,
+        priority = Priority.control,
+    ) -> None:
+        self.emitter.put(priority, message, data)
+
+
+class AsyncRetroSocket(BaseRetroSocket):
+    """ asyncio websocket wrapper for retrommo
+
+        Received events go into an AsyncEventQueue, so a bot can await
+        `wait_for_event` and wake up as soon as something arrives. The
+        send wrappers stay synchronous for existing event handlers, sends
+        are queued by priority and written by a writer task.
+
+        Must be created from within a running event loop.
+    """
+
+    def __init__(
+        self,
+        host = 'retrommo-bots.herokuapp.com',
+        port = 443,
+        secure: Optional[bool] = None,
+        capture: Optional[str] = None,
+    ) -> None:
+        super().__init__(host, port, secure)
+
+        self.event_queue = AsyncEventQueue()
+
+        self.namespace = AsyncGlobalNamespace(self.event_queue, '/')
+        if capture is not None:
+            self.namespace.capture = CaptureWriter(capture)
+        self.socket = socketio.AsyncClient()
+        self.socket.register_namespace(self.namespace)
+        self.emitter = AsyncEmitter(
+            OutboundScheduler(),
+            self.socket.emit,
+        )
+
+    async def __aenter__(self) -> AsyncRetroSocket:
+        await self.connect()
+        return self
+
+    async def __aexit__(self, typ_, value, tb) -> None:
+        await self.disconnect()
+        return
+
+    async def connect(self) -> None:
+        if self.connected:
+            raise RuntimeError('already connected')
+        await self.socket.connect(self.url)
+        self.emitter.start()
+        self.connected = True
+
+    async def disconnect(self) -> None:
+        if self.connected:
+            await self.flush()
+            self.emitter.stop()
+            await self.socket.disconnect()
+            self.connected = False
+        if self.namespace.capture is not None:
+            self.namespace.capture.close()
+
+    @property
+    def cpu_time(self) -> float:
+        """ process CPU seconds spent decoding this socket's messages """
+        return self.namespace.cpu_time
+
+    #
+    # events
+    #
+
+    def drain_events(
+        self,
+        limit: Optional[int] = None,
+    ) -> List[events.GameEvent]:
+        return self.event_queue.drain(limit)
+
+    @property
+    def pending_events(self) -> int:
+        return len(self.event_queue)
+
+    def subscribe(
+        self,
+        names: Optional[FrozenSet[str]],
+    ) -> None:
+        self.namespace.subscriptions = names
+
+    async def wait_for_event(
+        self,
+        timeout: float,
+    ) -> bool:
+        """ wait up to timeout seconds for an event, True if one is ready """
+        return await self.event_queue.wait(timeout)
+
+    #
+    # sending
+    #
+
+    @property
+    def scheduler(self) -> OutboundScheduler:
+        return self.emitter.scheduler
+
+    def emit(
+        self,
+        message: str,
+        data: Any = None,
+        priority = Priority.control,
+    ) -> None:
+        self.emitter.put(priority, message, data)
+
+    async def flush(
+        self,
+        timeout = 2.0,
+    ) -> None:
+        """ wait for queued sends to be written """
+        await self.emitter.flush(timeout)
@@ -0,0 +1,42 @@
+from typing import (
+    FrozenSet,
+    Optional,
+    Set,
+)
+
+
+# socket messages that are always decoded, these aren't GameEvent names
+ALWAYS_HANDLED = frozenset({
+    'connect',
+    'disconnect',
+})
+
+
+def handled_by(obj: object) -> Optional[Set[str]]:
+    """ Names of the GameEvents that obj has handlers for
+
+        Objects with a `catch_all_handler` can list the events it actually
+        looks at in `catch_all_events`. If they don't, None is returned,
+        meaning they want every event.
+    """
+    names = {
+        attr[len('on_'):] for attr in dir(type(obj))
+        if attr.startswith('on_')
+    }
+    if hasattr(obj, 'catch_all_handler'):
+        catch_all = getattr(obj, 'catch_all_events', None)
+        if catch_all is None:
+            return None
+        names.update(catch_all)
+    return names
+
+
+def handled_events(*targets: object) -> Optional[FrozenSet[str]]:
+    """ union of handled_by for all targets, None if any want everything """
+    names: Set[str] = set()
+    for target in targets:
+        handled = handled_by(target)
+        if handled is None:
+            return None
+        names.update(handled)
+    return frozenset(names)
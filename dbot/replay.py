@@ -0,0 +1,157 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+)
+
+import collections
+import logging
+import time
+
+import dbot.network.events as events
+from dbot.bot import (
+    BasicBot,
+    BotCore,
+)
+from dbot.config import BotConfig
+from dbot.network.capture import CaptureReader
+from dbot.network.eventqueue import EventQueue
+from dbot.network.outbound import (
+    OutboundScheduler,
+    Priority,
+)
+from dbot.network.retrosocket import (
+    BaseRetroSocket,
+    EventDecoder,
+)
+
+
+class ReplaySocket(BaseRetroSocket):
+    """ stands in for a connected socket, sends are counted and dropped """
+
+    def __init__(self) -> None:
+        super().__init__('replay', 0, False)
+        self.event_queue = EventQueue()
+        self.decoder = EventDecoder(self.event_queue)
+        self.sent: Dict[str, int] = collections.Counter()
+        self.connected = True
+        self._scheduler = OutboundScheduler()
+
+    def drain_events(
+        self,
+        limit: Optional[int] = None,
+    ) -> List[events.GameEvent]:
+        return self.event_queue.drain(limit)
+
+    @property
+    def pending_events(self) -> int:
+        return len(self.event_queue)
+
+    def subscribe(
+        self,
+        names: Optional[FrozenSet[str]],
+    ) -> None:
+        self.decoder.subscriptions = names
+
+    def emit(
+        self,
+        message: str,
+        data: Any = None,
+        priority = Priority.control,
+    ) -> None:
+        self.sent[message] += 1
+
+    @property
+    def scheduler(self) -> OutboundScheduler:
+        return self._scheduler
+
+
+class ReplayStats:
+
+    def __init__(self) -> None:
+        self.n_messages = 0
+        self.n_events = 0
+        self.elapsed = 0.0
+        self.decode_time = 0.0
+        self.dispatch_time = 0.0
+
+    @property
+    def events_per_second(self) -> float:
+        busy = self.decode_time + self.dispatch_time
+        return self.n_messages / busy if busy > 0 else 0.0
+
+    def __str__(self) -> str:
+        return '\n'.join([
+            f'{self.n_messages} messages -> {self.n_events} events',
+            f'elapsed  {self.elapsed:.3f}s',
+            f'decode   {self.decode_time:.3f}s',
+            f'dispatch {self.dispatch_time:.3f}s',
+            f'{self.events_per_second:.0f} messages/s (decode + dispatch)',
+        ])
+
+
+def replay(
+    filename: str,
+    bot: BotCore,
+    speed = 0.0,
+) -> ReplayStats:
+    """ Feed a capture file through the decoder into bot.handle_event
+
+        speed is a multiple of real time (1.0 is as recorded, 10.0 is
+        ten times as fast), 0 replays as fast as possible. Actions are not
+        stepped, and anything the bot sends is dropped.
+    """
+    socket = ReplaySocket()
+    bot.socket = socket
+    bot.refresh_subscriptions()
+    stats = ReplayStats()
+
+    first: Optional[float] = None
+    start = time.perf_counter()
+    for timestamp, name, args in CaptureReader(filename):
+        if first is None:
+            first = timestamp
+        if speed > 0:
+            delay = start + (timestamp - first) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        t0 = time.perf_counter()
+        socket.decoder.handle_message(name, *args)
+        t1 = time.perf_counter()
+        for event in socket.drain_events():
+            bot.handle_event(event)
+            stats.n_events += 1
+        t2 = time.perf_counter()
+
+        stats.n_messages += 1
+        stats.decode_time += t1 - t0
+        stats.dispatch_time += t2 - t1
+
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('capture')
+    parser.add_argument('botname')
+    parser.add_argument('--config', type=str, default=None)
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='multiple of real time, 0 for max speed')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.config is not None:
+        config = BotConfig.from_file(args.config, args.botname)
+    else:
+        config = BotConfig(args.botname, '', '')
+
+    stats = replay(args.capture, BasicBot(config), args.speed)
+    print(stats)
@@ -0,0 +1,717 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import asyncio
+import logging
+import random
+import re
+import time
+import uuid
+
+import socketio
+from aiohttp import web
+
+from dbot.common.common import (
+    Direction,
+    UIPositions,
+)
+from dbot.movement.collision import (
+    CollisionManager,
+    CollisionState,
+)
+from dbot.movement.pathfinding import Point
+
+
+# inverse of MovementController.direction_keys
+KEY_DIRECTIONS = {
+    'w': Direction.up,
+    's': Direction.down,
+    'a': Direction.left,
+    'd': Direction.right,
+}
+
+DIRECTION_DELTAS = {
+    Direction.up:    (0, -1),
+    Direction.down:  (0, 1),
+    Direction.left:  (-1, 0),
+    Direction.right: (1, 0),
+}
+
+# CollisionMap stores transports as f'{map_name}{destination}'
+TRANSPORT_RE = re.compile(r'^(.*)\((-?\d+), (-?\d+)\)$')
+
+
+def near(
+    a: Tuple[float, float],
+    b: Tuple[float, float],
+    tolerance = 4.0,
+) -> bool:
+    return abs(a[0] - b[0]) <= tolerance and abs(a[1] - b[1]) <= tolerance
+
+
+class SimPlayer:
+    """ server side state of one player """
+
+    def __init__(
+        self,
+        username: str,
+        sid: Optional[str],
+        map_name: str,
+        point: Point,
+    ) -> None:
+        self.username = username
+        self.sid = sid
+        self.map = map_name
+        self.x, self.y = point
+
+        # title -> select -> world
+        self.stage = 'title'
+        # none, player select, party prompt, battle
+        self.ui = 'none'
+        self.selected: Optional[str] = None
+        self.invited_by: Optional[str] = None
+
+        self.moving: Optional[Direction] = None
+        self.move_task: Optional[asyncio.Task] = None
+
+        self.party: List[str] = [username]
+        self.battle: Optional[SimBattle] = None
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        """ player data, as decoded by GlobalNamespace.load_player """
+        return {
+            'monthsSubscribed': 0,
+            'permissions': 0,
+            'subscriber': False,
+            'username': self.username,
+            'cierra': False,
+        }
+
+    @property
+    def coords(self) -> Dict[str, int]:
+        return {'x': self.x, 'y': self.y}
+
+
+class SimBattle:
+    """ a monster battle for one party """
+
+    def __init__(
+        self,
+        members: List[str],
+        rounds: int,
+    ) -> None:
+        self.members = list(members)
+        self.rounds_left = rounds
+        self.abilities: Dict[str, int] = {}
+        self.targets: Dict[str, int] = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(m in self.targets for m in self.members)
+
+
+class LocalServer:
+    """ A local stand-in for the RetroMMO server, for offline testing
+
+        Speaks the subset of the protocol that GlobalNamespace decodes:
+        sign in and character select, movement with bonks and transports
+        simulated from CollisionMap files, party invites, monster battles
+        and chat. Usernames are the part of the sign in email before the
+        @, so use e.g. `<botname>@local` in the bot config.
+
+        Ghost players can be spawned to walk around town and generate
+        movePlayer traffic at a fixed rate, for load testing bots at
+        extreme event rates.
+    """
+
+    def __init__(
+        self,
+        maps_dir: Optional[str] = None,
+        spawn: Tuple[str, Point] = ('town', (39, 20)),
+        step_interval = 0.25,
+        unknown_is_open = True,
+        encounter_map = 'overworld',
+        encounter_rate = 0.05,
+        battle_rounds = 3,
+        round_duration = 2000,
+    ) -> None:
+        # often a bot's live maps directory, which it may be writing to
+        self.maps = CollisionManager(maps_dir, readonly=True)
+        self.spawn = spawn
+        self.step_interval = step_interval
+        self.unknown_is_open = unknown_is_open
+        self.encounter_map = encounter_map
+        self.encounter_rate = encounter_rate
+        self.battle_rounds = battle_rounds
+        self.round_duration = round_duration
+
+        self.sio = socketio.AsyncServer(async_mode='aiohttp')
+        self.app = web.Application()
+        self.sio.attach(self.app)
+        for event in [
+            'connect',
+            'disconnect',
+            'signIn',
+            'keydown',
+            'keyup',
+            'click',
+            'message',
+            'logOut',
+        ]:
+            self.sio.on(event, getattr(self, f'on_{event}'))
+
+        self.sessions: Dict[str, SimPlayer] = {}
+        self.players: Dict[str, SimPlayer] = {}
+        self.ghost_tasks: List[asyncio.Task] = []
+
+        self.message_id = 0
+        self.party_id = 0
+        self.events_sent = 0
+
+    #
+    # sending
+    #
+
+    async def send(
+        self,
+        event: str,
+        data: Any,
+        to: str,
+    ) -> None:
+        self.events_sent += 1
+        await self.sio.emit(event, data, to=to)
+
+    async def to_player(
+        self,
+        player: SimPlayer,
+        event: str,
+        data: Any = None,
+    ) -> None:
+        if player.sid is not None:
+            await self.send(event, data, player.sid)
+
+    async def to_map(
+        self,
+        map_name: str,
+        event: str,
+        data: Any,
+        skip: Optional[str] = None,
+    ) -> None:
+        for player in list(self.players.values()):
+            if player.map == map_name and player.username != skip:
+                await self.to_player(player, event, data)
+
+    async def to_all(
+        self,
+        event: str,
+        data: Any,
+        skip: Optional[str] = None,
+    ) -> None:
+        for player in list(self.players.values()):
+            if player.username != skip:
+                await self.to_player(player, event, data)
+
+    async def update(
+        self,
+        player: SimPlayer,
+        key: str,
+        value: Any,
+    ) -> None:
+        await self.to_player(player, 'update', {'key': key, 'value': value})
+
+    async def player_update(
+        self,
+        subject: SimPlayer,
+        key: str,
+        value: Any,
+        to: Optional[SimPlayer] = None,
+    ) -> None:
+        data = {'username': subject.username, 'key': key, 'value': value}
+        if to is not None:
+            await self.to_player(to, 'playerUpdate', data)
+        else:
+            await self.to_map(subject.map, 'playerUpdate', data)
+
+    #
+    # sessions
+    #
+
+    async def on_connect(self, sid, environ):
+        logging.info(f'connect {sid}')
+
+    async def on_disconnect(self, sid):
+        await self.sign_out(sid)
+
+    async def on_logOut(self, sid, data=None):
+        await self.sign_out(sid)
+
+    async def on_signIn(self, sid, data):
+        username = str(data.get('email', sid)).split('@')[0]
+        if username in self.players:
+            await self.sign_out(self.players[username].sid)
+        map_name, point = self.spawn
+        self.sessions[sid] = SimPlayer(username, sid, map_name, point)
+        await self.send('signedIn', str(uuid.uuid4()), sid)
+
+    async def sign_out(
+        self,
+        sid: Optional[str],
+    ) -> None:
+        player = self.sessions.pop(sid, None) if sid is not None else None
+        if player is None:
+            return
+        self.stop_moving(player)
+        if self.players.get(player.username) is player:
+            del self.players[player.username]
+            await self.to_map(player.map, 'playerLeftMap', player.username)
+            await self.to_all('playerSignedOut', player.username)
+        logging.info(f'{player.username} signed out')
+
+    async def enter_world(
+        self,
+        player: SimPlayer,
+    ) -> None:
+        player.stage = 'world'
+        await self.to_player(player, 'playerPreviouslySignedIn', [
+            p.data for p in self.players.values()
+        ])
+        self.players[player.username] = player
+        await self.to_all('playerSignedIn', player.data, skip=player.username)
+        await self.update(player, 'gold', 100)
+        await self.update(player, 'bankedGold', 0)
+        await self.player_update(player, 'level', 1, to=player)
+        await self.join_map(player, player.map, (player.x, player.y))
+
+    async def join_map(
+        self,
+        player: SimPlayer,
+        map_name: str,
+        point: Point,
+    ) -> None:
+        player.map = map_name
+        player.x, player.y = point
+        await self.to_player(player, 'joinMap', map_name)
+        for other in list(self.players.values()):
+            if other.map == map_name and other is not player:
+                await self.player_update(other, 'coords', other.coords, player)
+        await self.player_update(player, 'coords', player.coords)
+
+    #
+    # movement
+    #
+
+    def tile(
+        self,
+        map_name: str,
+        point: Point,
+    ) -> CollisionState:
+        state = self.maps.get(map_name).get(*point)
+        if state == CollisionState.unknown and not self.unknown_is_open:
+            return CollisionState.bonk
+        return state
+
+    def stop_moving(
+        self,
+        player: SimPlayer,
+    ) -> None:
+        player.moving = None
+        if player.move_task is not None:
+            player.move_task.cancel()
+            player.move_task = None
+
+    async def on_keydown(self, sid, key):
+        player = self.sessions.get(sid)
+        if player is None:
+            return
+        if player.stage == 'title' and key == 'enter':
+            player.stage = 'select'
+            await self.update(player, 'selectableCharacters', [
+                {'class': 'cleric', 'level': 1},
+            ])
+            await self.to_player(player, 'startCharacterSelect')
+        elif player.battle is not None and key.isdigit():
+            await self.battle_key(player, int(key))
+        elif (
+            player.stage == 'world' and
+            player.battle is None and
+            key in KEY_DIRECTIONS
+        ):
+            player.moving = KEY_DIRECTIONS[key]
+            if player.move_task is None:
+                player.move_task = asyncio.ensure_future(self.walk(player))
+
+    async def on_keyup(self, sid, key):
+        player = self.sessions.get(sid)
+        if player is not None and KEY_DIRECTIONS.get(key) == player.moving:
+            # finish the current step, but don't take another one
+            player.moving = None
+
+    async def walk(
+        self,
+        player: SimPlayer,
+    ) -> None:
+        try:
+            while player.moving is not None and player.battle is None:
+                await self.step(player, player.moving)
+                await asyncio.sleep(self.step_interval)
+        finally:
+            player.move_task = None
+
+    async def step(
+        self,
+        player: SimPlayer,
+        direction: Direction,
+    ) -> None:
+        dx, dy = DIRECTION_DELTAS[direction]
+        point = (player.x + dx, player.y + dy)
+        state = self.tile(player.map, point)
+
+        if state == CollisionState.bonk:
+            player.moving = None
+            await self.to_player(player, 'bonk')
+        elif state == CollisionState.transport:
+            transport = self.maps.get(player.map).transport(*point)
+            match = TRANSPORT_RE.match(transport or '')
+            if match is None:
+                player.moving = None
+                await self.to_player(player, 'bonk')
+                return
+            player.moving = None
+            await self.to_player(player, 'leaveMap')
+            await self.to_map(
+                player.map,
+                'playerLeftMap',
+                player.username,
+                skip=player.username,
+            )
+            await self.join_map(
+                player,
+                match.group(1),
+                (int(match.group(2)), int(match.group(3))),
+            )
+        else:
+            player.x, player.y = point
+            await self.to_map(player.map, 'movePlayer', {
+                'direction': direction.value,
+                'username': player.username,
+            })
+            if (
+                player.map == self.encounter_map and
+                random.random() < self.encounter_rate
+            ):
+                await self.start_battle(player)
+
+    #
+    # clicks: character select, player select and party invites
+    #
+
+    async def on_click(self, sid, data):
+        player = self.sessions.get(sid)
+        if player is None:
+            return
+        point = (float(data['up']['x']), float(data['up']['y']))
+
+        if player.stage == 'select':
+            if near(point, UIPositions.CHARACTER_ONE):
+                await self.enter_world(player)
+        elif player.ui == 'player select':
+            if near(point, UIPositions.PARTY_INVITE):
+                await self.invite(player)
+            player.ui = 'none'
+        elif player.ui == 'party prompt':
+            await self.answer_invite(
+                player,
+                near(point, UIPositions.ACCEPT_INVITE),
+            )
+        elif player.stage == 'world':
+            await self.select_at(player, point)
+
+    async def select_at(
+        self,
+        player: SimPlayer,
+        point: Tuple[float, float],
+    ) -> None:
+        # inverse of BasicBot.click_at_tile
+        x = player.x - round((150 - point[0]) / 16)
+        y = player.y - round((120 - point[1]) / 16)
+        for other in self.players.values():
+            if (
+                other is not player and
+                other.map == player.map and
+                (other.x, other.y) == (x, y)
+            ):
+                player.ui = 'player select'
+                player.selected = other.username
+                await self.to_player(player, 'selectPlayer', other.username)
+                return
+
+    async def invite(
+        self,
+        player: SimPlayer,
+    ) -> None:
+        target = self.players.get(player.selected or '')
+        await self.to_player(player, 'invitePlayer', player.selected)
+        if target is None or len(player.party) >= 3:
+            return
+        target.ui = 'party prompt'
+        target.invited_by = player.username
+        await self.update(target, 'partyPromptedPlayerUsername', player.username)
+
+    async def answer_invite(
+        self,
+        player: SimPlayer,
+        accepted: bool,
+    ) -> None:
+        player.ui = 'none'
+        await self.update(player, 'partyPromptedPlayerUsername', None)
+        leader = self.players.get(player.invited_by or '')
+        player.invited_by = None
+        if not accepted or leader is None or len(leader.party) >= 3:
+            return
+
+        party = leader.party + [player.username]
+        self.party_id += 1
+        for name in party:
+            member = self.players.get(name)
+            if member is not None:
+                member.party = list(party)
+                await self.to_player(member, 'party', {
+                    'party': party,
+                    'partyID': self.party_id,
+                })
+
+    #
+    # battles
+    #
+
+    def battle_members(
+        self,
+        player: SimPlayer,
+    ) -> List[SimPlayer]:
+        return [
+            self.players[name] for name in player.party
+            if name in self.players
+        ]
+
+    async def start_battle(
+        self,
+        player: SimPlayer,
+    ) -> None:
+        members = self.battle_members(player)
+        battle = SimBattle([m.username for m in members], self.battle_rounds)
+        for member in members:
+            # this may be running in member's walk task, so don't cancel
+            # it, the walk loop stops once the battle is set
+            member.moving = None
+            member.battle = battle
+            member.ui = 'battle'
+            await self.to_player(member, 'startBattle')
+            await self.to_player(member, 'battleEvents', [{
+                'type': 'start',
+                'start': int(time.time() * 1000),
+            }])
+
+    async def battle_key(
+        self,
+        player: SimPlayer,
+        key: int,
+    ) -> None:
+        battle = player.battle
+        assert battle is not None
+        name = player.username
+        if name not in battle.abilities:
+            battle.abilities[name] = key
+            for member in self.battle_members(player):
+                await self.player_update(player, 'selectedAbility', key, member)
+        elif name not in battle.targets:
+            battle.targets[name] = key
+            if battle.ready:
+                await self.play_round(player, battle)
+
+    async def play_round(
+        self,
+        player: SimPlayer,
+        battle: SimBattle,
+    ) -> None:
+        members = self.battle_members(player)
+        events: List[Dict[str, Any]] = []
+        for i, member in enumerate(members):
+            caster = {'type': 'player', 'group': 'players', 'index': i}
+            target = {'type': 'monster', 'group': 'monsters', 'index': 0}
+            events.append({
+                'type': 'ability',
+                'caster': caster,
+                'target': target,
+                'ability': str(battle.abilities[member.username]),
+                'newMP': 10,
+                'casterName': member.username,
+                'targetName': 'slime',
+            })
+            events.append({
+                'type': 'damage',
+                'amount': random.randint(1, 10),
+                'guarded': False,
+                'recipient': target,
+                'recipientName': 'slime',
+            })
+
+        battle.rounds_left -= 1
+        battle.abilities = {}
+        battle.targets = {}
+        for member in members:
+            await self.to_player(member, 'battleEvents', events)
+            await self.to_player(member, 'playOutBattleRound', self.round_duration)
+            await self.player_update(member, 'selectedAbility', None, member)
+
+        if battle.rounds_left <= 0:
+            await asyncio.sleep(self.round_duration / 1000.0)
+            await self.end_battle(members)
+
+    async def end_battle(
+        self,
+        members: List[SimPlayer],
+    ) -> None:
+        for member in members:
+            member.battle = None
+            member.ui = 'none'
+            await self.to_player(member, 'battleEvents', [
+                {'type': 'victory', 'escaped': False},
+                {'type': 'gold', 'gold': 5},
+                {'type': 'experience', 'experience': 10},
+            ])
+            await self.to_player(member, 'leaveBattle')
+
+    #
+    # chat
+    #
+
+    async def on_message(self, sid, data):
+        player = self.sessions.get(sid)
+        if player is None or player.stage != 'world':
+            return
+        self.message_id += 1
+        message = {
+            'monthsSubscribed': 0,
+            'permissions': 0,
+            'subscriber': False,
+            'username': player.username,
+            'contents': str(data.get('contents', '')),
+            'warning': False,
+            'channel': str(data.get('channel', 'say')),
+            'cierra': False,
+            'id': self.message_id,
+        }
+        if message['channel'] == 'say':
+            await self.to_map(player.map, 'message', message)
+        else:
+            await self.to_all('message', message)
+
+    #
+    # load generation
+    #
+
+    def spawn_ghosts(
+        self,
+        count: int,
+        rate: float,
+    ) -> None:
+        """ add count sessionless players, each moving rate times/second """
+        map_name, (x, y) = self.spawn
+        for i in range(count):
+            ghost = SimPlayer(f'ghost{i}', None, map_name, (x, y))
+            ghost.stage = 'world'
+            self.players[ghost.username] = ghost
+            self.ghost_tasks.append(
+                asyncio.ensure_future(self.wander(ghost, rate))
+            )
+
+    async def wander(
+        self,
+        ghost: SimPlayer,
+        rate: float,
+    ) -> None:
+        directions = list(DIRECTION_DELTAS.keys())
+        while True:
+            direction = random.choice(directions)
+            dx, dy = DIRECTION_DELTAS[direction]
+            point = (ghost.x + dx, ghost.y + dy)
+            if self.tile(ghost.map, point) != CollisionState.bonk:
+                ghost.x, ghost.y = point
+                await self.to_map(ghost.map, 'movePlayer', {
+                    'direction': direction.value,
+                    'username': ghost.username,
+                })
+            await asyncio.sleep(1.0 / rate)
+
+    async def report_forever(
+        self,
+        interval: float,
+    ) -> None:
+        last = self.events_sent
+        while True:
+            await asyncio.sleep(interval)
+            rate = (self.events_sent - last) / interval
+            last = self.events_sent
+            logging.info(' '.join([
+                f'{len(self.sessions)} sessions,',
+                f'{len(self.players)} players,',
+                f'{rate:.1f} events/s',
+            ]))
+
+    #
+    # running
+    #
+
+    async def serve(
+        self,
+        host = 'localhost',
+        port = 8080,
+        report_interval = 10.0,
+    ) -> None:
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        logging.info(f'local server on http://{host}:{port}')
+        try:
+            await self.report_forever(report_interval)
+        finally:
+            for task in self.ghost_tasks:
+                task.cancel()
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--maps', type=str, default=None)
+    parser.add_argument('--closed', action='store_true',
+                        help='treat unexplored tiles as walls')
+    parser.add_argument('--ghosts', type=int, default=0)
+    parser.add_argument('--ghost-rate', type=float, default=4.0)
+    parser.add_argument('--encounters', type=float, default=0.05)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    server = LocalServer(
+        args.maps,
+        unknown_is_open=not args.closed,
+        encounter_rate=args.encounters,
+    )
+
+    async def main() -> None:
+        server.spawn_ghosts(args.ghosts, args.ghost_rate)
+        await server.serve(args.host, args.port)
+
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+import logging
+import os
+import pathlib
+import pickle
+import queue
+import struct
+import threading
+import time
+import zlib
+
+from dbot.movement.pathfinding import Point
+
+
+# magic, version, saved at (unix time), payload length, payload crc32
+HEADER = struct.Struct('<4sHdII')
+MAGIC = b'DBCK'
+VERSION = 1
+
+# username, x, y, located, level, extra
+PlayerSnapshot = Tuple[str, int, int, bool, Optional[int], Dict[str, Any]]
+# what an Action needs to be recreated, see Action.checkpoint
+ActionSnapshot = Tuple[str, Dict[str, Any]]
+
+
+class Checkpoint:
+    """ What a bot saves to resume quickly after a restart
+
+        Only plain data, copied from the live objects on the bot's own
+        thread so that it can be pickled on another one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        players: List[PlayerSnapshot],
+        vars: Dict[str, Any],
+        current_map: Optional[str],
+        party_players: List[str],
+        party_target: List[str],
+        actions: List[ActionSnapshot],
+        route: List[Point],
+        saved_at: float = 0.0,
+    ) -> None:
+        self.name = name
+        self.players = players
+        self.vars = vars
+        self.current_map = current_map
+        self.party_players = party_players
+        self.party_target = party_target
+        self.actions = actions
+        # where the mover was headed: current target, then its queue
+        self.route = route
+        self.saved_at = saved_at or time.time()
+
+    def __repr__(self) -> str:
+        return ' '.join([
+            f'Checkpoint({self.name}',
+            f'{len(self.players)} players',
+            f'{len(self.vars)} vars',
+            f'{len(self.actions)} actions',
+            f'map={self.current_map})',
+        ])
+
+
+def encode(
+    checkpoint: Checkpoint,
+) -> bytes:
+    payload = zlib.compress(
+        pickle.dumps(checkpoint.__dict__, pickle.HIGHEST_PROTOCOL),
+        6,
+    )
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        checkpoint.saved_at,
+        len(payload),
+        zlib.crc32(payload),
+    )
+    return header + payload
+
+
+def decode(
+    data: bytes,
+) -> Checkpoint:
+    if len(data) < HEADER.size:
+        raise ValueError('checkpoint truncated')
+    magic, version, saved_at, length, crc = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not a checkpoint')
+    if version != VERSION:
+        raise ValueError(f'unsupported checkpoint version {version}')
+    payload = data[HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError('checkpoint corrupt')
+    fields = pickle.loads(zlib.decompress(payload))
+    checkpoint = Checkpoint.__new__(Checkpoint)
+    checkpoint.__dict__.update(fields)
+    checkpoint.saved_at = saved_at
+    return checkpoint
+
+
+def load(
+    filename: str,
+) -> Optional[Checkpoint]:
+    """ read a checkpoint, None if there is none or it is unusable """
+    path = pathlib.Path(filename)
+    if not path.is_file():
+        return None
+    try:
+        return decode(path.read_bytes())
+    except Exception as e:
+        logging.warning(f'ignoring checkpoint {filename}: {e}')
+        return None
+
+
+def write_atomic(
+    filename: str,
+    data: bytes,
+) -> None:
+    """ write via a temp file and rename, readers never see half a file """
+    path = pathlib.Path(filename)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class CheckpointWriter:
+    """ Encodes and writes checkpoints on a background thread
+
+        Only the latest submitted checkpoint matters: if the disk is
+        slower than checkpoints come in, older ones are skipped.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+    ) -> None:
+        self.filename = filename
+        self.pending: queue.Queue[Optional[Checkpoint]] = queue.Queue(1)
+        self.thread: Optional[threading.Thread] = None
+        self.n_written = 0
+        self.last_size = 0
+
+    def start(self) -> None:
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self.run,
+                name=f'checkpoint {self.filename}',
+                daemon=True,
+            )
+            self.thread.start()
+
+    def submit(
+        self,
+        checkpoint: Checkpoint,
+    ) -> None:
+        self.start()
+        try:
+            # replace anything not written yet
+            self.pending.get_nowait()
+        except queue.Empty:
+            pass
+        self.pending.put_nowait(checkpoint)
+
+    def stop(
+        self,
+        timeout = 5.0,
+    ) -> None:
+        """ write whatever is pending, then stop the thread """
+        if self.thread is None:
+            return
+        self.pending.put(None)
+        self.thread.join(timeout)
+        self.thread = None
+
+    def run(self) -> None:
+        while True:
+            checkpoint = self.pending.get()
+            if checkpoint is None:
+                return
+            try:
+                data = encode(checkpoint)
+                write_atomic(self.filename, data)
+                self.n_written += 1
+                self.last_size = len(data)
+            except Exception as e:
+                logging.warning(f'checkpoint failed: {e}')
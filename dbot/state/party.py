@@ -7,6 +7,11 @@ from typing import (
 import time    
 import logging
 
+from dbot.state.reactive import (
+    computed,
+    tracked,
+)
+
 
 # avoid cyclic import, but keep type checking
 from typing import TYPE_CHECKING
@@ -16,12 +21,18 @@ if TYPE_CHECKING:
 
 class Party:
 
+    # assign new lists rather than changing these in place, so that
+    # computed properties see the change
+    players: tracked[List[str]] = tracked()
+    target: tracked[List[str]] = tracked()
+
     def __init__(
         self,
         bot: BotCore,
         players: List[str],
     ) -> None:
         assert len(players) <= 3
+        self.tracker = bot.tracker
         self.players = list(players)
         self.target = list(players)
         self.bot = bot
@@ -50,7 +61,7 @@ class Party:
     def target_position(self) -> int:
         return self.target.index(self.bot.name)
 
-    @property
+    @computed
     def is_complete(self) -> bool:
         return set(self.players) == set(self.target)
 
@@ -71,12 +82,18 @@ class Party:
             if to_remove in friends:
                 friends.remove(to_remove)
 
-        parties = [ friends[i:i+3] for i in range(0, len(friends), 3)]
-        for party in parties:
+        for party in self.partition(friends):
             if self.bot.name in party:
                 return party
         return [self.bot.name]
 
+    @staticmethod
+    def partition(
+        bots: List[str],
+    ) -> List[List[str]]:
+        """ split a sorted list of bots into parties of up to 3 """
+        return [ bots[i:i+3] for i in range(0, len(bots), 3)]
+
     def set_target(
         self,
         target: List[str],
@@ -96,6 +113,6 @@ class Party:
         player: str,
     ) -> None:
         if player in self.players:
-            self.players.remove(player)
+            self.players = [p for p in self.players if p != player]
         if player in self.target:
-            self.target.remove(player)
+            self.target = [p for p in self.target if p != player]
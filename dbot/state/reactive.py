@@ -0,0 +1,469 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    ItemsView,
+    Iterator,
+    KeysView,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+    ValuesView,
+    overload,
+)
+
+import functools
+
+
+T = TypeVar('T')
+Listener = Callable[[Any], None]
+
+
+class Tracker:
+    """ Dependency tracking between state keys and Predicates
+
+        State objects report reads of a key with `read` and changes with
+        `changed`. While a Predicate is being evaluated, every key it
+        reads is recorded; a later change to any of them invalidates it.
+        Each bot has one Tracker shared by its GameState, Party and
+        UIState, so keys are just names like 'vars.gold'.
+    """
+
+    def __init__(self) -> None:
+        # keys read by each predicate currently being evaluated
+        self.stack: List[Set[str]] = []
+        self.dependents: Dict[str, Set[Predicate]] = {}
+
+    def read(
+        self,
+        key: str,
+    ) -> None:
+        if self.stack:
+            self.stack[-1].add(key)
+
+    def changed(
+        self,
+        key: str,
+    ) -> None:
+        dependents = self.dependents.get(key)
+        if dependents:
+            for predicate in list(dependents):
+                predicate.invalidate()
+
+    def predicate(
+        self,
+        function: Callable[[], T],
+        name = '',
+    ) -> Predicate[T]:
+        return Predicate(self, function, name)
+
+
+class SharedTracker:
+    """ Stands in for a Tracker on state shared between several bots
+
+        Reads go to whichever bot's tracker is evaluating a predicate,
+        changes are reported to all of them. Only single threaded use
+        is supported, as in FleetHost.
+    """
+
+    def __init__(self) -> None:
+        self.trackers: List[Tracker] = []
+
+    def add(
+        self,
+        tracker: Tracker,
+    ) -> None:
+        self.trackers.append(tracker)
+
+    def remove(
+        self,
+        tracker: Tracker,
+    ) -> None:
+        if tracker in self.trackers:
+            self.trackers.remove(tracker)
+
+    @property
+    def stack(self) -> List[Set[str]]:
+        for tracker in self.trackers:
+            if tracker.stack:
+                return tracker.stack
+        return []
+
+    @property
+    def dependents(self) -> bool:
+        return any(tracker.dependents for tracker in self.trackers)
+
+    def read(
+        self,
+        key: str,
+    ) -> None:
+        for tracker in self.trackers:
+            tracker.read(key)
+
+    def changed(
+        self,
+        key: str,
+    ) -> None:
+        for tracker in self.trackers:
+            tracker.changed(key)
+
+
+class Predicate(Generic[T]):
+    """ A cached function of tracked state
+
+        Calling it returns the cached value, re-evaluating only after one
+        of the keys it read has changed. Subscribers are told about new
+        values as soon as they change, which means re-evaluating eagerly
+        while anyone is subscribed.
+    """
+
+    def __init__(
+        self,
+        tracker: Tracker,
+        function: Callable[[], T],
+        name = '',
+    ) -> None:
+        self.tracker = tracker
+        self.function = function
+        self.name = name or getattr(function, '__name__', 'predicate')
+        self.deps: Set[str] = set()
+        self.valid = False
+        self.value: Optional[T] = None
+        self.listeners: List[Listener] = []
+        self.n_evaluations = 0
+
+    def __repr__(self) -> str:
+        return f'Predicate({self.name}, deps={sorted(self.deps)})'
+
+    def __call__(self) -> T:
+        if not self.valid:
+            self.evaluate()
+        elif self.tracker.stack:
+            # an outer predicate depends on everything we depend on
+            self.tracker.stack[-1].update(self.deps)
+        return self.value # type: ignore
+
+    def evaluate(self) -> None:
+        self.tracker.stack.append(set())
+        try:
+            value = self.function()
+        finally:
+            deps = self.tracker.stack.pop()
+        self.n_evaluations += 1
+        self.value = value
+        self.deps = deps
+        self.valid = True
+        for key in deps:
+            self.tracker.dependents.setdefault(key, set()).add(self)
+        if self.tracker.stack:
+            self.tracker.stack[-1].update(deps)
+
+    def invalidate(self) -> None:
+        if not self.valid:
+            return
+        self.valid = False
+        for key in self.deps:
+            dependents = self.tracker.dependents.get(key)
+            if dependents is not None:
+                dependents.discard(self)
+                if len(dependents) == 0:
+                    del self.tracker.dependents[key]
+        if self.listeners:
+            old = self.value
+            new = self()
+            if new != old:
+                for listener in list(self.listeners):
+                    listener(new)
+
+    def subscribe(
+        self,
+        listener: Listener,
+    ) -> Callable[[], None]:
+        """ call listener(value) on changes, returns an unsubscribe """
+        self()
+        self.listeners.append(listener)
+
+        def unsubscribe() -> None:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+        return unsubscribe
+
+
+class tracked(Generic[T]):
+    """ Attribute that reports reads and assignments to obj.tracker
+
+        The owner must set self.tracker before assigning any tracked
+        attribute. Mutating a tracked value in place isn't seen, assign a
+        new one (or call tracker.changed) instead.
+    """
+
+    def __set_name__(
+        self,
+        owner: type,
+        name: str,
+    ) -> None:
+        self.attr = f'_tracked_{name}'
+        self.key = f'{owner.__name__}.{name}'
+
+    def __get__(
+        self,
+        obj: Any,
+        objtype: Optional[type] = None,
+    ) -> T:
+        if obj is None:
+            return self # type: ignore
+        stack = obj.tracker.stack
+        if stack:
+            stack[-1].add(self.key)
+        return getattr(obj, self.attr)
+
+    def __set__(
+        self,
+        obj: Any,
+        value: T,
+    ) -> None:
+        old = getattr(obj, self.attr, None)
+        setattr(obj, self.attr, value)
+        if obj.tracker.dependents and old is not value and old != value:
+            obj.tracker.changed(self.key)
+
+
+class computed(Generic[T]):
+    """ Read-only property backed by a per-instance Predicate
+
+        `type(obj).name.predicate(obj)` gets the Predicate itself, to
+        subscribe to it.
+    """
+
+    def __init__(
+        self,
+        function: Callable[[Any], T],
+    ) -> None:
+        self.function = function
+        functools.update_wrapper(self, function) # type: ignore
+
+    def __set_name__(
+        self,
+        owner: type,
+        name: str,
+    ) -> None:
+        self.attr = f'_computed_{name}'
+        self.name = name
+
+    def predicate(
+        self,
+        obj: Any,
+    ) -> Predicate[T]:
+        predicate = obj.__dict__.get(self.attr)
+        if predicate is None:
+            predicate = Predicate(
+                obj.tracker,
+                functools.partial(self.function, obj),
+                f'{type(obj).__name__}.{self.name}',
+            )
+            obj.__dict__[self.attr] = predicate
+        return predicate
+
+    @overload
+    def __get__(
+        self,
+        obj: None,
+        objtype: Optional[type] = None,
+    ) -> computed[T]: ...
+
+    @overload
+    def __get__(
+        self,
+        obj: Any,
+        objtype: Optional[type] = None,
+    ) -> T: ...
+
+    def __get__(
+        self,
+        obj: Any,
+        objtype: Optional[type] = None,
+    ) -> Union[computed[T], T]:
+        if obj is None:
+            return self
+        return self.predicate(obj)()
+
+    def __set__(
+        self,
+        obj: Any,
+        value: T,
+    ) -> None:
+        raise AttributeError(f'{self.name} is computed')
+
+
+class TrackedDict(Dict[str, Any]):
+    """ dict reporting per-key reads and writes to a Tracker
+
+        `key in d` reads '<prefix>s.<key>' (membership), d[key] and
+        d.get(key) read '<prefix>.<key>' (the value). Writes change both.
+        Iterating, len() and keys() read '<prefix>s' (the set of keys),
+        values() and items() also read '<prefix>.*' (every value), which
+        any add or remove, and any write, change respectively.
+        Use `touch` after mutating a value in place.
+    """
+
+    def __init__(
+        self,
+        tracker: Union[Tracker, SharedTracker],
+        prefix: str,
+    ) -> None:
+        super().__init__()
+        self.tracker = tracker
+        self.prefix = prefix
+
+    #
+    # reads
+    #
+
+    def __contains__(
+        self,
+        key: object,
+    ) -> bool:
+        if self.tracker.stack:
+            self.tracker.read(f'{self.prefix}s.{key}')
+        return super().__contains__(key)
+
+    def __getitem__(
+        self,
+        key: str,
+    ) -> Any:
+        if self.tracker.stack:
+            self.tracker.read(f'{self.prefix}.{key}')
+        return super().__getitem__(key)
+
+    def get(
+        self,
+        key: str,
+        default: Any = None,
+    ) -> Any:
+        if self.tracker.stack:
+            self.tracker.read(f'{self.prefix}.{key}')
+        return super().get(key, default)
+
+    def read_all(
+        self,
+        values: bool,
+    ) -> None:
+        """ report a read of every key, and of every value with values """
+        if self.tracker.stack:
+            self.tracker.read(f'{self.prefix}s')
+            if values:
+                self.tracker.read(f'{self.prefix}.*')
+
+    def __iter__(self) -> Iterator[str]:
+        self.read_all(False)
+        return super().__iter__()
+
+    def __len__(self) -> int:
+        self.read_all(False)
+        return super().__len__()
+
+    def keys(self) -> KeysView[str]: # type: ignore[override]
+        self.read_all(False)
+        return super().keys()
+
+    def values(self) -> ValuesView[Any]: # type: ignore[override]
+        self.read_all(True)
+        return super().values()
+
+    def items(self) -> ItemsView[str, Any]: # type: ignore[override]
+        self.read_all(True)
+        return super().items()
+
+    #
+    # writes
+    #
+
+    def changed(
+        self,
+        key: str,
+        membership: bool,
+    ) -> None:
+        """ report a new value of key, and that it was added or removed """
+        tracker = self.tracker
+        if membership:
+            tracker.changed(f'{self.prefix}s.{key}')
+            tracker.changed(f'{self.prefix}s')
+        tracker.changed(f'{self.prefix}.{key}')
+        tracker.changed(f'{self.prefix}.*')
+
+    def __setitem__(
+        self,
+        key: str,
+        value: Any,
+    ) -> None:
+        if not self.tracker.dependents:
+            # nothing is watching, the common case on hot paths
+            super().__setitem__(key, value)
+            return
+        is_new = not super().__contains__(key)
+        super().__setitem__(key, value)
+        self.changed(key, is_new)
+
+    def __delitem__(
+        self,
+        key: str,
+    ) -> None:
+        super().__delitem__(key)
+        self.changed(key, True)
+
+    def pop(
+        self,
+        key: str,
+        *default: Any,
+    ) -> Any:
+        if super().__contains__(key):
+            value = super().pop(key)
+            self.changed(key, True)
+            return value
+        return super().pop(key, *default)
+
+    def popitem(self) -> Tuple[str, Any]:
+        key, value = super().popitem()
+        self.changed(key, True)
+        return key, value
+
+    def setdefault(
+        self,
+        key: str,
+        default: Any = None,
+    ) -> Any:
+        if not super().__contains__(key):
+            self[key] = default
+        return self[key]
+
+    def update( # type: ignore[override]
+        self,
+        *args: Any,
+        **kwargs: Any,
+    ) -> None:
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def __ior__( # type: ignore[override, misc]
+        self,
+        other: Any,
+    ) -> TrackedDict:
+        self.update(other)
+        return self
+
+    def clear(self) -> None:
+        for key in list(super().keys()):
+            del self[key]
+
+    def touch(
+        self,
+        key: str,
+    ) -> None:
+        """ report a change made inside d[key] """
+        if self.tracker.dependents:
+            self.changed(key, False)
@@ -0,0 +1,168 @@
+from __future__ import annotations
+from typing import (
+    Dict,
+    FrozenSet,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+
+# (map, x, y) of each indexed player
+Location = Tuple[str, int, int]
+Cell = Tuple[int, int]
+
+
+class SpatialIndex:
+    """ Per-map spatial hash of player positions
+
+        Players are bucketed by map and by cell_size x cell_size cell, so
+        "who is within r tiles of (x, y)" only looks at the few cells
+        around it. Distance is in tiles, diagonals count as one step
+        (max(|dx|, |dy|)), matching how adjacency works in game.
+
+        GameState keeps this up to date from playerUpdate/movePlayer,
+        and drops players as they (or we) leave a map.
+    """
+
+    def __init__(
+        self,
+        cell_size = 8,
+    ) -> None:
+        self.cell_size = cell_size
+        self.cells: Dict[str, Dict[Cell, Set[str]]] = {}
+        self.members: Dict[str, Set[str]] = {}
+        self.locations: Dict[str, Location] = {}
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def __contains__(
+        self,
+        name: object,
+    ) -> bool:
+        return name in self.locations
+
+    def cell(
+        self,
+        x: int,
+        y: int,
+    ) -> Cell:
+        return (x // self.cell_size, y // self.cell_size)
+
+    #
+    # updates
+    #
+
+    def place(
+        self,
+        name: str,
+        map_name: str,
+        x: int,
+        y: int,
+    ) -> None:
+        """ add a player, or move one already indexed """
+        old = self.locations.get(name)
+        size = self.cell_size
+        cell = (x // size, y // size)
+        if old is not None:
+            old_map, old_x, old_y = old
+            old_cell = (old_x // size, old_y // size)
+            if old_map == map_name and old_cell == cell:
+                # same bucket, the common case for a single step
+                self.locations[name] = (map_name, x, y)
+                return
+            self.unlink(name, old_map, old_cell)
+
+        self.locations[name] = (map_name, x, y)
+        self.members.setdefault(map_name, set()).add(name)
+        cells = self.cells.setdefault(map_name, {})
+        cells.setdefault(cell, set()).add(name)
+
+    def remove(
+        self,
+        name: str,
+    ) -> None:
+        old = self.locations.pop(name, None)
+        if old is not None:
+            map_name, x, y = old
+            self.unlink(name, map_name, self.cell(x, y))
+
+    def clear_map(
+        self,
+        map_name: str,
+    ) -> None:
+        """ forget everyone on a map """
+        for name in self.members.pop(map_name, set()):
+            del self.locations[name]
+        self.cells.pop(map_name, None)
+
+    def unlink(
+        self,
+        name: str,
+        map_name: str,
+        cell: Cell,
+    ) -> None:
+        members = self.members[map_name]
+        members.discard(name)
+        if len(members) == 0:
+            del self.members[map_name]
+        cells = self.cells[map_name]
+        bucket = cells[cell]
+        bucket.discard(name)
+        if len(bucket) == 0:
+            del cells[cell]
+            if len(cells) == 0:
+                del self.cells[map_name]
+
+    #
+    # queries
+    #
+
+    def location(
+        self,
+        name: str,
+    ) -> Optional[Location]:
+        return self.locations.get(name)
+
+    def map_of(
+        self,
+        name: str,
+    ) -> Optional[str]:
+        location = self.locations.get(name)
+        return location[0] if location is not None else None
+
+    def players_on(
+        self,
+        map_name: str,
+    ) -> FrozenSet[str]:
+        return frozenset(self.members.get(map_name, ()))
+
+    def near(
+        self,
+        map_name: str,
+        x: int,
+        y: int,
+        radius: int,
+    ) -> List[str]:
+        """ players within radius tiles of (x, y), nearest first """
+        cells = self.cells.get(map_name)
+        if cells is None:
+            return []
+
+        min_cx, min_cy = self.cell(x - radius, y - radius)
+        max_cx, max_cy = self.cell(x + radius, y + radius)
+        found: List[Tuple[int, str]] = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    continue
+                for name in bucket:
+                    _, px, py = self.locations[name]
+                    distance = max(abs(px - x), abs(py - y))
+                    if distance <= radius:
+                        found.append((distance, name))
+        found.sort()
+        return [name for _, name in found]
@@ -1,27 +1,131 @@
 from typing import (
     Any,
+    Callable,
     Dict,
+    FrozenSet,
+    Hashable,
+    Iterable,
+    List,
     Optional,
     Set,
 )
 
 import logging
+import sys
+import time
 
 from dbot.common.common import (
+    Direction,
     Player,
     PlayerData,
+    PlayerRecord,
 )
+from dbot.state.checkpoint import PlayerSnapshot
+from dbot.state.reactive import (
+    Tracker,
+    TrackedDict,
+    tracked,
+)
+from dbot.state.spatial import SpatialIndex
+from dbot.state.world import WorldModel
+
+
+def approx_size(
+    value: Any,
+    depth = 3,
+) -> int:
+    """ rough bytes used by value, following containers depth levels """
+    size = sys.getsizeof(value)
+    if depth <= 0:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += approx_size(k, 0) + approx_size(v, depth - 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += approx_size(v, depth - 1)
+    elif isinstance(value, PlayerRecord):
+        size += approx_size(value.username, 0)
+        size += approx_size(value.extra, depth - 1)
+    return size
+
+
+class MemoryReport:
+    """ entry counts and approximate sizes of a GameState """
+
+    def __init__(
+        self,
+        players: int,
+        player_bytes: int,
+        located: int,
+        vars: int,
+        var_bytes: int,
+        evicted_players: int,
+        evicted_vars: int,
+    ) -> None:
+        self.players = players
+        self.player_bytes = player_bytes
+        self.located = located
+        self.vars = vars
+        self.var_bytes = var_bytes
+        self.evicted_players = evicted_players
+        self.evicted_vars = evicted_vars
+
+    @property
+    def total_bytes(self) -> int:
+        return self.player_bytes + self.var_bytes
+
+    def __str__(self) -> str:
+        return ' '.join([
+            f'players {self.players} ({self.located} located)',
+            f'{self.player_bytes / 1024:.1f}KiB,',
+            f'vars {self.vars} {self.var_bytes / 1024:.1f}KiB,',
+            f'evicted {self.evicted_players} players',
+            f'{self.evicted_vars} vars',
+        ])
 
 
 class GameState:
 
-    def __init__(self) -> None:
-        self.players: Dict[str, Player] = {}
+    # reads and changes are reported to the tracker, see reactive.py
+    last_map: tracked[Optional[str]] = tracked()
+    current_map: tracked[Optional[str]] = tracked()
+
+    def __init__(
+        self,
+        tracker: Optional[Tracker] = None,
+        *,
+        max_players = 2000,
+        player_ttl = 3600.0,
+        max_vars = 1000,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.tracker = tracker or Tracker()
+        self.clock = clock
+        self.players = TrackedDict(self.tracker, 'player')
         self.players_in_map: Set[str] = set()
-        self.vars : Dict[str, Any] = {}
+        # where located players are, on the maps we have been on
+        self.spatial = SpatialIndex()
+        self.vars = TrackedDict(self.tracker, 'var')
 
-        self.last_map : Optional[str] = None
-        self.current_map : Optional[str] = None
+        # limits, 0 for none. Players are evicted by evict(), vars as
+        # soon as there are too many, least recently updated first.
+        self.max_players = max_players
+        self.player_ttl = player_ttl
+        self.max_vars = max_vars
+        # var names, least recently updated first
+        self.var_order: Dict[str, None] = {}
+        self.evicted_players = 0
+        self.evicted_vars = 0
+
+        # players and spatial are shared with other bots when attached
+        self.world: Optional[WorldModel] = None
+        self.world_name = ''
+        # players loaded from a checkpoint, not yet confirmed online
+        self.restored: Set[str] = set()
+
+        self.last_map = None
+        self.current_map = None
 
     def left_map(
         self,
@@ -29,10 +133,21 @@ class GameState:
     ) -> None:
         if username is None:
             # self left map
+            old_map = self.current_map
+            if old_map is not None and self.world is not None:
+                self.world.left(self, old_map)
+            if old_map is not None and (
+                self.world is None or
+                old_map not in self.world.maps_in_use(self)
+            ):
+                # positions there won't be kept up to date anymore
+                self.spatial.clear_map(old_map)
             self.last_map = self.current_map
             self.current_map = None
-        elif username in self.players_in_map:
-            self.players_in_map.remove(username)
+        else:
+            self.spatial.remove(username)
+            if username in self.players_in_map:
+                self.players_in_map.remove(username)
 
     def join_map(
         self,
@@ -40,6 +155,8 @@ class GameState:
     ) -> None:
         assert self.current_map is None
         self.current_map = map_name
+        if self.world is not None:
+            self.world.joined(self, map_name)
 
     def map(self) -> str:
         return self.current_map or self.last_map or '<unknown>'
@@ -55,8 +172,286 @@ class GameState:
         player: PlayerData,
     ) -> None:
         username = player.username
+        if username in self.restored:
+            # known from a checkpoint, the server will send the rest
+            self.restored.discard(username)
+            return
         if username in self.players:
+            if self.world is not None:
+                # another bot got the same playerSignedIn
+                return
             logging.warning(f'{username} already logged in?')
-        self.players[username] = {
-            'username': username,
-        }
+        record = PlayerRecord(username)
+        record.seen = self.clock()
+        self.players[username] = record
+
+    def ensure_player(
+        self,
+        name: str,
+    ) -> Player:
+        """ the player's record, made anew if evict() dropped it
+
+            Eviction only forgets players we haven't heard from, so an
+            update for an unknown name is someone still signed in.
+        """
+        player = self.players.get(name)
+        if player is None:
+            logging.info(f're-adding evicted player {name}')
+            player = PlayerRecord(name)
+            player.seen = self.clock()
+            self.players[name] = player
+        return player
+
+    def remove_player(
+        self,
+        name: str,
+    ) -> bool:
+        """ forget a player entirely, False if we didn't know them """
+        self.spatial.remove(name)
+        self.players_in_map.discard(name)
+        return self.players.pop(name, None) is not None
+
+    def update_player(
+        self,
+        player: PlayerRecord,
+        key: str,
+        value: Any,
+    ) -> None:
+        """ apply a playerUpdate """
+        if key == 'coords' and self.world is not None:
+            if not self.world.applies(self, player.username):
+                return
+        player.update(key, value)
+        self.touch_player(player)
+        if key == 'coords':
+            self.place_player(player)
+
+    def move_player(
+        self,
+        player: PlayerRecord,
+        direction: Direction,
+    ) -> None:
+        """ apply a movePlayer, unless another bot already did
+
+            Players without coords yet stay unlocated, stepping from
+            the placeholder (0, 0) would put them somewhere wrong.
+        """
+        if self.world is not None:
+            if not self.world.applies(self, player.username):
+                return
+        if player.located:
+            player.step(direction)
+            self.place_player(player)
+        self.touch_player(player)
+
+    def touch_player(
+        self,
+        player: PlayerRecord,
+    ) -> None:
+        """ call after changing a player's record in place """
+        player.seen = self.clock()
+        self.players.touch(player.username)
+
+    def place_player(
+        self,
+        player: PlayerRecord,
+    ) -> None:
+        """ call after a position update for player
+
+            Position events don't name a map, the server only sends
+            them for the map the receiving bot is on.
+        """
+        map_name = self.current_map
+        if map_name is not None:
+            self.spatial.place(player.username, map_name, player.x, player.y)
+
+    #
+    # sharing
+    #
+
+    def attach_world(
+        self,
+        world: WorldModel,
+        name: str,
+    ) -> None:
+        """ share players with the other bots attached to world
+
+            name is our bot's name, we keep tracking its position.
+        """
+        assert self.world is None
+        for username, player in self.players.items():
+            if username not in world.players:
+                world.players[username] = player
+        self.players = world.players
+        self.spatial = world.spatial
+        self.world = world
+        self.world_name = name
+        world.attach(name, self)
+
+    def receives(
+        self,
+        key: Hashable,
+    ) -> bool:
+        """ whether to apply a broadcast, False if another bot did """
+        if self.world is None:
+            return True
+        first, _ = self.world.receive(self.world_name, key)
+        return first
+
+    def detach_world(self) -> None:
+        """ stop sharing, keeping a private copy of the players """
+        world = self.world
+        if world is None:
+            return
+        world.detach(self.world_name, self)
+        self.world = None
+        self.players = TrackedDict(self.tracker, 'player')
+        self.players.update(world.players)
+        self.spatial = SpatialIndex()
+
+    def players_near(
+        self,
+        x: int,
+        y: int,
+        radius: int,
+        map_name: Optional[str] = None,
+    ) -> List[str]:
+        """ players within radius tiles, on our current map by default """
+        map_name = map_name or self.current_map
+        if map_name is None:
+            return []
+        return self.spatial.near(map_name, x, y, radius)
+
+    def players_on_map(
+        self,
+        map_name: Optional[str] = None,
+    ) -> FrozenSet[str]:
+        """ located players on our current map by default """
+        map_name = map_name or self.current_map
+        if map_name is None:
+            return frozenset()
+        return self.spatial.players_on(map_name)
+
+    #
+    # checkpoints
+    #
+
+    def snapshot_players(self) -> List[PlayerSnapshot]:
+        return [
+            (p.username, p.x, p.y, p.located, p.level, dict(p.extra))
+            for p in self.players.values()
+        ]
+
+    def restore(
+        self,
+        players: List[PlayerSnapshot],
+        vars: Dict[str, Any],
+        current_map: Optional[str],
+    ) -> None:
+        """ load state from a checkpoint, before signing in
+
+            Restored players count as signed in until a
+            playerPreviouslySignedIn says otherwise (see reconcile).
+            The map we were on is only remembered as last_map, joinMap
+            will tell us where we really are.
+        """
+        now = self.clock()
+        for username, x, y, located, level, extra in players:
+            if username in self.players:
+                continue
+            record = PlayerRecord(username)
+            record.x = x
+            record.y = y
+            record.located = located
+            record.level = level
+            record.extra = extra
+            record.seen = now
+            self.players[username] = record
+            self.restored.add(username)
+        for key, value in vars.items():
+            self.set_var(key, value)
+        self.last_map = current_map
+
+    def reconcile(
+        self,
+        online: Iterable[str],
+    ) -> int:
+        """ drop restored players that are no longer signed in """
+        online = set(online)
+        gone = [name for name in self.restored if name not in online]
+        for name in gone:
+            self.remove_player(name)
+        self.restored.clear()
+        return len(gone)
+
+    #
+    # limits
+    #
+
+    def set_var(
+        self,
+        key: str,
+        value: Any,
+    ) -> None:
+        self.vars[key] = value
+        if self.max_vars > 0:
+            order = self.var_order
+            order.pop(key, None)
+            order[key] = None
+            while len(order) > self.max_vars:
+                oldest = next(iter(order))
+                del order[oldest]
+                self.vars.pop(oldest, None)
+                self.evicted_vars += 1
+
+    def evict(
+        self,
+        keep: Iterable[str] = (),
+    ) -> int:
+        """ drop players not seen recently, returns how many
+
+            Players on our current map, and those in keep, are never
+            dropped. The rest go once they haven't been updated for
+            player_ttl seconds, then least recently seen first while
+            there are more than max_players.
+        """
+        protected = set(keep)
+        maps = set()
+        if self.current_map is not None:
+            maps.add(self.current_map)
+        if self.world is not None:
+            maps.update(self.world.maps_in_use(self))
+        for map_name in maps:
+            protected.update(self.spatial.players_on(map_name))
+        candidates = [
+            p for name, p in self.players.items()
+            if name not in protected
+        ]
+
+        evicted: List[str] = []
+        if self.player_ttl > 0:
+            cutoff = self.clock() - self.player_ttl
+            evicted.extend(p.username for p in candidates if p.seen < cutoff)
+        if self.max_players > 0:
+            excess = len(self.players) - len(evicted) - self.max_players
+            if excess > 0:
+                dropped = set(evicted)
+                remaining = [p for p in candidates if p.username not in dropped]
+                remaining.sort(key=lambda p: p.seen)
+                evicted.extend(p.username for p in remaining[:excess])
+
+        for name in evicted:
+            self.remove_player(name)
+        self.evicted_players += len(evicted)
+        return len(evicted)
+
+    def memory_report(self) -> MemoryReport:
+        return MemoryReport(
+            len(self.players),
+            approx_size(self.players),
+            len(self.spatial),
+            len(self.vars),
+            approx_size(self.vars) + approx_size(self.var_order, 1),
+            self.evicted_players,
+            self.evicted_vars,
+        )
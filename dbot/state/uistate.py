@@ -1,6 +1,7 @@
 from typing import (
     Callable,
     List,
+    Optional,
 )
 
 import enum
@@ -8,6 +9,10 @@ import logging
 
 import dbot.network.events as events
 from dbot.network.retrosocket import RetroSocket
+from dbot.state.reactive import (
+    Tracker,
+    tracked,
+)
 
 
 
@@ -45,7 +50,33 @@ class UIScreen(enum.Enum):
 
 class UIState:
 
-    def __init__(self) -> None:
+    # GameEvents the check_* methods look at, so the socket can drop
+    # everything else (see network/subscriptions.py)
+    catch_all_events = frozenset({
+        'challengePlayer',
+        'closeBank',
+        'invitePlayer',
+        'leaveBattle',
+        'leaveTrade',
+        'openBank',
+        'requestPlayer',
+        'selectPlayer',
+        'startBattle',
+        'startTrade',
+        'update',
+    })
+
+    # reads and changes are reported to the tracker, see reactive.py.
+    # screen is tracked by hand below, it is read a lot by the checks.
+    source: tracked[str] = tracked()
+    target: tracked[str] = tracked()
+    page: tracked[int] = tracked()
+
+    def __init__(
+        self,
+        tracker: Optional[Tracker] = None,
+    ) -> None:
+        self.tracker = tracker or Tracker()
         self._screen = UIScreen.none
         self.source = ''
         self.target = ''
@@ -65,12 +96,17 @@ class UIState:
 
     @property
     def screen(self) -> UIScreen:
+        if self.tracker.stack:
+            self.tracker.read('UIState.screen')
         return self._screen
 
     @screen.setter
     def screen(self, s: UIScreen) -> None:
         logging.info(f'new UI screen: {s.value}')
+        changed = s != self._screen
         self._screen = s
+        if changed:
+            self.tracker.changed('UIState.screen')
 
     def in_bank(self) -> bool:
         return self.screen in {
@@ -0,0 +1,190 @@
+from __future__ import annotations
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+# avoid cyclic import, but keep type checking
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from dbot.state.state import GameState
+
+from dbot.state.reactive import (
+    SharedTracker,
+    TrackedDict,
+)
+from dbot.state.spatial import SpatialIndex
+
+
+# broadcasts not yet received by every attached bot, oldest dropped first
+MAX_BROADCASTS = 256
+
+
+class Broadcast:
+    """ One event every attached bot receives, see WorldModel.receive """
+
+    __slots__ = ('receivers', 'value')
+
+    def __init__(self) -> None:
+        self.receivers: Set[str] = set()
+        # whatever the first receiver worked out for the others
+        self.value: Any = None
+
+
+class WorldModel:
+    """ Player state shared by the bots running in one process
+
+        Every bot receives the same playerSignedIn/playerSignedOut and,
+        when they share a map, the same movePlayer and coords broadcasts.
+        Attached GameStates share one players dict and spatial index
+        instead of each keeping a copy, and apply each broadcast once:
+
+        - sign in and out are idempotent, a known player keeps its record
+        - positions of players on a map are only updated by one of the
+          bots on it, the map's reporter. Moves are relative, so applying
+          them from every bot would count them several times.
+        - except that each bot always tracks its own position, so that
+          its movement never waits on another bot's socket
+        - other playerUpdates are absolute and applied by anyone
+        - playerSignedIn and playerSignedOut are applied by the first
+          bot to receive them, and chat messages parsed once (keyed by
+          message id), see receive
+
+        The reporter is the first attached bot to join a map, and is
+        handed over when it leaves. Positions can be a few steps off
+        after a handover, until the next coords update.
+
+        vars, UI, party and battle state stay private to each bot.
+    """
+
+    def __init__(self) -> None:
+        self.tracker = SharedTracker()
+        self.players = TrackedDict(self.tracker, 'player')
+        self.spatial = SpatialIndex()
+        # attached states by bot name
+        self.owners: Dict[str, GameState] = {}
+        self.reporters: Dict[str, GameState] = {}
+        self.broadcasts: Dict[Hashable, Broadcast] = {}
+
+        self.n_updates = 0
+        self.n_skipped = 0
+
+    @property
+    def states(self) -> List[GameState]:
+        return list(self.owners.values())
+
+    def attach(
+        self,
+        name: str,
+        state: GameState,
+    ) -> None:
+        self.owners[name] = state
+        self.tracker.add(state.tracker)
+        if state.current_map is not None:
+            self.joined(state, state.current_map)
+
+    def detach(
+        self,
+        name: str,
+        state: GameState,
+    ) -> None:
+        if self.owners.get(name) is state:
+            del self.owners[name]
+            self.tracker.remove(state.tracker)
+            if state.current_map is not None:
+                self.left(state, state.current_map)
+
+    #
+    # maps
+    #
+
+    def joined(
+        self,
+        state: GameState,
+        map_name: str,
+    ) -> None:
+        self.reporters.setdefault(map_name, state)
+
+    def left(
+        self,
+        state: GameState,
+        map_name: str,
+    ) -> None:
+        if self.reporters.get(map_name) is not state:
+            return
+        del self.reporters[map_name]
+        for other in self.owners.values():
+            if other is not state and other.current_map == map_name:
+                self.reporters[map_name] = other
+                break
+
+    def maps_in_use(
+        self,
+        skip: Optional[GameState] = None,
+    ) -> Set[str]:
+        """ maps that attached bots (other than skip) are on """
+        return {
+            s.current_map for s in self.owners.values()
+            if s is not skip and s.current_map is not None
+        }
+
+    #
+    # deduplication
+    #
+
+    def applies(
+        self,
+        state: GameState,
+        username: str,
+    ) -> bool:
+        """ whether state should apply a position update for username """
+        self.n_updates += 1
+        owner = self.owners.get(username)
+        if owner is not None:
+            applies = owner is state
+        else:
+            map_name = state.current_map
+            applies = (
+                map_name is not None and
+                self.reporters.get(map_name) is state
+            )
+        if not applies:
+            self.n_skipped += 1
+        return applies
+
+    def receive(
+        self,
+        name: str,
+        key: Hashable,
+    ) -> Tuple[bool, Broadcast]:
+        """ bot `name` received the broadcast `key`, True if first
+
+            Events without an id are keyed on their contents, so the
+            same key comes around again. A bot receiving a key it has
+            already received starts a new occurrence of it.
+        """
+        broadcast = self.broadcasts.get(key)
+        first = broadcast is None or name in broadcast.receivers
+        if broadcast is None or first:
+            broadcast = Broadcast()
+            self.broadcasts.pop(key, None)
+            self.broadcasts[key] = broadcast
+            while len(self.broadcasts) > MAX_BROADCASTS:
+                del self.broadcasts[next(iter(self.broadcasts))]
+        broadcast.receivers.add(name)
+        if len(broadcast.receivers) >= len(self.owners):
+            # everyone has it
+            self.broadcasts.pop(key, None)
+        return first, broadcast
+
+    def report(self) -> str:
+        return ' '.join([
+            f'world: {len(self.owners)} bots,',
+            f'{len(self.players)} players,',
+            f'{self.n_skipped}/{self.n_updates} position updates skipped',
+        ])
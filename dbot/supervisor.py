@@ -0,0 +1,340 @@
+from __future__ import annotations
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import time
+
+from dbot.config import BotConfig
+from dbot.fleet import FleetHost
+from dbot.state.party import Party
+
+
+# (command, bot names) sent from the supervisor to a worker
+Command = Tuple[str, List[str]]
+
+
+class WorkerStatus:
+    """ periodic report from a worker process to the supervisor """
+
+    def __init__(
+        self,
+        worker_id: int,
+        load: float,
+        running: List[str],
+        failed: List[str],
+    ) -> None:
+        self.worker_id = worker_id
+        self.load = load
+        self.running = running
+        self.failed = failed
+
+
+def worker_main(
+    worker_id: int,
+    config_file: str,
+    names: List[str],
+    control: multiprocessing.Queue,
+    status: multiprocessing.Queue,
+    report_interval: float,
+) -> None:
+    """ entry point of a worker process, runs a FleetHost """
+    # ctrl-c goes to the whole process group, let the supervisor
+    # shut us down cleanly with an exit command instead
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.getLogger().setLevel(logging.INFO)
+    asyncio.run(run_worker(
+        worker_id,
+        config_file,
+        names,
+        control,
+        status,
+        report_interval,
+    ))
+
+
+async def run_worker(
+    worker_id: int,
+    config_file: str,
+    names: List[str],
+    control: multiprocessing.Queue,
+    status: multiprocessing.Queue,
+    report_interval: float,
+) -> None:
+    host = FleetHost([])
+    for name in names:
+        await host.start_bot(BotConfig.from_file(config_file, name))
+
+    last_report = time.time()
+    last_cpu = time.process_time()
+    while True:
+        try:
+            command: Optional[Command] = control.get_nowait()
+        except queue.Empty:
+            command = None
+
+        if command is not None:
+            action, bots = command
+            if action == 'start':
+                for name in bots:
+                    if name in host.running:
+                        continue
+                    await host.start_bot(BotConfig.from_file(config_file, name))
+            elif action == 'stop':
+                for name in bots:
+                    host.stop_bot(name)
+            elif action == 'exit':
+                for name in host.running:
+                    host.stop_bot(name)
+                tasks = list(host.tasks.values())
+                if len(tasks) > 0:
+                    await asyncio.wait(tasks, timeout=5.0)
+                return
+
+        now = time.time()
+        if now - last_report >= report_interval:
+            cpu = time.process_time()
+            status.put(WorkerStatus(
+                worker_id,
+                (cpu - last_cpu) / (now - last_report),
+                host.running,
+                list(host.failed),
+            ))
+            last_report = now
+            last_cpu = cpu
+
+        await asyncio.sleep(0.5)
+
+
+class Worker:
+    """ supervisor side handle of a worker process """
+
+    def __init__(
+        self,
+        worker_id: int,
+    ) -> None:
+        self.id = worker_id
+        self.groups: List[List[str]] = []
+        self.process: Optional[multiprocessing.Process] = None
+        self.control: Optional[multiprocessing.Queue] = None
+        self.restarts = 0
+        self.load = 0.0
+        self.running: Set[str] = set()
+
+    @property
+    def names(self) -> List[str]:
+        return [name for group in self.groups for name in group]
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def send(
+        self,
+        action: str,
+        names: List[str],
+    ) -> None:
+        if self.control is not None:
+            self.control.put((action, names))
+
+
+class Supervisor:
+    """ Spreads bots across worker processes, each running a FleetHost
+
+        Bots are sharded by friend group: the same groups of 3 that
+        Party.identify_party forms when everyone is logged in, so bots
+        that party together always share a worker. Crashed workers are
+        restarted, bots that failed (exceeded max_errors) are restarted
+        in place, and groups are moved off workers that are overloaded.
+    """
+
+    def __init__(
+        self,
+        config_file: str,
+        n_workers: Optional[int] = None,
+        max_restarts = 5,
+        overload = 0.8,
+        report_interval = 5.0,
+    ) -> None:
+        self.config_file = config_file
+        self.max_restarts = max_restarts
+        self.overload = overload
+        self.report_interval = report_interval
+
+        names = list(sorted(BotConfig.bot_names(config_file)))
+        for name in names:
+            # fail fast on bad configs, rather than in a worker
+            BotConfig.from_file(config_file, name)
+        groups = Party.partition(names)
+
+        n_workers = min(n_workers or os.cpu_count() or 1, len(groups))
+        self.workers = [Worker(i) for i in range(n_workers)]
+        for i, group in enumerate(groups):
+            self.workers[i % n_workers].groups.append(group)
+
+        self.status: multiprocessing.Queue = multiprocessing.Queue()
+        self.bot_restarts: Dict[str, int] = {}
+
+        # groups being moved, waiting for them to stop on their old worker
+        self.moving: List[Tuple[List[str], Worker]] = []
+
+    #
+    # worker management
+    #
+
+    def start_worker(
+        self,
+        worker: Worker,
+    ) -> None:
+        worker.control = multiprocessing.Queue()
+        worker.running = set()
+        worker.load = 0.0
+        worker.process = multiprocessing.Process(
+            target=worker_main,
+            args=(
+                worker.id,
+                self.config_file,
+                worker.names,
+                worker.control,
+                self.status,
+                self.report_interval,
+            ),
+            daemon=True,
+        )
+        worker.process.start()
+        logging.info(f'started worker {worker.id}: {worker.names}')
+
+    def check_worker(
+        self,
+        worker: Worker,
+    ) -> None:
+        if worker.alive or worker.process is None:
+            return
+
+        code = worker.process.exitcode
+        if worker.restarts >= self.max_restarts:
+            if len(worker.groups) > 0:
+                logging.error(f'worker {worker.id} keeps crashing, giving up')
+                worker.groups = []
+            return
+
+        worker.restarts += 1
+        logging.warning(f'worker {worker.id} exited ({code}), restarting')
+        self.start_worker(worker)
+
+    def update_status(
+        self,
+        status: WorkerStatus,
+    ) -> None:
+        worker = self.workers[status.worker_id]
+        worker.load = status.load
+        worker.running = set(status.running)
+
+        for name in status.failed:
+            if name not in worker.names or name in worker.running:
+                continue
+            restarts = self.bot_restarts.get(name, 0)
+            if restarts < self.max_restarts:
+                logging.warning(f'{name} failed, restarting')
+                self.bot_restarts[name] = restarts + 1
+                worker.send('start', [name])
+
+    #
+    # load balancing
+    #
+
+    def rebalance(self) -> None:
+        """ move one group from the busiest worker to the idlest """
+        if len(self.moving) > 0 or len(self.workers) < 2:
+            return
+
+        busiest = max(self.workers, key=lambda w: w.load)
+        idlest = min(self.workers, key=lambda w: w.load)
+        if (
+            busiest.load < self.overload or
+            idlest.load > self.overload / 2 or
+            len(busiest.groups) < 2
+        ):
+            return
+
+        group = busiest.groups.pop()
+        logging.info(
+            f'moving {group} from worker {busiest.id} ({busiest.load:.2f}) '
+            f'to worker {idlest.id} ({idlest.load:.2f})'
+        )
+        busiest.send('stop', group)
+        self.moving.append((group, idlest))
+
+    def finish_moves(self) -> None:
+        """ start moved groups once they've logged out of their old worker """
+        still_moving: List[Tuple[List[str], Worker]] = []
+        for group, destination in self.moving:
+            if any(
+                name in worker.running
+                for worker in self.workers
+                for name in group
+            ):
+                still_moving.append((group, destination))
+            else:
+                destination.groups.append(group)
+                destination.send('start', group)
+        self.moving = still_moving
+
+    #
+    # main loop
+    #
+
+    def run_forever(self) -> None:
+        for worker in self.workers:
+            self.start_worker(worker)
+
+        try:
+            while any(len(w.groups) > 0 for w in self.workers):
+                try:
+                    self.update_status(self.status.get(timeout=1.0))
+                    while True:
+                        self.update_status(self.status.get_nowait())
+                except queue.Empty:
+                    pass
+
+                for worker in self.workers:
+                    self.check_worker(worker)
+                self.finish_moves()
+                self.rebalance()
+        except KeyboardInterrupt:
+            logging.info('stopping workers')
+        finally:
+            for worker in self.workers:
+                worker.send('exit', [])
+            for worker in self.workers:
+                if worker.process is not None:
+                    worker.process.join(timeout=10.0)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config', type=str, default='config.json')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--restarts', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    supervisor = Supervisor(
+        args.config,
+        n_workers=args.workers,
+        max_restarts=args.restarts,
+    )
+    supervisor.run_forever()